@@ -4,8 +4,24 @@
 # 2) Pick a Fusion Project and Folder via dropdowns
 # 3) Choose a single export format: 3MF, STL, or OBJ
 # Exports all F3D/F3Z designs in the selected folder (including subfolders) to the chosen format.
+# Optional dry run: estimate ETA and output size from metadata + local timing history.
 
-import adsk.core, adsk.fusion, traceback, os
+import adsk.core, adsk.fusion, traceback, os, sys, time, threading, contextlib
+
+# Sibling helper modules (pure Python, no adsk) live next to this script
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPT_DIR)
+import exportplan
+import meshfiles
+import watchmode
+import jobspec
+import postprocess
+import shards
+import dialogdata
+import quarantine
+import shapeindex
+import verify
 
 _app = None
 _ui = None
@@ -108,19 +124,300 @@ def _collect_all_brep_bodies(root_comp):
     except:
         return None
 
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except:
+        return 0
+
+_hidden_open_unsupported = False  # cache: this build only exports from visible documents
+_DOC_POOL_SIZE = 2  # max documents held open at once (current + look-ahead)
+
+def _design_from_document(app, doc, prefer_active=False):
+    """Return the Design product of an opened document.
+    Hidden documents never become the active product, so the product is looked up
+    on the document itself; prefer_active keeps the old order for visible documents.
+    """
+    design = None
+    if prefer_active:
+        try:
+            design = adsk.fusion.Design.cast(app.activeProduct)
+        except:
+            design = None
+    if not design:
+        try:
+            prod = doc.products.itemByProductType('DesignProductType')
+            design = adsk.fusion.Design.cast(prod)
+        except:
+            design = None
+    if not design:
+        try:
+            design = adsk.fusion.Design.cast(doc.products.item(0))
+        except:
+            design = None
+    return design
+
+def _open_design_document(app, df, hidden=True):
+    """Open a design DataFile and return (document, design, opened_hidden).
+    Hidden opening skips the tab, viewport redraw and activation. When a build
+    can't hand out a usable design from a hidden document, the visible path is
+    used and remembered for the rest of the session. traverse_and_export does the
+    same when a hidden document opens but its first export fails and a visible
+    retry succeeds.
+    """
+    global _hidden_open_unsupported
+    if hidden and not _hidden_open_unsupported:
+        doc = None
+        try:
+            doc = app.documents.open(df, False)
+            design = _design_from_document(app, doc, False)
+            if design and design.rootComponent:
+                return doc, design, True
+        except:
+            pass
+        if doc:
+            try:
+                doc.close(False)
+            except:
+                pass
+        # Retry visibly; only a visible success proves the build (not the file) is the problem
+        doc = app.documents.open(df, True)
+        _hidden_open_unsupported = True
+    else:
+        # Open visibly to ensure active product is available in some environments
+        doc = app.documents.open(df, True)
+    try:
+        doc.activate()
+    except:
+        pass
+    return doc, _design_from_document(app, doc, True), False
+
+def _watch(watchdog, df, rel_path, stage):
+    """Time a Fusion call against the watchdog's stage budget (no-op without one)."""
+    return watchdog.watch(df, rel_path, stage) if watchdog is not None else contextlib.nullcontext()
+
+class _DocumentPool:
+    """Bounded set of open documents for one folder.
+    Up to size-1 upcoming designs are opened (hidden) right after the current one,
+    so cloud fetching Fusion does behind an open isn't waited on again at the next
+    file. The API itself is synchronous; the tOpen/tExport/tClose stage times in
+    stats show whether the look-ahead pays off on a given build.
+    """
+    def __init__(self, app, hidden, size, stats, watchdog=None, rel_path=''):
+        self.app = app
+        self.hidden = hidden
+        self.size = max(1, int(size))
+        self.stats = stats
+        self.watchdog = watchdog
+        self.rel_path = rel_path
+        self.docs = {}  # id(df) -> (document, design, open seconds)
+        self.hidden_ids = set()  # id(df) of documents that were opened hidden
+
+    def _open(self, df, hidden=None):
+        hidden = self.hidden if hidden is None else hidden
+        t0 = time.time()
+        with _watch(self.watchdog, df, self.rel_path, 'open'):
+            doc, design, was_hidden = _open_design_document(self.app, df, hidden)
+        secs = time.time() - t0
+        self.stats['tOpen'] += secs
+        if hidden and not was_hidden:
+            self.stats['hiddenFallback'] += 1
+        if was_hidden:
+            self.hidden_ids.add(id(df))
+        else:
+            self.hidden_ids.discard(id(df))
+        return doc, design, secs
+
+    def prefetch(self, upcoming):
+        # Visible documents fight over activation, so only hidden mode looks ahead
+        if not self.hidden or _hidden_open_unsupported:
+            return
+        for df in upcoming:
+            if len(self.docs) >= self.size - 1:
+                break
+            if id(df) in self.docs:
+                continue
+            # Never open a quarantined design early; it may be the one that hangs
+            # (with policy 'last' it is only reached in its reordered position)
+            if self.watchdog is not None and self.watchdog.blocked(df):
+                continue
+            try:
+                self.docs[id(df)] = self._open(df)
+            except:
+                # Leave it for take(), which reports the error against this file
+                break
+
+    def take(self, df):
+        """Return (document, design, open seconds) for df, opening it now if needed."""
+        got = self.docs.pop(id(df), None)
+        return got if got else self._open(df)
+
+    def opened_hidden(self, df):
+        return id(df) in self.hidden_ids
+
+    def reopen_visible(self, df, doc):
+        """Close df's hidden document and open it visibly (export retry)."""
+        self.release(doc)
+        return self._open(df, hidden=False)
+
+    def discard(self, df):
+        """Close df's look-ahead document if there is one (design won't be exported)."""
+        got = self.docs.pop(id(df), None)
+        if got:
+            self.release(got[0])
+
+    def release(self, doc):
+        t0 = time.time()
+        try:
+            doc.close(False)
+        except:
+            pass
+        self.stats['tClose'] += time.time() - t0
+
+    def close_all(self):
+        for doc, _design, _secs in list(self.docs.values()):
+            self.release(doc)
+        self.docs = {}
+
+class _ComponentMeshCache:
+    """Tessellated meshes per unique component, shared across assemblies of a run.
+    A referenced component (e.g. the display model used by several holders) is keyed
+    by the source DataFile id + version of its document reference, so it is
+    tessellated once and placed into each assembly with its occurrence transform.
+    Local components are keyed by component id + the document that owns them.
+    """
+    def __init__(self):
+        self.meshes = {}  # key -> (coords in mm, indices, seconds it took)
+        self.hits = 0
+        self.refHits = 0  # hits on components referenced from another design
+        self.misses = 0
+        self.saved = 0.0
+
+    @staticmethod
+    def _reference(occ):
+        """(DataFile, direct) of the referenced design occ is part of, or (None, False).
+        Occurrences nested inside a referenced component report its reference."""
+        direct = True
+        while occ is not None:
+            try:
+                if occ.isReferencedComponent:
+                    return occ.documentReference.dataFile, direct
+                occ = occ.assemblyContext
+            except:
+                break
+            direct = False
+        return None, False
+
+    @staticmethod
+    def key(comp, occ=None):
+        cid = ''
+        try:
+            cid = comp.id
+        except:
+            cid = comp.name
+        # comp.parentDesign can resolve to the open assembly for a referenced
+        # component, which would give it a different key in every assembly
+        dfile, direct = _ComponentMeshCache._reference(occ)
+        if dfile is not None:
+            try:
+                return ('ref', dfile.id, '' if direct else cid, dfile.versionNumber)
+            except:
+                pass
+        owner, ver = '', 0
+        try:
+            dfile = comp.parentDesign.parentDocument.dataFile
+            owner, ver = dfile.id, dfile.versionNumber
+        except:
+            pass
+        return (owner, cid, ver)
+
+    def mesh(self, comp, occ=None):
+        k = self.key(comp, occ)
+        got = self.meshes.get(k)
+        if got:
+            self.hits += 1
+            if k[0] == 'ref':
+                self.refHits += 1
+            self.saved += got[2]
+            return got[0], got[1]
+        t0 = time.time()
+        coords, indices = _tessellate_component(comp)
+        self.misses += 1
+        self.meshes[k] = (coords, indices, time.time() - t0)
+        return coords, indices
+
+def _tessellate_component(comp):
+    """Mesh all solid bodies of a component in its own coordinate space (mm)."""
+    parts = []
+    for b in comp.bRepBodies:
+        try:
+            if not getattr(b, 'isSolid', True):
+                continue
+        except:
+            pass
+        calc = b.meshManager.createMeshCalculator()
+        try:
+            calc.setQuality(adsk.fusion.TriangleMeshQualityOptions.NormalQualityTriangleMesh)
+        except:
+            pass
+        tm = calc.calculate()
+        # Fusion works in cm; exports are in mm
+        coords = [c * 10.0 for c in tm.nodeCoordinatesAsDouble]
+        parts.append((coords, list(tm.nodeIndices)))
+    return meshfiles.merge_meshes(parts)
+
+def _assemble_from_cache(root_comp, cache):
+    """Build the whole-design mesh from cached component meshes and occurrence transforms."""
+    parts = [cache.mesh(root_comp)]
+    occs = root_comp.allOccurrences
+    for i in range(occs.count):
+        occ = occs.item(i)
+        coords, indices = cache.mesh(occ.component, occ)
+        if not indices:
+            continue
+        m = occ.transform2.asArray()
+        # Translation is in cm like the geometry; scale it with the coordinates
+        m = list(m)
+        m[3], m[7], m[11] = m[3] * 10.0, m[7] * 10.0, m[11] * 10.0
+        parts.append((meshfiles.transform_points(coords, m), indices))
+    return meshfiles.merge_meshes(parts)
+
+def _export_design_from_cache(design, out_dir, name, fmts, overwrite, cache, exported, fmt_times):
+    """Write STL/3MF for a design from the component cache.
+    Returns the set of formats handled so the exportManager path can skip them.
+    OBJ is left to exportManager: Fusion writes it in cm with a .mtl next to it,
+    and a cached copy in mm would change scale with the per-component setting.
+    """
+    want = [f for f in ('stl', '3mf') if f in fmts]
+    todo = [f for f in want if overwrite or not os.path.exists(os.path.join(out_dir, name + '.' + f))]
+    if not todo:
+        return set(want)
+    t0 = time.time()
+    coords, indices = _assemble_from_cache(design.rootComponent, cache)
+    if not indices:
+        raise RuntimeError('No solid bodies to mesh')
+    t_mesh = time.time() - t0
+    for f in todo:
+        t_fmt = time.time()
+        path = os.path.join(out_dir, name + '.' + f)
+        if f == 'stl':
+            meshfiles.write_stl(path, coords, indices)
+        else:
+            meshfiles.write_3mf(path, [(name, coords, indices)])
+        exported[f] += 1
+        # Meshing cost is shared by the formats of this design
+        fmt_times[f] = (time.time() - t_fmt + t_mesh / len(todo), _file_size(path))
+    return set(want)
+
 # Removed native 'Save as Mesh' automation helpers as we now rely on API-based 3MF export paths only.
 
-def populate_folder_dropdown(inputs, project, curr_path):
-    """Populate the folder dropdown with the current folder and its immediate subfolders.
-    curr_path: '' means project root.
+def populate_folder_dropdown(inputs, names, curr_path):
+    """Fill the folder dropdown with the current folder, a way up and the given
+    subfolder names (cached or already loaded). curr_path: '' means project root.
     """
     global _isUpdatingUI
-    if _isUpdatingUI:
-        return
     folderDD = adsk.core.DropDownCommandInput.cast(inputs.itemById('folderDD'))
     label = adsk.core.TextBoxCommandInput.cast(inputs.itemById('folderPathLabel'))
-    # Resolve folder from path
-    folder = project.rootFolder if not curr_path else find_folder_by_path(project, curr_path)
     # Clear items
     _isUpdatingUI = True
     try:
@@ -129,16 +426,12 @@ def populate_folder_dropdown(inputs, project, curr_path):
                 folderDD.listItems.item(0).deleteMe()
         except:
             pass
-        # Add current folder sentinel and subfolders
-        folderDD.listItems.add('(Current folder)', True)
-        try:
-            subs = folder.dataFolders if folder else None
-            if subs:
-                for i in range(subs.count):
-                    f = subs.item(i)
-                    folderDD.listItems.add(f.name, False)
-        except:
-            pass
+        # Add current folder sentinel, the way up and subfolders
+        folderDD.listItems.add(_FOLDER_HERE, True)
+        if curr_path:
+            folderDD.listItems.add(_FOLDER_UP, False)
+        for n in names:
+            folderDD.listItems.add(n, False)
         # Update label
         try:
             label.text = curr_path if curr_path else '(Project root)'
@@ -274,22 +567,61 @@ def _export_drawing_to_dxf(app, doc, out_dxf_path):
         pass
     return False
 
-def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=True, rel_path='', error_list=None, include_other_files=False, other_exts=None, manifest_list=None, export_drawing_dxf=False):
+_QUARANTINE_POLICIES = (('skip', 'Skip them'), ('last', 'Try them last'), ('retry', 'Try them again'))
+
+def _quarantine_note(watchdog):
+    """Message line about designs that timed out or were skipped (empty if none)."""
+    timeouts, skipped = watchdog.stats['timeouts'], watchdog.stats['skipped']
+    if not (timeouts or skipped):
+        return ''
+    return (f"\n\nQuarantine: {timeouts} design(s) ran past their time limit, {skipped} skipped from earlier runs.\n"
+            f"See 'python quarantine.py list' (release with 'python quarantine.py release <name>').")
+
+def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=True, rel_path='', error_list=None, include_other_files=False, other_exts=None, manifest_list=None, export_drawing_dxf=False, progress=None, history=None, hidden_open=True, component_cache=None, file_filter=None, recursive=True, completed=None, post=None, watchdog=None):
     """Traverse a Fusion 360 data folder and export all F3D/F3Z designs
     into base_output using one or more formats (e.g., ['3mf','stl','obj']).
     Recurses into subfolders, mirroring their relative paths.
+    progress: optional _RunProgress; checked between documents for cancel.
+    history: optional exportplan.TimingHistory that receives per-design timings.
+    hidden_open: open designs without a visible tab (falls back automatically).
+    component_cache: optional _ComponentMeshCache; when given, STL/3MF are
+    assembled from per-component meshes instead of exportManager (falls back on error).
+    file_filter: optional callable(rel_path, df) -> bool; files it rejects are ignored.
+    recursive: descend into subfolders (watch mode exports single folders).
+    completed: optional list that receives (rel_path, df) for every file exported or
+    downloaded without errors; skipped and quarantined files are never added.
+    post: optional postprocess.PostProcessor; every written file is submitted to it.
+    watchdog: optional quarantine.Watchdog; documents that overrun a stage budget are
+    abandoned and quarantined, quarantined files are skipped or moved last.
     """
+    global _hidden_open_unsupported
     # Normalize formats to a set of lowercase strings
     if isinstance(export_formats, (list, tuple, set)):
         fmts = {str(f).lower().strip() for f in export_formats if str(f).strip()}
     else:
         fmts = {str(export_formats).lower().strip()} if export_formats else set()
-    exported = {'designs':0, 'stl':0, '3mf':0, 'obj':0, 'other':0, 'otherFound':0, 'skipped':0, 'errors':0, 'pdfFail':0}
+    exported = {'designs':0, 'stl':0, '3mf':0, 'obj':0, 'other':0, 'otherFound':0, 'skipped':0, 'errors':0, 'pdfFail':0, 'cancelled':0,
+                'tOpen':0.0, 'tExport':0.0, 'tClose':0.0, 'hiddenFallback':0, 'quarantined':0}
     out_dir = os.path.join(base_output, rel_path) if rel_path else base_output
     ensure_dir(out_dir)
 
-    for df in folder.dataFiles:
+    files = [df for df in folder.dataFiles if file_filter is None or file_filter(rel_path, df)]
+    if watchdog is not None:
+        files = watchdog.order(files)
+    design_files = [df for df in files if (df.fileExtension or '').lower() in ('f3d', 'f3z')]
+    pool = _DocumentPool(app, hidden_open, _DOC_POOL_SIZE if hidden_open else 1, exported, watchdog, rel_path)
+
+    for df in files:
+        # Cancel only between documents so nothing is left half-written
+        if progress is not None and progress.is_cancelled():
+            exported['cancelled'] = 1
+            break
         opened_doc = None
+        t_export = None
+        t_start = time.time()
+        errors_before = exported['errors']
+        if progress is not None:
+            progress.begin(rel_path, df.name)
         try:
             ext = (df.fileExtension or '').lower()
             if ext not in ('f3d', 'f3z'):
@@ -334,7 +666,11 @@ def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=
                                                 pass
                                     if not ok:
                                         raise RuntimeError('DXF export not supported for Drawing in this build')
+                                    if post is not None:
+                                        post.submit(dxf_path)
                                 exported['other'] += 1
+                                if completed is not None:
+                                    completed.append((rel_path, df))
                                 # We consider DXF as the deliverable; skip downloading the .f2d file
                                 continue
                             except Exception as ex_pdf:
@@ -363,7 +699,6 @@ def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=
                                         pass
                                     # Best-effort wait for file to appear
                                     try:
-                                        import time
                                         deadline = time.time() + 5.0
                                         while time.time() < deadline and not os.path.exists(out_path) and not handler.ok:
                                             try:
@@ -378,6 +713,12 @@ def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=
                                 except Exception as ex2:
                                     raise ex2
                             exported['other'] += 1
+                            if completed is not None:
+                                completed.append((rel_path, df))
+                            if post is not None and os.path.exists(out_path):
+                                post.submit(out_path)
+                        if history is not None:
+                            history.record_other(time.time() - t_start)
                     except Exception as ex:
                         exported['errors'] += 1
                         if error_list is not None:
@@ -389,319 +730,380 @@ def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=
                     exported['skipped'] += 1
                 continue
 
-            # Open visibly to ensure active product is available in some environments
-            opened_doc = app.documents.open(df, True)
+            if watchdog is not None and watchdog.skip(df):
+                # Its look-ahead open may have been what put it in quarantine
+                pool.discard(df)
+                exported['quarantined'] += 1
+                continue
+            opened_doc, design, t_open = pool.take(df)
+            if watchdog is not None:
+                watchdog.check(df)   # also covers an open that overran during look-ahead
+            # Look ahead while this one exports
             try:
-                opened_doc.activate()
-            except:
+                pos = design_files.index(df)
+                pool.prefetch(design_files[pos + 1:])
+            except ValueError:
                 pass
-            # Prefer product lookup by type for robustness
-            design = None
-            try:
-                # Prefer activeProduct after activation
-                design = adsk.fusion.Design.cast(app.activeProduct)
-            except:
-                design = None
-            if not design:
-                try:
-                    prod = opened_doc.products.itemByProductType('DesignProductType')
-                    design = adsk.fusion.Design.cast(prod)
-                except:
-                    pass
-            if not design:
-                try:
-                    design = adsk.fusion.Design.cast(opened_doc.products.item(0))
-                except:
-                    design = None
+            t_export = time.time()
+            fmt_times = {}  # fmt -> (seconds, output bytes) for the timing history
             if not design:
                 exported['skipped'] += 1
                 continue
 
-            em = design.exportManager
-            name = df.name
-            lname = name.lower()
-            if lname.endswith('.f3d') or lname.endswith('.f3z'):
-                name = name[:name.rfind('.')]
-
-            # Per-format export loop
-            if 'stl' in fmts:
-                stl_path = os.path.join(out_dir, name + '.stl')
-                if overwrite or not os.path.exists(stl_path):
-                    opts2 = None
-                    # Try overload with filename first
-                    try:
-                        opts2 = em.createSTLExportOptions(design.rootComponent, stl_path)
-                    except:
+            for attempt in range(2):
+                counted = dict(exported)
+                try:
+                    em = design.exportManager
+                    name = df.name
+                    lname = name.lower()
+                    if lname.endswith('.f3d') or lname.endswith('.f3z'):
+                        name = name[:name.rfind('.')]
+
+                    mesh_fmts = fmts
+                    if component_cache is not None:
+                        if watchdog is not None:
+                            watchdog.stage(df, rel_path, 'export:components')
                         try:
-                            opts2 = em.createSTLExportOptions(design.rootComponent)
-                        except:
+                            done = _export_design_from_cache(design, out_dir, name, fmts, overwrite, component_cache, exported, fmt_times)
+                            mesh_fmts = fmts - done
+                        except Exception as ex_cc:
+                            # Fall back to the exportManager path for this design
+                            if error_list is not None:
+                                error_list.append(f"{df.name}: component export fell back to full export: {str(ex_cc)}")
+
+                    # Per-format export loop; the watchdog times each format and abandons the
+                    # document after one overran
+                    if 'stl' in mesh_fmts:
+                        if watchdog is not None:
+                            watchdog.check(df)
+                            watchdog.stage(df, rel_path, 'export:stl')
+                        stl_path = os.path.join(out_dir, name + '.stl')
+                        if overwrite or not os.path.exists(stl_path):
+                            t_fmt = time.time()
                             opts2 = None
-                    # Fallback: export all solid bodies if component-based creation failed
-                    if not opts2:
-                        try:
-                            bodies = _collect_all_brep_bodies(design.rootComponent)
-                            if bodies:
+                            # Try overload with filename first
+                            try:
+                                opts2 = em.createSTLExportOptions(design.rootComponent, stl_path)
+                            except:
                                 try:
-                                    opts2 = em.createSTLExportOptions(bodies, stl_path)
+                                    opts2 = em.createSTLExportOptions(design.rootComponent)
                                 except:
-                                    opts2 = em.createSTLExportOptions(bodies)
-                        except:
-                            pass
-                    if not opts2:
-                        raise RuntimeError('Failed to create STL export options')
-                    try:
-                        opts2.isBinaryFormat = True
-                    except:
-                        pass
-                    try:
-                        # Default mesh refinement medium if available
-                        ref = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
-                        opts2.meshRefinement = ref
-                    except:
-                        pass
-                    try:
-                        opts2.filename = stl_path
-                    except:
-                        pass
-                    try:
-                        adsk.doEvents()
-                    except:
-                        pass
-                    em.execute(opts2)
-                    exported['stl'] += 1
-            if '3mf' in fmts:
-                mf_path = os.path.join(out_dir, name + '.3mf')
-                if overwrite or not os.path.exists(mf_path):
-                    # Preferred API path: C3MF export (per sample script)
-                    try:
-                        has_c3mf = hasattr(em, 'createC3MFExportOptions')
-                    except:
-                        has_c3mf = False
-                    if has_c3mf:
-                        optsC = None
-                        try:
-                            optsC = em.createC3MFExportOptions(design.rootComponent, mf_path)
-                        except:
+                                    opts2 = None
+                            # Fallback: export all solid bodies if component-based creation failed
+                            if not opts2:
+                                try:
+                                    bodies = _collect_all_brep_bodies(design.rootComponent)
+                                    if bodies:
+                                        try:
+                                            opts2 = em.createSTLExportOptions(bodies, stl_path)
+                                        except:
+                                            opts2 = em.createSTLExportOptions(bodies)
+                                except:
+                                    pass
+                            if not opts2:
+                                raise RuntimeError('Failed to create STL export options')
                             try:
-                                optsC = em.createC3MFExportOptions(design.rootComponent)
+                                opts2.isBinaryFormat = True
                             except:
-                                optsC = None
-                        if not optsC:
+                                pass
                             try:
-                                bodies = _collect_all_brep_bodies(design.rootComponent)
-                                if bodies:
-                                    try:
-                                        optsC = em.createC3MFExportOptions(bodies, mf_path)
-                                    except:
-                                        optsC = em.createC3MFExportOptions(bodies)
+                                # Default mesh refinement medium if available
+                                ref = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
+                                opts2.meshRefinement = ref
                             except:
                                 pass
-                        if optsC:
                             try:
-                                optsC.filename = mf_path
+                                opts2.filename = stl_path
                             except:
                                 pass
                             try:
                                 adsk.doEvents()
                             except:
                                 pass
-                            em.execute(optsC)
-                            exported['3mf'] += 1
-                            # proceed to other formats
-                    opts3 = None
-                    # Check API availability
-                    has_3mf = hasattr(em, 'create3MFExportOptions')
-                    if has_3mf:
-                        try:
-                            opts3 = em.create3MFExportOptions(design.rootComponent, mf_path)
-                        except:
+                            em.execute(opts2)
+                            exported['stl'] += 1
+                            fmt_times['stl'] = (time.time() - t_fmt, _file_size(stl_path))
+                    if '3mf' in mesh_fmts:
+                        if watchdog is not None:
+                            watchdog.check(df)
+                            watchdog.stage(df, rel_path, 'export:3mf')
+                        mf_path = os.path.join(out_dir, name + '.3mf')
+                        if overwrite or not os.path.exists(mf_path):
+                            t_fmt = time.time()
+                            # Preferred API path: C3MF export (per sample script)
                             try:
-                                opts3 = em.create3MFExportOptions(design.rootComponent)
+                                has_c3mf = hasattr(em, 'createC3MFExportOptions')
                             except:
+                                has_c3mf = False
+                            if has_c3mf:
+                                optsC = None
+                                try:
+                                    optsC = em.createC3MFExportOptions(design.rootComponent, mf_path)
+                                except:
+                                    try:
+                                        optsC = em.createC3MFExportOptions(design.rootComponent)
+                                    except:
+                                        optsC = None
+                                if not optsC:
+                                    try:
+                                        bodies = _collect_all_brep_bodies(design.rootComponent)
+                                        if bodies:
+                                            try:
+                                                optsC = em.createC3MFExportOptions(bodies, mf_path)
+                                            except:
+                                                optsC = em.createC3MFExportOptions(bodies)
+                                    except:
+                                        pass
+                                if optsC:
+                                    try:
+                                        optsC.filename = mf_path
+                                    except:
+                                        pass
+                                    try:
+                                        adsk.doEvents()
+                                    except:
+                                        pass
+                                    em.execute(optsC)
+                                    exported['3mf'] += 1
+                                    # proceed to other formats
+                            opts3 = None
+                            # Check API availability
+                            has_3mf = hasattr(em, 'create3MFExportOptions')
+                            if has_3mf:
+                                try:
+                                    opts3 = em.create3MFExportOptions(design.rootComponent, mf_path)
+                                except:
+                                    try:
+                                        opts3 = em.create3MFExportOptions(design.rootComponent)
+                                    except:
+                                        opts3 = None
+                            else:
                                 opts3 = None
-                    else:
-                        opts3 = None
-                    # Fallback to bodies if needed
-                    if has_3mf and not opts3:
-                        try:
-                            bodies = _collect_all_brep_bodies(design.rootComponent)
-                            if bodies:
+                            # Fallback to bodies if needed
+                            if has_3mf and not opts3:
                                 try:
-                                    opts3 = em.create3MFExportOptions(bodies, mf_path)
+                                    bodies = _collect_all_brep_bodies(design.rootComponent)
+                                    if bodies:
+                                        try:
+                                            opts3 = em.create3MFExportOptions(bodies, mf_path)
+                                        except:
+                                            opts3 = em.create3MFExportOptions(bodies)
                                 except:
-                                    opts3 = em.create3MFExportOptions(bodies)
-                        except:
-                            pass
-                    # Alternate path: MeshExportOptions if available
-                    if not opts3 and hasattr(em, 'createMeshExportOptions'):
-                        mesh_opts = None
-                        try:
-                            # Try explicit 3-arg overload specifying 3MF format if available
-                            try:
-                                mesh_opts = em.createMeshExportOptions(
-                                    design.rootComponent,
-                                    mf_path,
-                                    adsk.fusion.MeshFileFormat.MeshFileFormat3MF
-                                )
-                            except:
-                                mesh_opts = em.createMeshExportOptions(design.rootComponent, mf_path)
-                        except:
-                            try:
-                                bodies = _collect_all_brep_bodies(design.rootComponent)
-                                if bodies:
+                                    pass
+                            # Alternate path: MeshExportOptions if available
+                            if not opts3 and hasattr(em, 'createMeshExportOptions'):
+                                mesh_opts = None
+                                try:
+                                    # Try explicit 3-arg overload specifying 3MF format if available
                                     try:
                                         mesh_opts = em.createMeshExportOptions(
-                                            bodies,
+                                            design.rootComponent,
                                             mf_path,
                                             adsk.fusion.MeshFileFormat.MeshFileFormat3MF
                                         )
                                     except:
+                                        mesh_opts = em.createMeshExportOptions(design.rootComponent, mf_path)
+                                except:
+                                    try:
+                                        bodies = _collect_all_brep_bodies(design.rootComponent)
+                                        if bodies:
+                                            try:
+                                                mesh_opts = em.createMeshExportOptions(
+                                                    bodies,
+                                                    mf_path,
+                                                    adsk.fusion.MeshFileFormat.MeshFileFormat3MF
+                                                )
+                                            except:
+                                                try:
+                                                    mesh_opts = em.createMeshExportOptions(bodies, mf_path)
+                                                except:
+                                                    mesh_opts = em.createMeshExportOptions(bodies)
+                                    except:
+                                        pass
+                                if mesh_opts:
+                                    # Try to set file format to 3MF across possible property names
+                                    set_ok = False
+                                    for prop in ('fileFormat', 'meshFileFormat', 'format'):
                                         try:
-                                            mesh_opts = em.createMeshExportOptions(bodies, mf_path)
+                                            setattr(mesh_opts, prop, adsk.fusion.MeshFileFormat.MeshFileFormat3MF)
+                                            set_ok = True
+                                            break
                                         except:
-                                            mesh_opts = em.createMeshExportOptions(bodies)
-                            except:
-                                pass
-                        if mesh_opts:
-                            # Try to set file format to 3MF across possible property names
-                            set_ok = False
-                            for prop in ('fileFormat', 'meshFileFormat', 'format'):
-                                try:
-                                    setattr(mesh_opts, prop, adsk.fusion.MeshFileFormat.MeshFileFormat3MF)
-                                    set_ok = True
-                                    break
-                                except:
-                                    pass
-                            # Mesh refinement if exposed
-                            try:
-                                mesh_opts.meshRefinement = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
-                            except:
-                                pass
-                            if set_ok:
-                                try:
-                                    adsk.doEvents()
-                                except:
-                                    pass
-                                em.execute(mesh_opts)
-                                exported['3mf'] += 1
-                                opts3 = 'done-mesh'  # mark as done
-                    if not has_3mf or not opts3:
-                        # Graceful fallback to STL when 3MF isn't available or options fail
-                        try:
-                            stl_path = os.path.join(out_dir, name + '.stl')
-                            opts2 = None
-                            try:
-                                opts2 = em.createSTLExportOptions(design.rootComponent, stl_path)
-                            except:
+                                            pass
+                                    # Mesh refinement if exposed
+                                    try:
+                                        mesh_opts.meshRefinement = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
+                                    except:
+                                        pass
+                                    if set_ok:
+                                        try:
+                                            adsk.doEvents()
+                                        except:
+                                            pass
+                                        em.execute(mesh_opts)
+                                        exported['3mf'] += 1
+                                        opts3 = 'done-mesh'  # mark as done
+                            if not has_3mf or not opts3:
+                                # Graceful fallback to STL when 3MF isn't available or options fail
                                 try:
-                                    opts2 = em.createSTLExportOptions(design.rootComponent)
-                                except:
+                                    stl_path = os.path.join(out_dir, name + '.stl')
                                     opts2 = None
-                            if not opts2:
-                                bodies = _collect_all_brep_bodies(design.rootComponent)
-                                if bodies:
                                     try:
-                                        opts2 = em.createSTLExportOptions(bodies, stl_path)
+                                        opts2 = em.createSTLExportOptions(design.rootComponent, stl_path)
                                     except:
-                                        opts2 = em.createSTLExportOptions(bodies)
-                            if not opts2:
-                                raise RuntimeError('Failed to create 3MF export options and STL fallback options')
-                            try:
-                                opts2.isBinaryFormat = True
-                            except:
-                                pass
-                            try:
-                                ref = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
-                                opts2.meshRefinement = ref
-                            except:
-                                pass
-                            try:
-                                opts2.filename = stl_path
-                            except:
-                                pass
+                                        try:
+                                            opts2 = em.createSTLExportOptions(design.rootComponent)
+                                        except:
+                                            opts2 = None
+                                    if not opts2:
+                                        bodies = _collect_all_brep_bodies(design.rootComponent)
+                                        if bodies:
+                                            try:
+                                                opts2 = em.createSTLExportOptions(bodies, stl_path)
+                                            except:
+                                                opts2 = em.createSTLExportOptions(bodies)
+                                    if not opts2:
+                                        raise RuntimeError('Failed to create 3MF export options and STL fallback options')
+                                    try:
+                                        opts2.isBinaryFormat = True
+                                    except:
+                                        pass
+                                    try:
+                                        ref = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
+                                        opts2.meshRefinement = ref
+                                    except:
+                                        pass
+                                    try:
+                                        opts2.filename = stl_path
+                                    except:
+                                        pass
+                                    try:
+                                        adsk.doEvents()
+                                    except:
+                                        pass
+                                    em.execute(opts2)
+                                    exported['stl'] += 1
+                                except:
+                                    raise RuntimeError('Failed to create 3MF export options')
+                            else:
+                                if opts3 != 'done-mesh':
+                                    try:
+                                        opts3.filename = mf_path
+                                    except:
+                                        pass
+                                    try:
+                                        adsk.doEvents()
+                                    except:
+                                        pass
+                                    em.execute(opts3)
+                                    exported['3mf'] += 1
+                            # STL fallback output counts towards the 3MF timing of this design
+                            fmt_times['3mf'] = (time.time() - t_fmt, _file_size(mf_path) or _file_size(os.path.join(out_dir, name + '.stl')))
+                    if 'obj' in mesh_fmts:
+                        if watchdog is not None:
+                            watchdog.check(df)
+                            watchdog.stage(df, rel_path, 'export:obj')
+                        obj_path = os.path.join(out_dir, name + '.obj')
+                        if overwrite or not os.path.exists(obj_path):
+                            t_fmt = time.time()
+                            optsO = None
                             try:
-                                adsk.doEvents()
+                                optsO = em.createOBJExportOptions(design.rootComponent, obj_path)
                             except:
-                                pass
-                            em.execute(opts2)
-                            exported['stl'] += 1
-                        except:
-                            raise RuntimeError('Failed to create 3MF export options')
-                    else:
-                        if opts3 != 'done-mesh':
+                                try:
+                                    optsO = em.createOBJExportOptions(design.rootComponent)
+                                except:
+                                    optsO = None
+                            if not optsO:
+                                raise RuntimeError('Failed to create OBJ export options')
                             try:
-                                opts3.filename = mf_path
+                                optsO.filename = obj_path
                             except:
                                 pass
                             try:
                                 adsk.doEvents()
                             except:
                                 pass
-                            em.execute(opts3)
-                            exported['3mf'] += 1
-            if 'obj' in fmts:
-                obj_path = os.path.join(out_dir, name + '.obj')
-                if overwrite or not os.path.exists(obj_path):
-                    optsO = None
-                    try:
-                        optsO = em.createOBJExportOptions(design.rootComponent, obj_path)
-                    except:
-                        try:
-                            optsO = em.createOBJExportOptions(design.rootComponent)
-                        except:
-                            optsO = None
-                    if not optsO:
-                        raise RuntimeError('Failed to create OBJ export options')
-                    try:
-                        optsO.filename = obj_path
-                    except:
-                        pass
-                    try:
-                        adsk.doEvents()
-                    except:
-                        pass
-                    em.execute(optsO)
-                    exported['obj'] += 1
+                            em.execute(optsO)
+                            exported['obj'] += 1
+                            fmt_times['obj'] = (time.time() - t_fmt, _file_size(obj_path) + _file_size(os.path.join(out_dir, name + '.mtl')))
 
-            # DXF (flat pattern) export if requested
-            if 'dxf' in fmts:
-                try:
-                    # Try to get a flat pattern product from the opened document
-                    flat_prod = None
-                    try:
-                        flat_prod = opened_doc.products.itemByProductType('FlatPatternProductType')
-                    except:
-                        flat_prod = None
-                    if flat_prod:
-                        flat = None
+                    # DXF (flat pattern) export if requested
+                    if 'dxf' in fmts:
+                        if watchdog is not None:
+                            watchdog.check(df)
+                            watchdog.stage(df, rel_path, 'export:dxf')
+                        t_fmt = time.time()
                         try:
-                            flat = flat_prod.flatPattern
-                        except:
-                            flat = None
-                        if flat:
-                            dxf_path = os.path.join(out_dir, name + '.dxf')
-                            if overwrite or not os.path.exists(dxf_path):
+                            # Try to get a flat pattern product from the opened document
+                            flat_prod = None
+                            try:
+                                flat_prod = opened_doc.products.itemByProductType('FlatPatternProductType')
+                            except:
+                                flat_prod = None
+                            if flat_prod:
+                                flat = None
                                 try:
-                                    expMgr = getattr(flat_prod, 'exportManager', None)
-                                    if expMgr and hasattr(expMgr, 'createDXFFlatPatternExportOptions'):
-                                        fp_opts = expMgr.createDXFFlatPatternExportOptions(dxf_path, flat)
-                                        ok = expMgr.execute(fp_opts)
-                                        if ok:
-                                            exported['other'] += 1
-                                    # If execute returned False, treat as non-fatal and continue
-                                except Exception as ex_dxf:
-                                    # Non-fatal: record as error detail but keep going
-                                    try:
-                                        if error_list is not None:
-                                            error_list.append(f"{df.name}: flat pattern DXF export failed: {str(ex_dxf)}")
-                                        exported['errors'] += 1
-                                    except:
-                                        pass
+                                    flat = flat_prod.flatPattern
+                                except:
+                                    flat = None
+                                if flat:
+                                    dxf_path = os.path.join(out_dir, name + '.dxf')
+                                    if overwrite or not os.path.exists(dxf_path):
+                                        try:
+                                            expMgr = getattr(flat_prod, 'exportManager', None)
+                                            if expMgr and hasattr(expMgr, 'createDXFFlatPatternExportOptions'):
+                                                fp_opts = expMgr.createDXFFlatPatternExportOptions(dxf_path, flat)
+                                                ok = expMgr.execute(fp_opts)
+                                                if ok:
+                                                    exported['other'] += 1
+                                            # If execute returned False, treat as non-fatal and continue
+                                        except Exception as ex_dxf:
+                                            # Non-fatal: record as error detail but keep going
+                                            try:
+                                                if error_list is not None:
+                                                    error_list.append(f"{df.name}: flat pattern DXF export failed: {str(ex_dxf)}")
+                                                exported['errors'] += 1
+                                            except:
+                                                pass
+                        except Exception:
+                            # Non-fatal outer protection for DXF branch
+                            pass
+                        fmt_times['dxf'] = (time.time() - t_fmt, _file_size(os.path.join(out_dir, name + '.dxf')))
+                    if watchdog is not None:
+                        watchdog.check(df)
+                    break
+                except quarantine.StageTimeout:
+                    raise
                 except Exception:
-                    # Non-fatal outer protection for DXF branch
-                    pass
+                    # Some builds open hidden documents whose exports all fail. Retry a
+                    # hidden document once visibly when nothing of it was exported yet
+                    # (a counted format would be counted again); if the retry works the
+                    # build is at fault and the session opens documents visibly
+                    if attempt or exported != counted or not pool.opened_hidden(df):
+                        raise
+                    doc, opened_doc = opened_doc, None
+                    opened_doc, design, t_retry = pool.reopen_visible(df, doc)
+                    t_open += t_retry
+                    if not design:
+                        raise RuntimeError('no design in the visibly opened document')
+            if attempt:
+                _hidden_open_unsupported = True
+                exported['hiddenFallback'] += 1
 
             exported['designs'] += 1
+            if completed is not None and exported['errors'] == errors_before:
+                completed.append((rel_path, df))
+            if post is not None:
+                # Hand finished files to the post-processing pool; Fusion moves on to the next document
+                for f in fmt_times:
+                    p_out = os.path.join(out_dir, name + '.' + f)
+                    if f == '3mf' and not os.path.exists(p_out):
+                        p_out = os.path.join(out_dir, name + '.stl')  # STL fallback
+                    if os.path.exists(p_out):
+                        post.submit(p_out)
+            if history is not None:
+                history.record(exportplan.datafile_key(df), exportplan.datafile_version(df), exportplan.datafile_size(df), t_open, fmt_times)
 
         except Exception as ex:
             exported['errors'] += 1
@@ -711,16 +1113,24 @@ def traverse_and_export(app, ui, folder, base_output, export_formats, overwrite=
             except:
                 pass
         finally:
+            if t_export is not None:
+                exported['tExport'] += time.time() - t_export
             if opened_doc:
-                try:
-                    opened_doc.close(False)
-                except:
-                    pass
+                if watchdog is not None:
+                    watchdog.stage(df, rel_path, 'close')
+                pool.release(opened_doc)
+                if watchdog is not None:
+                    watchdog.finish(df, exported['errors'] == errors_before)
+            if progress is not None:
+                progress.finish(rel_path, df.name)
+    pool.close_all()
 
-    for i in range(folder.dataFolders.count):
+    for i in range(folder.dataFolders.count if recursive else 0):
+        if exported['cancelled']:
+            break
         sub = folder.dataFolders.item(i)
         sub_rel = os.path.join(rel_path, sub.name) if rel_path else sub.name
-        stats = traverse_and_export(app, ui, sub, base_output, fmts, overwrite, sub_rel, error_list, include_other_files, other_exts, manifest_list, export_drawing_dxf)
+        stats = traverse_and_export(app, ui, sub, base_output, fmts, overwrite, sub_rel, error_list, include_other_files, other_exts, manifest_list, export_drawing_dxf, progress, history, hidden_open, component_cache, file_filter, True, completed, post, watchdog)
         for k in exported:
             exported[k] += stats.get(k, 0)
 
@@ -732,50 +1142,583 @@ _opts_ready = False
 _opts = {}
 _handlers = []  # Keep event handlers alive
 _isUpdatingUI = False  # Re-entrancy guard for UI updates
+_dialog = None  # _DialogData while the dialog is open
+_DIALOG_EVENT = 'Folder3DExportDialogData'
+_FOLDER_HERE = '(This folder)'
+_FOLDER_UP = '.. (up one level)'
+_LOADING = '(Loading…)'
 _drawing_pdf_not_supported = False  # cache to avoid repeated PDF attempts on unsupported builds
 
+class _RunProgress:
+    """Fusion progress dialog driven by an exportplan.ProgressTracker.
+    The cancel button is only honoured between documents (see traverse_and_export).
+    """
+    def __init__(self, ui, tracker):
+        self.tracker = tracker
+        self.dlg = None
+        try:
+            self.dlg = ui.createProgressDialog()
+            self.dlg.cancelButtonText = 'Cancel'
+            self.dlg.isBackgroundTranslucent = False
+            self.dlg.isCancelButtonShown = True
+            self.dlg.show('Exporting Fusion folder', tracker.message(), 0, max(1, tracker.total), 1)
+        except:
+            self.dlg = None
+
+    def is_cancelled(self):
+        try:
+            if self.dlg and self.dlg.wasCancelled:
+                self.tracker.cancelled = True
+        except:
+            pass
+        return self.tracker.cancelled
+
+    def begin(self, rel, name):
+        self.tracker.begin(rel, name)
+        self._update()
+
+    def finish(self, rel, name):
+        self.tracker.finish(rel, name)
+        self._update()
+
+    def _update(self):
+        if not self.dlg:
+            return
+        try:
+            self.dlg.progressValue = self.tracker.done
+            self.dlg.message = self.tracker.message()
+            adsk.doEvents()
+        except:
+            pass
+
+    def close(self):
+        try:
+            if self.dlg:
+                self.dlg.hide()
+        except:
+            pass
+
+def _update_shape_index(out_dir, results):
+    """Store descriptors from the 'shape' post step in out_dir's shape_index.npz."""
+    try:
+        return shapeindex.add_results(out_dir, results)
+    except:
+        return 0
+
+def _finish_post(post, out_dir):
+    """Wait for post-processing and update export_manifest.json. Returns a summary line."""
+    if post is None:
+        return ''
+    results = post.close()
+    try:
+        postprocess.write_manifest(out_dir, results)
+    except:
+        pass
+    n_shape = _update_shape_index(out_dir, results)
+    st = post.stats
+    line = (f"Post-processing ({', '.join(post.steps)}): {st['submitted']} files, {st['failed']} failed, "
+            f"waited {st['tDrain']:.1f}s at the end, export blocked {st['tBlocked']:.1f}s")
+    est, n_est = postprocess.estimate_totals(results)
+    if n_est:
+        line += (f"\nFilament estimate: {est['grams']:.0f} g, {est['meters']:.1f} m, "
+                 f"~{est['seconds'] / 3600:.1f} h printing for {n_est} designs")
+    if n_shape:
+        line += f"\nShape index: {n_shape} designs updated (python shapeindex.py query <out> <part.stl>)"
+    bad = [r for r in results if r.get('errors')]
+    if bad:
+        line += '\n' + '\n'.join(f"{r['path']}: {'; '.join(r['errors'])}" for r in bad[:5])
+    return line
+
+class _JobFolders:
+    """Resolves job targets to DataFolders. The hub list, each hub's project list
+    and resolved folders are cached; data.activeHub is switched only when a target
+    names a different hub than the active one."""
+    def __init__(self, data):
+        self.data = data
+        self.switches = 0
+        self._hubs = None
+        self._projects = {}   # hub -> {name: project} or error string
+        self._folders = {}    # (hub, project, path) -> DataFolder
+
+    def _activate(self, hub_name):
+        if not hub_name:
+            return None
+        if self._hubs is None:
+            self._hubs = {}
+            for h in list_hubs(self.data):
+                self._hubs.setdefault(h.name, h)
+        hub = self._hubs.get(hub_name)
+        if not hub:
+            return f"Hub not found: '{hub_name}'"
+        try:
+            if not self.data.activeHub or self.data.activeHub.name != hub_name:
+                self.data.activeHub = hub
+                self.switches += 1
+        except Exception as ex:
+            return f"Could not switch to hub '{hub_name}': {ex}"
+        return None
+
+    def resolve(self, t):
+        """Return (folder, error) for a normalized job target."""
+        hub_name = t['hub']
+        hub_error = self._activate(hub_name)
+        if hub_error:
+            return None, hub_error
+        projects = self._projects.get(hub_name)
+        if projects is None:
+            # One project listing per hub
+            projects = {}
+            for p in list_projects(self.data):
+                projects.setdefault(p.name, p)
+            self._projects[hub_name] = projects
+        project = projects.get(t['project'])
+        if not project:
+            return None, f"Project not found: '{t['project']}'"
+        fkey = (hub_name, t['project'], t['folder'])
+        folder = self._folders.get(fkey)
+        if folder is None:
+            folder = project.rootFolder if not t['folder'] else find_folder_by_path(project, t['folder'])
+            self._folders[fkey] = folder
+        if not folder:
+            return None, f"Folder not found: '{t['folder']}'"
+        return folder, None
+
+def _plan_job(app, job):
+    """Dry run of a job: the metadata-only plan of every target (nothing is opened).
+    Returns the text for the message box."""
+    history = exportplan.TimingHistory()
+    folders = _JobFolders(app.data)
+    lines = ['Dry run of the job (no documents opened).']
+    eta = 0.0
+    for _hub, targets in jobspec.group_by_hub(job['targets']):
+        for t in targets:
+            lines.append('')
+            lines.append(f"Target {t['index']}: {t['name']} -> {t['output']}")
+            folder, error = folders.resolve(t)
+            if error:
+                lines.append(f"  {error}")
+                continue
+            plan = exportplan.build_plan(folder, t['formats'], exportplan.CostModel(history), t['include_other'],
+                                         t['other_exts'], jobspec.file_filter_for(t))
+            eta += plan['eta']
+            lines.extend('  ' + l for l in exportplan.format_plan(plan).split('\n')[1:])
+    lines.append('')
+    lines.append(f"Whole job: ~{exportplan.format_eta(eta)} in one session ({folders.switches} hub switches)")
+    return '\n'.join(lines)
+
+def _run_job(app, ui, job, post_steps=('hash', 'validate')):
+    """Run every target of a normalized job (see jobspec) in this session.
+    Targets are grouped by hub so data.activeHub changes once per hub; project
+    lists, resolved folders, the timing history, the component cache and the
+    hidden-open capability flag are shared across targets. Open documents are not:
+    the look-ahead pool only knows the upcoming files of the folder it serves and
+    closes everything at the end of that folder.
+    Returns (results, hub_switches); results are also written to job_result.json.
+    """
+    history = exportplan.TimingHistory()
+    comp_cache = _ComponentMeshCache() if any(t['component_cache'] for t in job['targets']) else None
+    folders = _JobFolders(app.data)
+    results = []
+    cancelled = False
+    for _hub, targets in jobspec.group_by_hub(job['targets']):
+        if cancelled:
+            break
+        for t in targets:
+            res = {'index': t['index'], 'name': t['name'], 'output': t['output'], 'stats': None, 'errors': [], 'manifest': [], 'seconds': 0.0, 'error': None}
+            results.append(res)
+            if cancelled:
+                res['error'] = 'Cancelled'
+                continue
+            folder, error = folders.resolve(t)
+            if error:
+                res['error'] = error
+                continue
+            try:
+                watchdog = quarantine.Watchdog(quarantine.parse_budgets(t['timeouts']), t['quarantine'])
+            except ValueError as ex:
+                res['error'] = f"timeouts: {ex}"
+                continue
+            t0 = time.time()
+            ensure_dir(t['output'])
+            manifest = [] if t['include_other'] else None
+            file_filter = jobspec.file_filter_for(t)
+            plan = exportplan.build_plan(folder, t['formats'], exportplan.CostModel(history), t['include_other'], t['other_exts'], file_filter)
+            progress = _RunProgress(ui, exportplan.ProgressTracker(plan))
+            post = postprocess.PostProcessor(t['output'], post_steps) if post_steps else None
+            try:
+                stats = traverse_and_export(
+                    app, ui, folder, t['output'], t['formats'], t['overwrite'], '', res['errors'],
+                    include_other_files=t['include_other'],
+                    other_exts=t['other_exts'],
+                    manifest_list=manifest,
+                    export_drawing_dxf=t['export_drawing_dxf'],
+                    progress=progress,
+                    history=history,
+                    hidden_open=t['hidden_open'],
+                    component_cache=comp_cache if t['component_cache'] else None,
+                    file_filter=file_filter,
+                    post=post,
+                    watchdog=watchdog
+                )
+            finally:
+                progress.close()
+                watchdog.close()
+                res['post'] = _finish_post(post, t['output'])
+            jobspec.write_export_log(t['output'], manifest, stats)
+            res['stats'] = stats
+            res['manifest'] = manifest or []
+            res['seconds'] = time.time() - t0
+            if stats.get('cancelled'):
+                cancelled = True
+    history.save()
+    try:
+        ensure_dir(job['output'])
+        jobspec.write_result(os.path.join(job['output'], jobspec.RESULT_NAME), job, results, folders.switches)
+    except:
+        pass
+    return results, folders.switches
+
+def _run_watch(app, ui, folder, out_dir, fmts, interval, export_kwargs, post_steps=('hash', 'validate'), backoff=2.0, max_interval=None):
+    """Keep out_dir current: poll the folder tree and export files whose version changed.
+    While nothing changes the interval grows by backoff per poll up to max_interval
+    (default 15x interval) and drops back to interval after an export.
+    Blocks (processing Fusion events) until the user presses Stop in the progress dialog.
+    The first poll exports everything not yet in the index stored in out_dir.
+    """
+    index = watchmode.FolderIndex(folder, os.path.join(out_dir, watchmode.INDEX_NAME))
+    totals = {}
+    errors = []
+    dlg = None
+    try:
+        dlg = ui.createProgressDialog()
+        dlg.cancelButtonText = 'Stop watching'
+        dlg.isCancelButtonShown = True
+        dlg.show('Watching Fusion folder', 'Checking for new versions…', 0, 1, 0)
+    except:
+        dlg = None
+
+    def stopped():
+        try:
+            return bool(dlg and dlg.wasCancelled)
+        except:
+            return False
+
+    # Only files an export can record count as changes; the rest would come back
+    # on every poll since skipped files are never marked as exported
+    allowed = {str(e).lower().lstrip('.').strip() for e in (export_kwargs.get('other_exts') or []) if str(e).strip()}
+
+    def wanted(rel, df):
+        ext = (df.fileExtension or '').lower().lstrip('.')
+        if ext in ('f3d', 'f3z'):
+            return True
+        if not export_kwargs.get('include_other_files'):
+            return False
+        base = (os.path.splitext(df.name)[1][1:] or '').lower()
+        if allowed and ext not in allowed and base not in allowed:
+            return False
+        # Without a download API only drawings exported to DXF are written
+        return _DataFileDownloadHandler is not None or bool(export_kwargs.get('export_drawing_dxf') and 'f2d' in (ext, base))
+
+    def export_changes(changes):
+        by_rel = {}
+        for rel, df in changes:
+            by_rel.setdefault(rel, []).append(df)
+        done = []
+        for rel, dfs in by_rel.items():
+            keys = {exportplan.datafile_key(d) for d in dfs}
+            stats = traverse_and_export(
+                app, ui, index.folders[rel], out_dir, fmts, True, rel, errors,
+                file_filter=lambda r, d, keys=keys: exportplan.datafile_key(d) in keys,
+                recursive=False, completed=done, post=post, **export_kwargs
+            )
+            for k, v in stats.items():
+                totals[k] = totals.get(k, 0) + v
+        if post is not None:
+            results = post.drain()
+            try:
+                postprocess.write_manifest(out_dir, results)
+            except:
+                pass
+            _update_shape_index(out_dir, results)
+        return done
+
+    def sleep(seconds):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            if stopped():
+                return False
+            try:
+                dlg.message = (f"Exported {watcher.stats['exported']} changed files in {watcher.stats['polls']} polls.\n"
+                               f"Next check in {int(deadline - time.time())}s")
+            except:
+                pass
+            adsk.doEvents()
+            time.sleep(0.1)
+        return not stopped()
+
+    post = postprocess.PostProcessor(out_dir, post_steps) if post_steps else None
+    watcher = watchmode.Watcher(index, export_changes, interval, max_interval or interval * 15, backoff,
+                                file_filter=wanted, sleep=sleep)
+    try:
+        watcher.run()
+    finally:
+        _finish_post(post, out_dir)
+        try:
+            if dlg:
+                dlg.hide()
+        except:
+            pass
+    return watcher.stats, totals, errors
+
+def _dropdown_names(dd, skip=()):
+    names = []
+    for i in range(dd.listItems.count):
+        n = dd.listItems.item(i).name
+        if n not in skip:
+            names.append(n)
+    return names
+
+def _selected_name(dd):
+    for it in dd.listItems:
+        if it.isSelected:
+            return it.name
+    return None
+
+def _merge_dropdown(dd, names, done, skip=(), empty=None):
+    """Apply a loaded page to a dropdown without disturbing what is already shown.
+    Returns True when the selected entry had to change."""
+    global _isUpdatingUI
+    shown = _dropdown_names(dd, skip + (_LOADING, empty))
+    add, remove = dialogdata.merge_names(shown, names, done)
+    gone = set(remove)
+    if names or done:
+        gone.add(_LOADING)
+    if names and empty:
+        gone.add(empty)
+    before = _selected_name(dd)
+    _isUpdatingUI = True
+    try:
+        for i in range(dd.listItems.count - 1, -1, -1):
+            if dd.listItems.item(i).name in gone:
+                dd.listItems.item(i).deleteMe()
+        for n in add:
+            dd.listItems.add(n, False)
+        if done and dd.listItems.count == 0 and empty:
+            dd.listItems.add(empty, True)
+        if _selected_name(dd) is None and dd.listItems.count > 0:
+            dd.listItems.item(0).isSelected = True
+    finally:
+        _isUpdatingUI = False
+    return _selected_name(dd) != before
+
+class _DialogPump(adsk.core.CustomEventHandler):
+    """Reads the next pages for the open dialog; custom events run on Fusion's main thread."""
+    def __init__(self): super().__init__()
+    def notify(self, args):
+        try:
+            if _dialog:
+                _dialog.pump()
+        except:
+            pass
+
+class _DialogData:
+    """Hub, project and folder lists of the open dialog. Everything is shown from
+    dialogdata.DialogCache first; listings the user is looking at are then read a
+    page per custom event (fired by a timer thread while work is queued) so the
+    dialog stays responsive on hubs with hundreds of projects."""
+    def __init__(self, app, inputs):
+        self.app = app
+        self.inputs = inputs
+        self.cache = dialogdata.DialogCache()
+        self.loader = dialogdata.PagedLoader()
+        self.hub = ''
+        self.project = ''
+        self.path = ''
+        self._pending = False
+        self._stop = threading.Event()
+        self._event = None
+
+    def _dd(self, id):
+        return adsk.core.DropDownCommandInput.cast(self.inputs.itemById(id))
+
+    def open(self):
+        sel = self.cache.selection
+        hub = sel.get('hub') if sel.get('hub') in self.cache.hubs else ''
+        if not hub:
+            try:
+                hub = self.app.data.activeHub.name
+            except:
+                hub = ''
+        hubDD = self._dd('hubDD')
+        names = self.cache.get('hubs')
+        if hub and hub not in names:
+            names.insert(0, hub)
+        for n in names:
+            hubDD.listItems.add(n, n == hub)
+        if not names:
+            hubDD.listItems.add(_LOADING, True)
+        self.select_hub(hub)
+        self.loader.request('hubs', '', lambda: self.app.data.dataHubs)
+        self.start()
+
+    def start(self):
+        try:
+            self._event = self.app.registerCustomEvent(_DIALOG_EVENT)
+            pump = _DialogPump()
+            self._event.add(pump)
+            _handlers.append(pump)
+            threading.Thread(target=self._tick, daemon=True).start()
+        except:
+            # No custom events in this build: load everything now
+            self._event = None
+            while self.loader.busy():
+                self.pump()
+
+    def _tick(self):
+        while not self._stop.wait(0.02):
+            if self.loader.busy() and not self._pending:
+                self._pending = True
+                try:
+                    self.app.fireCustomEvent(_DIALOG_EVENT, '')
+                except:
+                    self._pending = False
+
+    def close(self):
+        self._stop.set()
+        if self._event is not None:
+            try:
+                self.app.unregisterCustomEvent(_DIALOG_EVENT)
+            except:
+                pass
+        self.cache.save()
+
+    # Objects behind the names, from loaded pages or (rarely) looked up directly
+    def hub_obj(self, name):
+        h = self.loader.get('hubs', '', name)
+        if h is None:
+            for x in list_hubs(self.app.data):
+                if x.name == name:
+                    return x
+        return h
+
+    def project_obj(self, hub, name):
+        p = self.loader.get('projects', hub, name)
+        if p is None:
+            h = self.hub_obj(hub) if hub else None
+            projs = h.dataProjects if h else self.app.data.dataProjects
+            for i in range(projs.count):
+                if projs.item(i).name == name:
+                    return projs.item(i)
+        return p
+
+    def folder_obj(self, hub, project, path):
+        p = self.project_obj(hub, project)
+        if not p:
+            return None
+        folder, walked = p.rootFolder, ''
+        for part in [x for x in path.split('/') if x]:
+            sub = self.loader.get('folders', dialogdata.folder_key(hub, project, walked), part)
+            if sub is None:
+                return find_folder_by_path(p, path)
+            folder, walked = sub, (walked + '/' + part if walked else part)
+        return folder
+
+    def select_hub(self, name):
+        global _isUpdatingUI
+        self.hub = name or ''
+        projDD = self._dd('projDD')
+        names = self.cache.get('projects', self.hub)
+        want = self.cache.selection.get('project')
+        if want not in names:
+            want = next((n for n in names if 'admin' in n.lower()), names[0] if names else None)
+        _isUpdatingUI = True
+        try:
+            while projDD.listItems.count > 0:
+                projDD.listItems.item(0).deleteMe()
+            for n in names:
+                projDD.listItems.add(n, n == want)
+            if not names:
+                projDD.listItems.add(_LOADING, True)
+        finally:
+            _isUpdatingUI = False
+        hub = self.hub
+        self.loader.request('projects', hub, lambda: (self.hub_obj(hub).dataProjects if hub else self.app.data.dataProjects),
+                            keep=lambda p: not getattr(p, 'isArchived', False), front=True)
+        self.select_project(want or '')
+
+    def select_project(self, name):
+        self.project = name if name not in (_LOADING, '(No projects found)') else ''
+        sel = self.cache.selection
+        same = sel.get('hub') == self.hub and sel.get('project') == self.project
+        self.show_folder(sel.get('folder', '') if same else '')
+
+    def show_folder(self, path):
+        self.path = path or ''
+        key = dialogdata.folder_key(self.hub, self.project, self.path)
+        populate_folder_dropdown(self.inputs, self.cache.get('folders', key), self.path)
+        if self.project:
+            hub, project, p = self.hub, self.project, self.path
+            self.loader.request('folders', key, lambda: self.folder_obj(hub, project, p).dataFolders, front=True)
+
+    def pump(self):
+        self._pending = False
+        for u in self.loader.step():
+            # A failed listing is partial: never store it or let it remove cached entries
+            done = u['done'] and not u['error']
+            if done:
+                self.cache.set(u['kind'], u['key'], u['names'])
+            if u['kind'] == 'hubs':
+                _merge_dropdown(self._dd('hubDD'), u['names'], done, empty='(No hubs found)')
+            elif u['kind'] == 'projects' and u['key'] == self.hub:
+                projDD = self._dd('projDD')
+                if _merge_dropdown(projDD, u['names'], done, empty='(No projects found)'):
+                    self.select_project(_selected_name(projDD) or '')
+            elif u['kind'] == 'folders' and u['key'] == dialogdata.folder_key(self.hub, self.project, self.path):
+                _merge_dropdown(self._dd('folderDD'), u['names'], done, skip=(_FOLDER_HERE, _FOLDER_UP))
+        if not self.loader.busy():
+            self.cache.save()
+
+class CmdDestroy(adsk.core.CommandEventHandler):
+    def __init__(self): super().__init__()
+    def notify(self, args):
+        global _dialog
+        try:
+            if _dialog:
+                _dialog.close()
+            _dialog = None
+        except:
+            pass
+
 class CmdCreated(adsk.core.CommandCreatedEventHandler):
     def __init__(self): super().__init__()
     def notify(self, args):
+        global _dialog
         try:
             cmd = adsk.core.Command.cast(args.command)
             onExec = CmdExecute()
             onChanged = CmdInputChanged()
+            onDestroy = CmdDestroy()
             cmd.execute.add(onExec)
             cmd.inputChanged.add(onChanged)
-            _handlers.extend([onExec, onChanged])
+            cmd.destroy.add(onDestroy)
+            _handlers.extend([onExec, onChanged, onDestroy])
             inputs = cmd.commandInputs
 
             # Local output directory
             inputs.addStringValueInput('outDir', 'Local output folder', '')
             inputs.addBoolValueInput('pickOut', 'Choose Folder…', False, '', True)
 
-            # Hub dropdown (to ensure correct project list)
-            ddHub = inputs.addDropDownCommandInput('hubDD', 'Hub', adsk.core.DropDownStyles.TextListDropDownStyle)
-            data = _app.data
-            hubs = list_hubs(data)
-            active_hub_name = data.activeHub.name if data.activeHub else None
-            if hubs:
-                for h in hubs:
-                    ddHub.listItems.add(h.name, h.name == active_hub_name)
-            else:
-                ddHub.listItems.add('(No hubs found)', True)
-
-            # Project dropdown
-            ddProj = inputs.addDropDownCommandInput('projDD', 'Project', adsk.core.DropDownStyles.TextListDropDownStyle)
-            # Initial population (we'll override selection from prefs below)
-            projects = [p for p in list_projects(data) if not getattr(p, 'isArchived', False)]
-            if projects:
-                first = True
-                for p in projects:
-                    ddProj.listItems.add(p.name, first)
-                    first = False
-            else:
-                ddProj.listItems.add('(No projects found)', True)
+            # Hub and project dropdowns; filled from the dialog cache, refreshed in the background
+            inputs.addDropDownCommandInput('hubDD', 'Hub', adsk.core.DropDownStyles.TextListDropDownStyle)
+            inputs.addDropDownCommandInput('projDD', 'Project', adsk.core.DropDownStyles.TextListDropDownStyle)
 
-            # Folder path (string) + helper button to show available paths
-            inputs.addStringValueInput('folderPath', 'Fusion folder path', '(Project root)')
-            inputs.addBoolValueInput('showPaths', 'Show Folder Paths…', False, '', True)
+            # Optional batch job file; when set it replaces the project/folder selection
+            inputs.addStringValueInput('jobFile', 'Batch job file (JSON/TOML, optional)', '')
+            inputs.addIntegerSpinnerCommandInput('jobSessions', 'Split the job over N Fusion sessions (1 = run here)', 1, 32, 1, 1)
+
+            # Folder: pick a subfolder to step into it; subfolders are listed on demand
+            inputs.addTextBoxCommandInput('folderPathLabel', 'Fusion folder', '(Project root)', 1, True)
+            inputs.addDropDownCommandInput('folderDD', 'Subfolders', adsk.core.DropDownStyles.TextListDropDownStyle)
 
             # Export formats (multi-select)
             inputs.addBoolValueInput('fmt3mf', 'Export 3MF', True, '', True)
@@ -786,22 +1729,25 @@ class CmdCreated(adsk.core.CommandCreatedEventHandler):
             inputs.addStringValueInput('otherExts', 'Other file extensions (comma-separated)', 'f2d,dxf,dwg,pdf,svg,png,jpg')
             inputs.addBoolValueInput('otherManifest', 'If direct download isn’t supported, list them in a log.txt', True, '', True)
             inputs.addBoolValueInput('exportDrawingDxf', 'Export Fusion Drawings (f2d) to DXF', True, '', True)
+            inputs.addBoolValueInput('hiddenOpen', 'Open designs hidden (faster; falls back if unsupported)', True, '', True)
+            inputs.addBoolValueInput('componentCache', 'Export per component (reuse shared components)', True, '', False)
+            inputs.addStringValueInput('stageTimeouts', 'Time limits per design in s (open, export, close)', 'open=300, export=300, close=120')
+            policyDD = inputs.addDropDownCommandInput('quarantinePolicy', 'Designs that timed out before', adsk.core.DropDownStyles.TextListDropDownStyle)
+            for name, label in _QUARANTINE_POLICIES:
+                policyDD.listItems.add(label, name == 'skip')
+            inputs.addStringValueInput('postSteps', 'Post-processing steps (hash, validate, gzip, repair, estimate, shape, lod)', 'hash,validate')
+            inputs.addBoolValueInput('watchMode', 'Watch: keep exporting new versions until stopped', True, '', False)
+            inputs.addIntegerSpinnerCommandInput('watchInterval', 'Watch poll interval (s)', 10, 3600, 10, 60)
+            inputs.addFloatSpinnerCommandInput('watchBackoff', 'Watch backoff while idle (x per poll)', '', 1.0, 10.0, 0.5, 2.0)
+            inputs.addIntegerSpinnerCommandInput('watchMaxInterval', 'Watch longest poll interval (s)', 10, 86400, 60, 900)
+            inputs.addBoolValueInput('verifyOutput', 'Verify the output against its manifest when done', True, '', False)
+            inputs.addBoolValueInput('dryRun', 'Dry run (estimate time and size only)', True, '', False)
 
             # Selection summary
-            inputs.addTextBoxCommandInput('summary', 'Summary', 'Enter a folder path or use "Show Folder Paths…". Use (Project root) for top level.', 6, True)
-            # Prefer selecting an 'Admin' project by default when present
-            try:
-                prefer_index = -1
-                for i in range(ddProj.listItems.count):
-                    name = ddProj.listItems.item(i).name or ''
-                    if 'admin' in name.lower():
-                        prefer_index = i
-                        break
-                if prefer_index >= 0:
-                    for i in range(ddProj.listItems.count):
-                        ddProj.listItems.item(i).isSelected = (i == prefer_index)
-            except:
-                pass
+            inputs.addTextBoxCommandInput('summary', 'Summary', 'Pick a subfolder to step into it; the export starts from the folder shown above.', 6, True)
+            # The 'Admin' project is preferred when nothing was selected before (see _DialogData)
+            _dialog = _DialogData(_app, inputs)
+            _dialog.open()
 
         except:
             _ui.messageBox('CmdCreated error:\n' + traceback.format_exc())
@@ -812,7 +1758,9 @@ class CmdInputChanged(adsk.core.InputChangedEventHandler):
         try:
             eventArgs = adsk.core.InputChangedEventArgs.cast(args)
             changedInput = eventArgs.input
-            
+            if _isUpdatingUI:
+                return
+
             if changedInput.id == 'pickOut':
                 pickOutInput = adsk.core.BoolValueCommandInput.cast(changedInput)
                 if pickOutInput.value:
@@ -843,128 +1791,31 @@ class CmdInputChanged(adsk.core.InputChangedEventHandler):
                     # Reset the button
                     pickOutInput.value = False
 
-            # When hub changes, switch active hub and repopulate projects
-            if changedInput.id == 'hubDD':
-                hubDD = adsk.core.DropDownCommandInput.cast(changedInput)
-                selected_hub = None
-                for it in hubDD.listItems:
-                    if it.isSelected:
-                        selected_hub = it.name
-                        break
-                data = _app.data
-                # Set active hub
-                if selected_hub and selected_hub != '(No hubs found)':
-                    for h in list_hubs(data):
-                        if h.name == selected_hub:
-                            try:
-                                data.activeHub = h
-                            except:
-                                pass
-                            break
-                # Rebuild projects list
-                projDD = adsk.core.DropDownCommandInput.cast(eventArgs.inputs.itemById('projDD'))
-                try:
-                    while projDD.listItems.count > 0:
-                        projDD.listItems.item(0).deleteMe()
-                except:
-                    pass
-                projects = list_projects(data)
-                if projects:
-                    first = True
-                    for p in projects:
-                        projDD.listItems.add(p.name, first)
-                        first = False
-                else:
-                    projDD.listItems.add('(No projects found)', True)
-                # Trigger project-change branch below
-                changedInput = projDD
-
-            # When project changes, reset folder path string and summary
-            if changedInput.id == 'projDD':
-                projDD = adsk.core.DropDownCommandInput.cast(changedInput)
-                selected = None
-                for it in projDD.listItems:
-                    if it.isSelected:
-                        selected = it.name
-                        break
-                if selected:
-                    data = _app.data
-                    # find project by name
-                    project = None
-                    for p in list_projects(data):
-                        if p.name == selected:
-                            project = p
-                            break
-                    # Reset current path to root
-                    if project:
-                        try:
-                            fp = adsk.core.StringValueCommandInput.cast(eventArgs.inputs.itemById('folderPath'))
-                            if fp:
-                                fp.value = '(Project root)'
-                        except:
-                            pass
+            # Hub change: projects come from the cache at once, the listing follows in pages
+            if changedInput.id == 'hubDD' and _dialog:
+                selected_hub = _selected_name(adsk.core.DropDownCommandInput.cast(changedInput))
+                if selected_hub and selected_hub not in (_LOADING, '(No hubs found)'):
+                    _dialog.select_hub(selected_hub)
 
+            # Project change: back to the project root
+            if changedInput.id == 'projDD' and _dialog:
+                selected = _selected_name(adsk.core.DropDownCommandInput.cast(changedInput))
+                if selected and selected not in (_LOADING, '(No projects found)'):
+                    _dialog.select_project(selected)
                     # Update summary (use plain text for safety)
                     try:
                         summary = adsk.core.TextBoxCommandInput.cast(eventArgs.inputs.itemById('summary'))
-                        summary.text = 'Project selected: {}. Enter a folder path or click "Show Folder Paths…"'.format(selected)
+                        summary.text = 'Project selected: {}. Pick a subfolder to step into it.'.format(selected)
                     except:
                         pass
 
-            # Show folder paths helper: list a few available paths to copy
-            if changedInput.id == 'showPaths':
-                btn = adsk.core.BoolValueCommandInput.cast(changedInput)
-                if btn and btn.value:
-                    btn.value = False
-                    # Determine selected project
-                    projDD = adsk.core.DropDownCommandInput.cast(eventArgs.inputs.itemById('projDD'))
-                    proj_name = None
-                    for it in projDD.listItems:
-                        if it.isSelected:
-                            proj_name = it.name
-                            break
-                    if not proj_name or proj_name == '(No projects found)':
-                        _ui.messageBox('Select a project first to list its folders.')
-                        return
-                    data = _app.data
-                    project = None
-                    for p in list_projects(data):
-                        if p.name == proj_name:
-                            project = p
-                            break
-                    if not project:
-                        _ui.messageBox('Project not found.')
-                        return
-                    # Build a limited list of folder paths to keep it light
-                    paths = ['(Project root)']
-                    try:
-                        root = project.rootFolder
-                        # Only show first-level and second-level to avoid heavy traversal
-                        for i in range(root.dataFolders.count):
-                            f1 = root.dataFolders.item(i)
-                            paths.append(f1.name)
-                            # up to N children per folder to prevent overload
-                            n = min(20, f1.dataFolders.count)
-                            for j in range(n):
-                                f2 = f1.dataFolders.item(j)
-                                paths.append(f1.name + '/' + f2.name)
-                    except:
-                        pass
-                    # Show the list in a simple message (multiple pages if long)
-                    if not paths:
-                        _ui.messageBox('No folders found in this project.')
-                    else:
-                        # Chunk into blocks to avoid dialog limits
-                        chunk = []
-                        count = 0
-                        for pth in paths:
-                            chunk.append(pth)
-                            count += 1
-                            if len(chunk) >= 40:
-                                _ui.messageBox('\n'.join(chunk))
-                                chunk = []
-                        if chunk:
-                            _ui.messageBox('\n'.join(chunk))
+            # Folder dropdown: step into a subfolder or one level up
+            if changedInput.id == 'folderDD' and _dialog:
+                picked = _selected_name(adsk.core.DropDownCommandInput.cast(changedInput))
+                if picked == _FOLDER_UP:
+                    _dialog.show_folder('/'.join(_dialog.path.split('/')[:-1]))
+                elif picked and picked != _FOLDER_HERE:
+                    _dialog.show_folder(f"{_dialog.path}/{picked}" if _dialog.path else picked)
         except:
             _ui.messageBox('CmdInputChanged error:\n' + traceback.format_exc())
 
@@ -977,7 +1828,6 @@ class CmdExecute(adsk.core.CommandEventHandler):
             # Read dropdown selections
             hubDD = adsk.core.DropDownCommandInput.cast(inputs.itemById('hubDD'))
             projDD = adsk.core.DropDownCommandInput.cast(inputs.itemById('projDD'))
-            folderPathInput = adsk.core.StringValueCommandInput.cast(inputs.itemById('folderPath'))
             fmt3 = adsk.core.BoolValueCommandInput.cast(inputs.itemById('fmt3mf'))
             fmtS = adsk.core.BoolValueCommandInput.cast(inputs.itemById('fmtstl'))
             fmtO = adsk.core.BoolValueCommandInput.cast(inputs.itemById('fmtobj'))
@@ -986,16 +1836,82 @@ class CmdExecute(adsk.core.CommandEventHandler):
             otherExtsInput = adsk.core.StringValueCommandInput.cast(inputs.itemById('otherExts'))
             otherManifestInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('otherManifest'))
             exportDrawingDxfInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('exportDrawingDxf'))
+            hiddenOpenInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('hiddenOpen'))
+            componentCacheInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('componentCache'))
+            stageTimeoutsInput = adsk.core.StringValueCommandInput.cast(inputs.itemById('stageTimeouts'))
+            policyDD = adsk.core.DropDownCommandInput.cast(inputs.itemById('quarantinePolicy'))
+            watchInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('watchMode'))
+            watchIntervalInput = adsk.core.IntegerSpinnerCommandInput.cast(inputs.itemById('watchInterval'))
+            watchBackoffInput = adsk.core.FloatSpinnerCommandInput.cast(inputs.itemById('watchBackoff'))
+            watchMaxInput = adsk.core.IntegerSpinnerCommandInput.cast(inputs.itemById('watchMaxInterval'))
+            verifyInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('verifyOutput'))
+            dryRunInput = adsk.core.BoolValueCommandInput.cast(inputs.itemById('dryRun'))
+            dry_run = bool(dryRunInput and dryRunInput.value)
             out_dir = adsk.core.StringValueCommandInput.cast(inputs.itemById('outDir')).value.strip()
 
+            postStepsInput = adsk.core.StringValueCommandInput.cast(inputs.itemById('postSteps'))
+            try:
+                post_steps = postprocess.parse_steps(postStepsInput.value if postStepsInput else 'hash,validate')
+            except ValueError as ex:
+                _ui.messageBox(str(ex))
+                return
+
+            # Batch job: everything comes from the job file
+            jobFileInput = adsk.core.StringValueCommandInput.cast(inputs.itemById('jobFile'))
+            job_path = jobFileInput.value.strip() if jobFileInput and jobFileInput.value else ''
+            if job_path:
+                try:
+                    job = jobspec.load_job(job_path)
+                except jobspec.JobError as ex:
+                    _ui.messageBox(str(ex))
+                    return
+                if watchInput and watchInput.value:
+                    _ui.messageBox('Watch mode works on the folder picked in the dialog, not on a batch job.\n'
+                                   'Clear the job file or turn off Watch.')
+                    return
+                sessionsInput = adsk.core.IntegerSpinnerCommandInput.cast(inputs.itemById('jobSessions'))
+                sessions = sessionsInput.value if sessionsInput else 1
+                if dry_run:
+                    msg = _plan_job(_app, job)
+                    if sessions > 1 and not job.get('shard'):
+                        # Show how the files would be split, without writing shard jobs
+                        plan = shards.plan_shards(job, _JobFolders(_app.data).resolve, sessions, exportplan.TimingHistory())
+                        msg += '\n\n' + shards.format_plan(plan)
+                    _ui.messageBox(msg)
+                    _opts_ready = True
+                    return
+                if sessions > 1 and not job.get('shard'):
+                    # Only plan here; every shard job then runs in its own Fusion session
+                    plan = shards.plan_shards(job, _JobFolders(_app.data).resolve, sessions, exportplan.TimingHistory())
+                    paths = shards.write_shards(job, plan)
+                    _ui.messageBox(shards.format_plan(plan) + "\n\nRun each of these as the batch job of its own Fusion session:\n" +
+                                   '\n'.join(paths) + "\n\nThe session that finishes last merges the results into " + job['output'])
+                    _opts_ready = True
+                    return
+                results, switches = _run_job(_app, _ui, job, post_steps)
+                msg = f"Job done ({len(results)} targets, {switches} hub switches).\n\n" + jobspec.format_report(results)
+                msg += f"\n\nDetails: {os.path.join(job['output'], jobspec.RESULT_NAME)}"
+                if job.get('shard'):
+                    try:
+                        merged, missing = shards.merge_if_complete(job['shard']['plan'])
+                        if merged:
+                            msg += f"\n\nAll shards finished; merged result: {merged}"
+                        elif missing:
+                            msg += f"\n\nWaiting for shards {', '.join(map(str, missing))} before merging."
+                    except Exception as ex:
+                        msg += f"\n\nMerging shards failed: {ex}\nRun: python shards.py merge {job['shard']['plan']}"
+                _ui.messageBox(msg)
+                _opts_ready = True
+                return
+
             # Extract values
             proj = None
             for it in projDD.listItems:
                 if it.isSelected:
                     proj = it.name
                     break
-            # Use typed folder path
-            folder_path = folderPathInput.value.strip() if folderPathInput else ''
+            # Folder browsed to in the dialog
+            folder_path = _dialog.path if _dialog else ''
             selected_formats = []
             if fmt3 and fmt3.value:
                 selected_formats.append('3mf')
@@ -1006,10 +1922,10 @@ class CmdExecute(adsk.core.CommandEventHandler):
             if fmtD and fmtD.value:
                 selected_formats.append('dxf')
 
-            if not proj or proj == '(No projects found)':
+            if not proj or proj in ('(No projects found)', _LOADING):
                 _ui.messageBox('Please select a project.')
                 return
-            if not out_dir:
+            if not out_dir and not dry_run:
                 _ui.messageBox('Please choose an output folder where your 3D models will be saved.')
                 return
             if not selected_formats:
@@ -1025,21 +1941,21 @@ class CmdExecute(adsk.core.CommandEventHandler):
                     if it.isSelected:
                         sel_hub = it.name
                         break
-                if sel_hub and sel_hub != '(No hubs found)':
-                    for h in list_hubs(data):
-                        if h.name == sel_hub:
-                            try:
+                if sel_hub and sel_hub not in ('(No hubs found)', _LOADING):
+                    h = _dialog.hub_obj(sel_hub) if _dialog else next((x for x in list_hubs(data) if x.name == sel_hub), None)
+                    if h:
+                        try:
+                            if not data.activeHub or data.activeHub.name != sel_hub:
                                 data.activeHub = h
-                            except:
-                                pass
-                            break
+                        except:
+                            pass
 
-            prjs = list_projects(data)
-            project = None
-            for p in prjs:
-                if p.name == proj:
-                    project = p
-                    break
+            if _dialog:
+                project = _dialog.project_obj(_dialog.hub, proj)
+                _dialog.cache.select(hub=_dialog.hub, project=proj, folder=folder_path)
+                _dialog.cache.save()
+            else:
+                project = next((p for p in list_projects(data) if p.name == proj), None)
             if not project:
                 _ui.messageBox(f"Project not found: '{proj}'")
                 return
@@ -1054,34 +1970,96 @@ class CmdExecute(adsk.core.CommandEventHandler):
                 _ui.messageBox(f"Folder not found: '{folder_path}'")
                 return
 
-            ensure_dir(out_dir)
-
-            error_list = []
-            manifest = [] if (inclOther and inclOther.value and otherManifestInput and otherManifestInput.value) else None
             exts = None
             try:
                 raw = otherExtsInput.value if otherExtsInput else ''
                 exts = [s.strip() for s in raw.split(',') if s.strip()]
             except:
                 exts = None
-            stats = traverse_and_export(
-                _app,
-                _ui,
-                folder,
-                out_dir,
-                selected_formats,
-                True,
-                '',
-                error_list,
-                include_other_files=(inclOther.value if inclOther else False),
-                other_exts=exts,
-                manifest_list=manifest,
-                export_drawing_dxf=(exportDrawingDxfInput.value if exportDrawingDxfInput else False)
-            )
+            include_other = bool(inclOther and inclOther.value)
+
+            # Plan from metadata only; the same estimates drive the progress dialog
+            history = exportplan.TimingHistory()
+            plan = exportplan.build_plan(folder, selected_formats, exportplan.CostModel(history), include_other, exts)
+            if dry_run:
+                _ui.messageBox(exportplan.format_plan(plan))
+                _opts_ready = True
+                return
+
+            ensure_dir(out_dir)
+
+            try:
+                budgets = quarantine.parse_budgets(stageTimeoutsInput.value if stageTimeoutsInput else '')
+            except ValueError as ex:
+                _ui.messageBox(str(ex))
+                return
+            picked = _selected_name(policyDD) if policyDD else None
+            policy = next((n for n, label in _QUARANTINE_POLICIES if label == picked), 'skip')
+
+            comp_cache = _ComponentMeshCache() if (componentCacheInput and componentCacheInput.value) else None
+            watchdog = quarantine.Watchdog(budgets, policy)
+            if watchInput and watchInput.value:
+                interval = watchIntervalInput.value if watchIntervalInput else 60
+                backoff = watchBackoffInput.value if watchBackoffInput else 2.0
+                max_interval = watchMaxInput.value if watchMaxInput else interval * 15
+                try:
+                    wstats, totals, werrors = _run_watch(_app, _ui, folder, out_dir, selected_formats, interval, {
+                        'include_other_files': include_other,
+                        'other_exts': exts,
+                        'export_drawing_dxf': (exportDrawingDxfInput.value if exportDrawingDxfInput else False),
+                        'hidden_open': (hiddenOpenInput.value if hiddenOpenInput else True),
+                        'component_cache': comp_cache,
+                        'watchdog': watchdog,
+                    }, post_steps, backoff, max_interval)
+                finally:
+                    watchdog.close()
+                msg = (
+                    f"Stopped watching.\nPolls: {wstats['polls']} | Files exported: {wstats['exported']} | Failed: {wstats['failed']}\n"
+                    f"STL: {totals.get('stl',0)} | 3MF: {totals.get('3mf',0)} | OBJ: {totals.get('obj',0)} | Other files: {totals.get('other',0)}\n"
+                    f"Time spent polling: {wstats['tPoll']:.1f}s"
+                )
+                if werrors:
+                    msg += "\n\nFirst errors:\n" + "\n".join(werrors[:8])
+                msg += _quarantine_note(watchdog)
+                _ui.messageBox(msg)
+                _opts_ready = True
+                return
+
+            error_list = []
+            manifest = [] if (include_other and otherManifestInput and otherManifestInput.value) else None
+            progress = _RunProgress(_ui, exportplan.ProgressTracker(plan))
+            post = postprocess.PostProcessor(out_dir, post_steps) if post_steps else None
+            try:
+                stats = traverse_and_export(
+                    _app,
+                    _ui,
+                    folder,
+                    out_dir,
+                    selected_formats,
+                    True,
+                    '',
+                    error_list,
+                    include_other_files=include_other,
+                    other_exts=exts,
+                    manifest_list=manifest,
+                    export_drawing_dxf=(exportDrawingDxfInput.value if exportDrawingDxfInput else False),
+                    progress=progress,
+                    history=history,
+                    hidden_open=(hiddenOpenInput.value if hiddenOpenInput else True),
+                    component_cache=comp_cache,
+                    post=post,
+                    watchdog=watchdog
+                )
+            finally:
+                progress.close()
+                watchdog.close()
+                history.save()
+                post_line = _finish_post(post, out_dir)
 
             msg = (
-                f"Done.\nSTL: {stats['stl']} | 3MF: {stats['3mf']} | OBJ: {stats['obj']} | Other files: {stats.get('other',0)}\n"
-                f"Errors: {stats['errors']}\nDesigns processed: {stats['designs']}\nSkipped: {stats['skipped']}"
+                f"{'Cancelled' if stats.get('cancelled') else 'Done'}.\nSTL: {stats['stl']} | 3MF: {stats['3mf']} | OBJ: {stats['obj']} | Other files: {stats.get('other',0)}\n"
+                f"Errors: {stats['errors']}\nDesigns processed: {stats['designs']}\nSkipped: {stats['skipped']}\n"
+                f"Stage times: open {stats['tOpen']:.1f}s | export {stats['tExport']:.1f}s | close {stats['tClose']:.1f}s"
             )
             if stats['errors'] > 0 and error_list:
                 # Show up to first 8 error lines for quick diagnosis
@@ -1090,23 +2068,28 @@ class CmdExecute(adsk.core.CommandEventHandler):
             # Hint user if 3MF requested but STL fallback happened
             if ('3mf' in selected_formats) and stats['3mf'] == 0 and stats['stl'] > 0:
                 msg += "\n\nNote: 3MF export wasn't available for some designs; exported STL instead."
+            if post_line:
+                msg += '\n' + post_line
+            if comp_cache is not None:
+                msg += (f"\nComponent cache: {comp_cache.hits} hits ({comp_cache.refHits} on referenced designs), "
+                        f"{comp_cache.misses} tessellated, ~{comp_cache.saved:.1f}s saved")
+            msg += _quarantine_note(watchdog)
+            if stats.get('hiddenFallback', 0) > 0:
+                msg += "\n\nNote: this Fusion build needed visible documents; hidden opening was turned off for this session."
             # Note if DXF export for drawings isn't supported
             if stats.get('pdfFail', 0) > 0:
                 msg += "\n\nNote: Drawing-to-DXF export might not be supported in this Fusion build. Drawing files were added to log.txt."
             # If we captured a manifest list (because direct download isn’t supported), write it out
-            try:
-                if manifest is not None and len(manifest) > 0:
-                    manifest_path = os.path.join(out_dir, 'log.txt')
-                    with open(manifest_path, 'w', encoding='utf-8') as f:
-                        f.write('# Export log\n')
-                        f.write('# DXF export for Drawings: {}\n'.format('unsupported' if stats.get('pdfFail',0)>0 else 'attempted'))
-                        f.write('# The following files are present in Fusion but were not downloaded automatically:\n')
-                        for rel in manifest:
-                            f.write(rel + '\n')
-                    msg += f"\n\nOther files not downloaded automatically were listed in: {manifest_path}"
-            except:
-                pass
+            manifest_path = jobspec.write_export_log(out_dir, manifest, stats)
+            if manifest_path:
+                msg += f"\n\nOther files not downloaded automatically were listed in: {manifest_path}"
 
+            if verifyInput and verifyInput.value:
+                # Threads: Fusion's embedded interpreter can't start worker processes
+                try:
+                    msg += '\n\nVerify: ' + verify.format_report(verify.verify(out_dir, mode='thread'), 5)
+                except:
+                    msg += '\n\nVerify failed: ' + traceback.format_exc().splitlines()[-1]
             _ui.messageBox(msg)
 
             _opts_ready = True
@@ -0,0 +1,392 @@
+# ==== Bounding volume hierarchy for exported meshes ====
+# Interference and clearance checks between parts without testing every triangle
+# against every other one. Each mesh gets a binary BVH (median split on the longest
+# axis); two hierarchies are walked together breadth-first, one whole level of node
+# pairs per numpy step, discarding pairs whose boxes are farther apart than the
+# query distance. Only triangles in surviving leaf pairs get the exact tests
+# (Moeller triangle/triangle intersection, triangle/triangle distance).
+#
+#   python bvh.py ../Generation1/penholder.3mf --clearance 0.5      (bodies of one assembly)
+#   python bvh.py ../Generation2 --clearance 1                      (one part per file, as positioned)
+#
+# Needs numpy.
+
+import os, sys, time, argparse
+
+import numpy as np
+
+import meshfiles
+
+LEAF_SIZE = 8
+EPS = 1e-9
+CHUNK = 200_000  # triangle pairs per exact-test batch
+
+
+class BVH:
+    """Flat BVH over a triangle soup. Nodes are arrays indexed by node id; leaves
+    have left == -1 and own tris[start:start + count] (triangles are reordered)."""
+
+    def __init__(self, tris, leaf_size=LEAF_SIZE):
+        tris = np.ascontiguousarray(tris, dtype=np.float64).reshape(-1, 3, 3)
+        n = len(tris)
+        tlo, thi = tris.min(axis=1), tris.max(axis=1)
+        cent = (tlo + thi) * 0.5
+        order = np.arange(n)
+        lo, hi, left, right, start, count = [], [], [], [], [], []
+        # (node id, begin, end) of order still to be split
+        todo = [(0, 0, n)]
+        lo.append(None); hi.append(None); left.append(-1); right.append(-1); start.append(0); count.append(n)
+        while todo:
+            nid, s, e = todo.pop()
+            idx = order[s:e]
+            lo[nid] = tlo[idx].min(axis=0) if len(idx) else np.zeros(3)
+            hi[nid] = thi[idx].max(axis=0) if len(idx) else np.zeros(3)
+            start[nid], count[nid] = s, e - s
+            if e - s <= leaf_size:
+                continue
+            c = cent[idx]
+            axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+            mid = (e - s) // 2
+            order[s:e] = idx[np.argpartition(c[:, axis], mid)]
+            for _ in range(2):
+                lo.append(None); hi.append(None); left.append(-1); right.append(-1); start.append(0); count.append(0)
+            left[nid], right[nid] = len(lo) - 2, len(lo) - 1
+            todo.append((left[nid], s, s + mid))
+            todo.append((right[nid], s + mid, e))
+        self.tris = tris[order]
+        self.index = order  # original triangle index of tris[i]
+        self.lo = np.array(lo)
+        self.hi = np.array(hi)
+        self.left = np.array(left)
+        self.right = np.array(right)
+        self.start = np.array(start)
+        self.count = np.array(count)
+
+    @classmethod
+    def from_mesh(cls, vertices, faces, leaf_size=LEAF_SIZE):
+        return cls(np.asarray(vertices, np.float64)[np.asarray(faces)], leaf_size)
+
+    def __len__(self):
+        return len(self.tris)
+
+
+def _box_gap(lo1, hi1, lo2, hi2):
+    """Smallest distance between paired boxes (0 when they overlap)."""
+    d = np.maximum(0.0, np.maximum(lo1 - hi2, lo2 - hi1))
+    return np.sqrt((d * d).sum(axis=-1))
+
+
+def _box_span(lo1, hi1, lo2, hi2):
+    """Largest distance between points of paired boxes; an upper bound on the
+    distance between any triangle of one node and any of the other."""
+    d = np.maximum(np.abs(hi1 - lo2), np.abs(hi2 - lo1))
+    return np.sqrt((d * d).sum(axis=-1))
+
+
+def candidate_pairs(a, b, limit=0.0, shrink=False):
+    """Triangle index pairs (into a.tris, b.tris) whose leaf boxes are within limit.
+    With shrink=True limit is lowered level by level to the best guaranteed upper
+    bound, which turns the walk into a minimum-distance search.
+    Returns (ia, ib, limit, node pairs visited)."""
+    na = np.zeros(1, np.int64)
+    nb = np.zeros(1, np.int64)
+    leaves = []
+    visited = 0
+    while len(na):
+        visited += len(na)
+        gap = _box_gap(a.lo[na], a.hi[na], b.lo[nb], b.hi[nb])
+        if shrink:
+            limit = min(limit, float(_box_span(a.lo[na], a.hi[na], b.lo[nb], b.hi[nb]).min()))
+        keep = gap <= limit
+        na, nb = na[keep], nb[keep]
+        la, lb = a.left[na] < 0, b.left[nb] < 0
+        both = la & lb
+        if both.any():
+            leaves.append((na[both], nb[both]))
+        na, nb, la, lb = na[~both], nb[~both], la[~both], lb[~both]
+        # Descend into the bigger of the two nodes (or the only inner one)
+        split_a = ~la & (lb | (a.count[na] >= b.count[nb]))
+        sa, sb = na[split_a], nb[split_a]
+        ta, tb = na[~split_a], nb[~split_a]
+        na = np.concatenate((a.left[sa], a.right[sa], ta, ta))
+        nb = np.concatenate((sb, sb, b.left[tb], b.right[tb]))
+    if not leaves:
+        e = np.zeros(0, np.int64)
+        return e, e, limit, visited
+    la = np.concatenate([x for x, _ in leaves])
+    lb = np.concatenate([y for _, y in leaves])
+    if shrink:
+        keep = _box_gap(a.lo[la], a.hi[la], b.lo[lb], b.hi[lb]) <= limit
+        la, lb = la[keep], lb[keep]
+    # Expand leaf pairs into all their triangle pairs
+    ca, cb = a.count[la], b.count[lb]
+    per = ca * cb
+    pair = np.repeat(np.arange(len(la)), per)
+    k = np.arange(per.sum()) - np.repeat(np.cumsum(per) - per, per)
+    ia = a.start[la][pair] + k // cb[pair]
+    ib = b.start[lb][pair] + k % cb[pair]
+    # Triangle box prefilter
+    ta, tb = a.tris[ia], b.tris[ib]
+    keep = _box_gap(ta.min(axis=1), ta.max(axis=1), tb.min(axis=1), tb.max(axis=1)) <= limit
+    return ia[keep], ib[keep], limit, visited
+
+
+def _dot(x, y):
+    return np.einsum('ij,ij->i', x, y)
+
+
+def tri_tri_intersect(t1, t2):
+    """Moeller's interval test for (N,3,3) triangle pairs. Coplanar pairs return False;
+    tri_tri_distance reports 0 for touching/overlapping coplanar triangles."""
+    def plane(t):
+        n = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+        n /= np.maximum(np.linalg.norm(n, axis=1, keepdims=True), EPS)
+        return n, _dot(n, t[:, 0])
+
+    n1, o1 = plane(t1)
+    n2, o2 = plane(t2)
+    d1 = np.einsum('ikj,ij->ik', t1, n2) - o2[:, None]   # t1 vertices vs plane 2
+    d2 = np.einsum('ikj,ij->ik', t2, n1) - o1[:, None]
+    d1[np.abs(d1) < EPS] = 0.0
+    d2[np.abs(d2) < EPS] = 0.0
+    sep = ((d1 > 0).all(1) | (d1 < 0).all(1) | (d2 > 0).all(1) | (d2 < 0).all(1))
+    coplanar = (d1 == 0).all(1)
+    line = np.cross(n1, n2)
+    p1 = np.einsum('ikj,ij->ik', t1, line)
+    p2 = np.einsum('ikj,ij->ik', t2, line)
+
+    def interval(d, p):
+        lo = np.full(len(d), np.inf)
+        hi = np.full(len(d), -np.inf)
+        for i, j in ((0, 1), (1, 2), (2, 0)):
+            di, dj = d[:, i], d[:, j]
+            ok = (di * dj <= 0) & ~((di == 0) & (dj == 0))
+            den = np.where(di != dj, di - dj, 1.0)
+            x = p[:, i] + (p[:, j] - p[:, i]) * np.where(di != dj, di / den, 0.0)
+            lo = np.where(ok, np.minimum(lo, x), lo)
+            hi = np.where(ok, np.maximum(hi, x), hi)
+        return lo, hi
+
+    lo1, hi1 = interval(d1, p1)
+    lo2, hi2 = interval(d2, p2)
+    return ~sep & ~coplanar & (np.maximum(lo1, lo2) <= np.minimum(hi1, hi2))
+
+
+def point_tri_distance(p, t):
+    """Distance from points (N,3) to triangles (N,3,3)."""
+    a, b, c = t[:, 0], t[:, 1], t[:, 2]
+    n = np.cross(b - a, c - a)
+    nn = np.maximum(_dot(n, n), EPS * EPS)
+    # Barycentric coordinates of the projection onto the plane
+    w = p - a
+    u = _dot(np.cross(w, c - a), n) / nn
+    v = _dot(np.cross(b - a, w), n) / nn
+    inside = (u >= 0) & (v >= 0) & (u + v <= 1)
+    plane_d = np.abs(_dot(w, n)) / np.sqrt(nn)
+    edge_d = np.minimum(np.minimum(_point_seg(p, a, b), _point_seg(p, b, c)), _point_seg(p, c, a))
+    return np.where(inside, plane_d, edge_d)
+
+
+def _point_seg(p, a, b):
+    ab = b - a
+    s = np.clip(_dot(p - a, ab) / np.maximum(_dot(ab, ab), EPS * EPS), 0.0, 1.0)
+    return np.linalg.norm(p - (a + ab * s[:, None]), axis=1)
+
+
+def seg_seg_distance(p1, q1, p2, q2):
+    """Distance between segment pairs (Ericson, Real-Time Collision Detection 5.1.9)."""
+    d1, d2, r = q1 - p1, q2 - p2, p1 - p2
+    a = np.maximum(_dot(d1, d1), EPS * EPS)
+    e = np.maximum(_dot(d2, d2), EPS * EPS)
+    f = _dot(d2, r)
+    c = _dot(d1, r)
+    b = _dot(d1, d2)
+    den = a * e - b * b
+    s = np.where(den > EPS, np.clip((b * f - c * e) / np.where(den > EPS, den, 1.0), 0.0, 1.0), 0.0)
+    t = (b * s + f) / e
+    s = np.where(t < 0, np.clip(-c / a, 0.0, 1.0), np.where(t > 1, np.clip((b - c) / a, 0.0, 1.0), s))
+    t = np.clip(t, 0.0, 1.0)
+    return np.linalg.norm((p1 + d1 * s[:, None]) - (p2 + d2 * t[:, None]), axis=1)
+
+
+def tri_tri_distance(t1, t2):
+    """Distance between (N,3,3) triangle pairs; 0 where they intersect."""
+    d = np.full(len(t1), np.inf)
+    for k in range(3):
+        d = np.minimum(d, point_tri_distance(t1[:, k], t2))
+        d = np.minimum(d, point_tri_distance(t2[:, k], t1))
+        for m in range(3):
+            d = np.minimum(d, seg_seg_distance(t1[:, k], t1[:, (k + 1) % 3], t2[:, m], t2[:, (m + 1) % 3]))
+    return np.where(tri_tri_intersect(t1, t2), 0.0, d)
+
+
+def check_pair(a, b, clearance=0.0):
+    """Intersections and the closest approach (if within clearance) of two BVHs.
+    Returns {'intersecting': triangle pairs that cross (coplanar contact counts as
+    distance 0, not as crossing), 'distance': min distance or
+    None when the parts are farther apart than clearance, 'location': a point near
+    the worst spot, 'tested': exact tests run, 'nodes': node pairs visited}."""
+    ia, ib, _lim, visited = candidate_pairs(a, b, clearance)
+    hits, best, where = 0, None, None
+    for s in range(0, len(ia), CHUNK):
+        t1, t2 = a.tris[ia[s:s + CHUNK]], b.tris[ib[s:s + CHUNK]]
+        cross = tri_tri_intersect(t1, t2)
+        if cross.any():
+            if not hits:
+                i = int(np.argmax(cross))
+                best, where = 0.0, (t1[i].mean(axis=0) + t2[i].mean(axis=0)) / 2
+            hits += int(cross.sum())
+        if hits:
+            # Overlapping parts: the distance is 0, only the count is still of interest
+            continue
+        d = tri_tri_distance(t1, t2)
+        i = int(np.argmin(d))
+        if d[i] <= clearance and (best is None or d[i] < best):
+            best, where = float(d[i]), (t1[i].mean(axis=0) + t2[i].mean(axis=0)) / 2
+    return {'intersecting': hits, 'distance': best, 'location': None if where is None else [round(float(x), 3) for x in where],
+            'tested': int(len(ia)), 'nodes': visited}
+
+
+def min_distance(a, b):
+    """Exact minimum distance between two BVHs (0 if they touch or intersect)."""
+    ia, ib, _lim, _visited = candidate_pairs(a, b, np.inf, shrink=True)
+    best = np.inf
+    for s in range(0, len(ia), CHUNK):
+        best = min(best, float(tri_tri_distance(a.tris[ia[s:s + CHUNK]], b.tris[ib[s:s + CHUNK]]).min()))
+    return best
+
+
+def ray_tri(o, d, t, tmin=0.0):
+    """Moeller-Trumbore for (N,3) rays against (N,3,3) triangles; returns t (inf on a miss)."""
+    e1 = t[:, 1] - t[:, 0]
+    e2 = t[:, 2] - t[:, 0]
+    p = np.cross(d, e2)
+    det = _dot(e1, p)
+    ok = np.abs(det) > EPS
+    inv = 1.0 / np.where(ok, det, 1.0)
+    s = o - t[:, 0]
+    u = _dot(s, p) * inv
+    q = np.cross(s, e1)
+    v = _dot(d, q) * inv
+    dist = _dot(e2, q) * inv
+    hit = ok & (u >= 0) & (v >= 0) & (u + v <= 1) & (dist > tmin)
+    return np.where(hit, dist, np.inf)
+
+
+def intersect_rays(tree, origins, dirs, tmin=0.0, tmax=np.inf):
+    """Nearest hit of many rays at once. All rays descend the tree together, one
+    level of (ray, node) pairs per step; a pair is dropped when the ray misses the
+    node box or already has a closer hit. Returns (t, triangle index into the
+    original face order); t is inf and the index -1 where nothing was hit."""
+    o = np.asarray(origins, np.float64)
+    d = np.asarray(dirs, np.float64)
+    n = len(o)
+    best = np.full(n, float(tmax))
+    tri = np.full(n, -1, np.int64)
+    with np.errstate(divide='ignore'):
+        inv = 1.0 / d
+    ray = np.arange(n)
+    node = np.zeros(n, np.int64)
+    while len(ray):
+        with np.errstate(invalid='ignore'):
+            t1 = (tree.lo[node] - o[ray]) * inv[ray]
+            t2 = (tree.hi[node] - o[ray]) * inv[ray]
+        # 0 * inf on axis-parallel rays gives nan; treat it as "inside this slab"
+        tn = np.nanmax(np.where(np.isnan(t1), -np.inf, np.minimum(t1, t2)), axis=1)
+        tf = np.nanmin(np.where(np.isnan(t1), np.inf, np.maximum(t1, t2)), axis=1)
+        keep = (tn <= tf) & (tf >= tmin) & (tn < best[ray])
+        ray, node = ray[keep], node[keep]
+        leaf = tree.left[node] < 0
+        lr, ln = ray[leaf], node[leaf]
+        if len(lr):
+            cnt = tree.count[ln]
+            rr = np.repeat(lr, cnt)
+            k = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            ti = np.repeat(tree.start[ln], cnt) + k
+            for s in range(0, len(rr), CHUNK):
+                r_, t_ = rr[s:s + CHUNK], ti[s:s + CHUNK]
+                dist = ray_tri(o[r_], d[r_], tree.tris[t_], tmin)
+                np.minimum.at(best, r_, dist)
+                won = (dist == best[r_]) & (dist < np.inf)
+                tri[r_[won]] = t_[won]
+        ray, node = ray[~leaf], node[~leaf]
+        ray = np.concatenate((ray, ray))
+        node = np.concatenate((tree.left[node], tree.right[node]))
+    hit = tri >= 0
+    out = np.full(n, -1, np.int64)
+    out[hit] = tree.index[tri[hit]]
+    return np.where(hit, best, np.inf), out
+
+
+def load_parts(path, prefer='3mf'):
+    """[(name, vertices, faces)]: the bodies of one assembly file (3MF build objects
+    or OBJ groups), or one part per mesh file for a folder."""
+    if os.path.isdir(path):
+        parts = []
+        for p in meshfiles.find_meshes(path, prefer):
+            m = meshfiles.read_mesh(p)
+            parts.append((os.path.splitext(os.path.basename(p))[0], m.vertices, m.faces))
+        return parts
+    m = meshfiles.read_mesh(path)
+    if len(m.groups) <= 1:
+        return [(os.path.splitext(os.path.basename(path))[0], m.vertices, m.faces)]
+    parts = []
+    for gi, g in enumerate(m.groups):
+        sub = m.group_mesh(gi)
+        if len(sub.faces):
+            parts.append((f"{g}#{gi + 1}", sub.vertices, sub.faces))
+    return parts
+
+
+def check_parts(parts, clearance=0.0):
+    """Every pair of parts whose bounding boxes come within clearance gets a BVH
+    query; returns (rows for pairs with overlaps or gaps <= clearance, stats)."""
+    t0 = time.perf_counter()
+    trees = [BVH.from_mesh(v, f) for _n, v, f in parts]
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    lo = np.array([t.lo[0] for t in trees]).reshape(-1, 3)
+    hi = np.array([t.hi[0] for t in trees]).reshape(-1, 3)
+    i, j = np.triu_indices(len(parts), 1)
+    near = _box_gap(lo[i], hi[i], lo[j], hi[j]) <= clearance
+    rows, tested, all_pairs = [], 0, 0
+    for x, y in zip(i[near].tolist(), j[near].tolist()):
+        r = check_pair(trees[x], trees[y], clearance)
+        tested += r['tested']
+        all_pairs += len(trees[x]) * len(trees[y])
+        if r['intersecting'] or r['distance'] is not None:
+            r.update({'a': parts[x][0], 'b': parts[y][0]})
+            rows.append(r)
+    return rows, {'parts': len(parts), 'pairs': int(len(i)), 'nearPairs': int(near.sum()),
+                  'triPairsTested': tested, 'triPairsTotal': all_pairs,
+                  'tBuild': t_build, 'tQuery': time.perf_counter() - t0}
+
+
+def format_report(rows, st, clearance):
+    lines = []
+    for r in sorted(rows, key=lambda r: (r['distance'] if r['distance'] is not None else 0.0)):
+        if r['intersecting']:
+            what = f"OVERLAP ({r['intersecting']} crossing triangle pairs)"
+        elif r['distance'] == 0:
+            what = 'touching'
+        else:
+            what = f"clearance {r['distance']:.3f} mm"
+        lines.append(f"{r['a']}  <->  {r['b']}: {what} near {tuple(r['location'])}")
+    if not rows:
+        lines.append(f"No overlaps or gaps below {clearance:g} mm")
+    lines.append(
+        f"{st['parts']} parts, {st['pairs']} pairs ({st['nearPairs']} within box range); "
+        f"{st['triPairsTested']} exact triangle tests of {st['triPairsTotal']} possible; "
+        f"build {st['tBuild']:.3f}s, query {st['tQuery']:.3f}s")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Interference and clearance check between parts')
+    ap.add_argument('path', help='assembly file (3MF/OBJ, one part per body) or folder (one part per file)')
+    ap.add_argument('--clearance', type=float, default=0.0, help='report gaps at or below this many mm')
+    ap.add_argument('--prefer', choices=('3mf', 'stl'), default='3mf')
+    args = ap.parse_args()
+    rows, st = check_parts(load_parts(args.path, args.prefer), args.clearance)
+    print(format_report(rows, st, args.clearance))
+    sys.exit(1 if any(r['intersecting'] for r in rows) else 0)
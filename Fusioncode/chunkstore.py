@@ -0,0 +1,289 @@
+# ==== Content-defined chunk store ====
+# Backup storage that keeps every distinct piece of content once. Files are cut
+# where a rolling hash of the last 64 bytes hits a bit pattern (buzhash, computed for
+# a whole block at once with log2(64) shifted XOR passes in numpy), so an insert or
+# delete only changes the chunks around it instead of shifting every later chunk.
+# Chunks are zlib-compressed and named by sha256; a snapshot maps each relative path
+# to its chunk list (the recipe) and is all that's needed to restore the tree.
+#
+#   store/chunks/ab/ab12...       chunk data ('z' + zlib or 'r' + raw)
+#   store/snapshots/<name>.json   {path: {size, sha256, chunks: [[id, size], ...]}}
+#
+#   python chunkstore.py backup ../Generation2 store --name gen2
+#   python chunkstore.py restore store gen2 restored/
+#   python chunkstore.py stats store
+#   python chunkstore.py simulate ../Generation1 ../Generation2 --revisions 50
+#
+# Needs numpy.
+
+import os, sys, json, time, zlib, random, hashlib, tempfile, shutil, argparse
+
+import numpy as np
+
+WINDOW = 64
+MIN_CHUNK = 2 * 1024
+AVG_BITS = 13                 # cut probability 1/8192 -> ~8 KiB + MIN_CHUNK average
+MAX_CHUNK = 64 * 1024
+BLOCK = 8 * 1024 * 1024       # bytes hashed per numpy pass
+
+_TABLE = np.random.default_rng(0x5eed).integers(0, 2 ** 63, 256, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def _rotl(x, k):
+    k = np.uint64(k)
+    return (x << k) | (x >> (np.uint64(64) - k))
+
+
+def rolling_hash(data):
+    """Buzhash of the WINDOW bytes ending at every position of data (uint64 array).
+    h(i) = XOR over k < WINDOW of rotl(T[data[i-k]], k), built by doubling the window."""
+    h = _TABLE[np.frombuffer(data, np.uint8)]
+    w = 1
+    while w < WINDOW:
+        shifted = np.zeros_like(h)
+        shifted[w:] = _rotl(h[:-w], w)
+        h ^= shifted
+        w *= 2
+    return h
+
+
+def cut_points(data, min_size=MIN_CHUNK, avg_bits=AVG_BITS, max_size=MAX_CHUNK):
+    """Chunk end offsets for data (the last one is len(data))."""
+    n = len(data)
+    mask = np.uint64((1 << avg_bits) - 1)
+    cands = []
+    # Hash in blocks; each block re-reads the WINDOW-1 bytes before it
+    for s in range(0, n, BLOCK):
+        lo = max(0, s - WINDOW + 1)
+        h = rolling_hash(data[lo:s + BLOCK])
+        idx = np.flatnonzero((h & mask) == 0) + lo
+        cands.append(idx[idx >= max(s, WINDOW - 1)] + 1)
+    cuts, last = [], 0
+    for c in (np.concatenate(cands).tolist() if cands else []):
+        if c - last < min_size:
+            continue
+        while c - last > max_size:
+            last += max_size
+            cuts.append(last)
+        cuts.append(c)
+        last = c
+    while n - last > max_size:
+        last += max_size
+        cuts.append(last)
+    if last < n or not cuts:
+        cuts.append(n)
+    return cuts
+
+
+def fixed_cut_points(data, size=8 * 1024):
+    """Fixed-size chunking, for comparison."""
+    return list(range(size, len(data), size)) + [len(data)]
+
+
+class ChunkStore:
+    def __init__(self, root, level=6, chunker=cut_points):
+        self.root = root
+        self.level = level
+        self.chunker = chunker
+        self.stats = {'chunksNew': 0, 'chunksDup': 0, 'bytesIn': 0, 'bytesNew': 0, 'bytesWritten': 0}
+        os.makedirs(os.path.join(root, 'chunks'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'snapshots'), exist_ok=True)
+
+    def _chunk_path(self, cid):
+        return os.path.join(self.root, 'chunks', cid[:2], cid)
+
+    def put_bytes(self, data):
+        """Store data; returns its recipe."""
+        chunks, start = [], 0
+        mv = memoryview(data)
+        for end in self.chunker(data):
+            piece = mv[start:end]
+            cid = hashlib.sha256(piece).hexdigest()
+            p = self._chunk_path(cid)
+            if os.path.exists(p):
+                self.stats['chunksDup'] += 1
+            else:
+                z = zlib.compress(piece, self.level)
+                blob = b'z' + z if len(z) < len(piece) else b'r' + bytes(piece)
+                os.makedirs(os.path.dirname(p), exist_ok=True)
+                # Write-then-rename so concurrent writers of the same chunk can't tear it
+                tmp = f"{p}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp, p)
+                self.stats['chunksNew'] += 1
+                self.stats['bytesNew'] += end - start
+                self.stats['bytesWritten'] += len(blob)
+            chunks.append([cid, end - start])
+            start = end
+        self.stats['bytesIn'] += len(data)
+        return {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(), 'chunks': chunks}
+
+    def put_file(self, path):
+        with open(path, 'rb') as f:
+            return self.put_bytes(f.read())
+
+    def get_bytes(self, recipe, verify=True):
+        parts = []
+        for cid, _size in recipe['chunks']:
+            with open(self._chunk_path(cid), 'rb') as f:
+                blob = f.read()
+            parts.append(zlib.decompress(blob[1:]) if blob[:1] == b'z' else blob[1:])
+        data = b''.join(parts)
+        if verify and hashlib.sha256(data).hexdigest() != recipe['sha256']:
+            raise IOError('restored content does not match its recipe')
+        return data
+
+    def backup(self, tree, name):
+        """Store every file under tree as snapshot name."""
+        snap = {}
+        for dirpath, _dirs, files in os.walk(tree):
+            for fn in sorted(files):
+                p = os.path.join(dirpath, fn)
+                snap[os.path.relpath(p, tree).replace('\\', '/')] = self.put_file(p)
+        path = os.path.join(self.root, 'snapshots', name + '.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(snap, f)
+        return snap
+
+    def load_snapshot(self, name):
+        with open(os.path.join(self.root, 'snapshots', name + '.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def restore(self, name, dest):
+        """Rebuild snapshot name under dest; returns bytes restored."""
+        total = 0
+        for rel, recipe in self.load_snapshot(name).items():
+            out = os.path.join(dest, *rel.split('/'))
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            data = self.get_bytes(recipe)
+            with open(out, 'wb') as f:
+                f.write(data)
+            total += len(data)
+        return total
+
+    def usage(self):
+        """Logical bytes over all snapshots vs bytes on disk in chunks/."""
+        logical = 0
+        for fn in os.listdir(os.path.join(self.root, 'snapshots')):
+            if fn.endswith('.json'):
+                logical += sum(r['size'] for r in self.load_snapshot(fn[:-5]).values())
+        stored = n = 0
+        for dirpath, _dirs, files in os.walk(os.path.join(self.root, 'chunks')):
+            for fn in files:
+                stored += os.path.getsize(os.path.join(dirpath, fn))
+                n += 1
+        return {'logicalBytes': logical, 'storedBytes': stored, 'chunks': n,
+                'dedupRatio': logical / max(1, stored)}
+
+
+# Simulated revision history
+
+def _edit_file(path, rng):
+    """Mimic a design revision: rewrite part of the file and insert/delete a little,
+    the way a re-export after a local CAD change does."""
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    n = len(data)
+    if n < 256:
+        data += os.urandom(16)
+    elif path.lower().endswith('.stl') and n > 84:
+        tris = (n - 84) // 50
+        a = rng.randrange(tris)
+        k = max(1, tris // rng.choice((20, 50, 100)))
+        start, end = 84 + 50 * a, 84 + 50 * min(tris, a + k)
+        new = bytes(rng.getrandbits(8) for _ in range(50 * rng.randint(k // 2, k * 2)))
+        data[start:end] = new
+        data[80:84] = ((len(data) - 84) // 50).to_bytes(4, 'little')
+    else:
+        pos = rng.randrange(n)
+        cut = rng.randint(0, min(2048, n - pos))
+        data[pos:pos + cut] = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 2048)))
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def simulate(trees, revisions=50, files_per_rev=3, seed=1, chunker=cut_points, keep=None):
+    """Back up a working copy of trees, then `revisions` edited versions of it.
+    Returns a report dict (sizes, ratio, backup and restore throughput)."""
+    rng = random.Random(seed)
+    tmp = tempfile.mkdtemp(prefix='chunkstore-sim-')
+    work = os.path.join(tmp, 'work')
+    for t in trees:
+        shutil.copytree(t, os.path.join(work, os.path.basename(os.path.normpath(t))))
+    store = ChunkStore(keep or os.path.join(tmp, 'store'), chunker=chunker)
+    files = sorted(os.path.join(d, f) for d, _s, fs in os.walk(work) for f in fs)
+    t0 = time.perf_counter()
+    store.backup(work, 'rev000')
+    first = store.usage()
+    for r in range(1, revisions + 1):
+        for p in rng.sample(files, min(files_per_rev, len(files))):
+            _edit_file(p, rng)
+        store.backup(work, f'rev{r:03d}')
+    t_backup = time.perf_counter() - t0
+    use = store.usage()
+    t0 = time.perf_counter()
+    restored = store.restore(f'rev{revisions:03d}', os.path.join(tmp, 'restore'))
+    t_restore = time.perf_counter() - t0
+    if not keep:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        'revisions': revisions,
+        'treeBytes': first['logicalBytes'],
+        'firstStoredBytes': first['storedBytes'],
+        'logicalBytes': use['logicalBytes'],
+        'storedBytes': use['storedBytes'],
+        'chunks': use['chunks'],
+        'dedupRatio': use['dedupRatio'],
+        'backupMBs': use['logicalBytes'] / 1e6 / max(t_backup, 1e-9),
+        'restoreMBs': restored / 1e6 / max(t_restore, 1e-9),
+    }
+
+
+def _mb(b):
+    return f"{b / 1e6:.1f} MB"
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Deduplicating chunk store for export trees')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('backup')
+    b.add_argument('tree')
+    b.add_argument('store')
+    b.add_argument('--name', default=time.strftime('%Y%m%d-%H%M%S'))
+    r = sub.add_parser('restore')
+    r.add_argument('store')
+    r.add_argument('name')
+    r.add_argument('dest')
+    s = sub.add_parser('stats')
+    s.add_argument('store')
+    m = sub.add_parser('simulate', help='store a tree plus N edited revisions and report dedup')
+    m.add_argument('trees', nargs='+')
+    m.add_argument('--revisions', type=int, default=50)
+    m.add_argument('--files', type=int, default=3, help='files edited per revision')
+    args = ap.parse_args()
+    if args.cmd == 'backup':
+        cs = ChunkStore(args.store)
+        t0 = time.perf_counter()
+        snap = cs.backup(args.tree, args.name)
+        secs = time.perf_counter() - t0
+        st = cs.stats
+        print(f"{args.name}: {len(snap)} files, {_mb(st['bytesIn'])} in {secs:.2f}s "
+              f"({st['bytesIn'] / 1e6 / max(secs, 1e-9):.0f} MB/s); {st['chunksNew']} new chunks "
+              f"({_mb(st['bytesNew'])} raw, {_mb(st['bytesWritten'])} written), {st['chunksDup']} already stored")
+    elif args.cmd == 'restore':
+        t0 = time.perf_counter()
+        n = ChunkStore(args.store).restore(args.name, args.dest)
+        secs = time.perf_counter() - t0
+        print(f"restored {_mb(n)} in {secs:.2f}s ({n / 1e6 / max(secs, 1e-9):.0f} MB/s)")
+    elif args.cmd == 'stats':
+        u = ChunkStore(args.store).usage()
+        print(f"{_mb(u['logicalBytes'])} in snapshots, {_mb(u['storedBytes'])} stored in {u['chunks']} chunks "
+              f"(dedup ratio {u['dedupRatio']:.1f}x)")
+    else:
+        for label, chunker in (('content-defined', cut_points), ('fixed 8 KiB', fixed_cut_points)):
+            rep = simulate(args.trees, args.revisions, args.files, chunker=chunker)
+            print(f"{label}: tree {_mb(rep['treeBytes'])} -> {_mb(rep['firstStoredBytes'])} stored; "
+                  f"{rep['revisions']} revisions = {_mb(rep['logicalBytes'])} logical -> {_mb(rep['storedBytes'])} stored "
+                  f"({rep['dedupRatio']:.1f}x), backup {rep['backupMBs']:.0f} MB/s, restore {rep['restoreMBs']:.0f} MB/s")
+    sys.exit(0)
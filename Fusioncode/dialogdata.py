@@ -0,0 +1,376 @@
+# ==== Dialog data (cached, paged hub/project/folder lists) ====
+# Pure-Python helpers used by FolderToGit.py so the export dialog opens at once
+# instead of after every hub and project has been listed:
+#
+# 1) DialogCache remembers hub, project and folder names (and the last selection)
+#    between runs; the dropdowns are filled from it before Fusion is asked anything.
+# 2) PagedLoader reads Fusion collections (count/item) one page at a time. The
+#    add-in calls step() from a custom event that a timer thread fires while there
+#    is work (Fusion API calls must stay on the main thread), applies the pages to
+#    the dropdowns and gives control back to Fusion in between.
+# 3) merge_names() turns the names on screen plus fresh pages into add/remove edits,
+#    so cached entries don't jump around while pages arrive.
+#
+#   python dialogdata.py bench --projects 500 --latency-ms 4
+#   python dialogdata.py check     # a listing that fails part way is not treated as complete
+#
+# The benchmark uses a fake data backend with slow collections and compares the old
+# synchronous listing against the cold-cache and warm-cache paged loader.
+
+import os, sys, json, time, argparse
+
+import exportplan
+
+CACHE_NAME = 'dialog_cache.json'
+PAGE_SIZE = 25
+STEP_BUDGET_S = 0.05        # longest the UI is held per step (at least one page is read)
+RETRIES = 1                 # a listing that raises is read again once from where it stopped
+MAX_FOLDER_KEYS = 400       # folder listings kept in the cache, least recently used dropped
+ROOT = '(Project root)'
+
+
+def default_cache_path():
+    return os.path.join(exportplan._state_dir(), CACHE_NAME)
+
+
+def folder_key(hub, project, path):
+    return '|'.join((hub or '', project or '', path or ''))
+
+
+class DialogCache:
+    """Names seen in earlier dialogs, stored as JSON.
+    Layout:
+      hubs:      [name]
+      projects:  {hub: [name]}
+      folders:   {hub|project|path: [child folder name]}
+      selection: {hub, project, folder}
+    """
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        self.hubs = []
+        self.projects = {}
+        self.folders = {}
+        self.selection = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            self.hubs = list(raw.get('hubs') or [])
+            self.projects = dict(raw.get('projects') or {})
+            self.folders = dict(raw.get('folders') or {})
+            self.selection = dict(raw.get('selection') or {})
+        except:
+            pass
+
+    def set(self, kind, key, names):
+        names = list(names)
+        if kind == 'hubs':
+            changed, self.hubs = self.hubs != names, names
+        elif kind == 'projects':
+            changed = self.projects.get(key) != names
+            self.projects[key] = names
+        else:
+            changed = self.folders.get(key) != names
+            self.folders.pop(key, None)
+            self.folders[key] = names   # most recently used last
+            while len(self.folders) > MAX_FOLDER_KEYS:
+                del self.folders[next(iter(self.folders))]
+        self.dirty = self.dirty or changed
+
+    def get(self, kind, key=''):
+        if kind == 'hubs':
+            return list(self.hubs)
+        return list((self.projects if kind == 'projects' else self.folders).get(key) or [])
+
+    def select(self, **sel):
+        if any(self.selection.get(k) != v for k, v in sel.items()):
+            self.selection.update(sel)
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            d = os.path.dirname(self.path)
+            if d and not os.path.exists(d):
+                os.makedirs(d, exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'hubs': self.hubs, 'projects': self.projects, 'folders': self.folders,
+                           'selection': self.selection}, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except:
+            pass
+
+
+def merge_names(current, fresh, done):
+    """Edits that bring a dropdown from `current` towards `fresh`: (add, remove).
+    Names are only removed once the listing is complete."""
+    have, new = set(current), set(fresh)
+    add = [n for n in fresh if n not in have]
+    remove = [n for n in current if n not in new] if done else []
+    return add, remove
+
+
+class PagedLoader:
+    """Lists Fusion collections a page at a time.
+    request() queues a listing; step() reads pages until its time budget is used and
+    returns one update per listing it touched:
+      {'kind', 'key', 'names' (everything read so far), 'done', 'error'}
+    A listing that fails is retried once from the item it stopped at; if it fails
+    again it is dropped with done=False, so request() can queue it again and the
+    caller keeps what it already shows. Objects stay available through get() for
+    resolving a selection later.
+    """
+    def __init__(self, page_size=PAGE_SIZE, clock=time.perf_counter):
+        self.page_size = page_size
+        self.clock = clock
+        self.tasks = []
+        self.done = {}      # (kind, key) -> {name: object}
+
+    def request(self, kind, key, source, keep=None, front=False, refresh=False):
+        """Queue listing source() (called when the task starts, since getting the
+        collection can be a round trip itself). keep(item) filters items.
+        Returns False when the listing is already loaded or queued."""
+        tid = (kind, key)
+        for t in self.tasks:
+            if t['id'] == tid:
+                if front:
+                    self.tasks.remove(t)
+                    self.tasks.insert(0, t)
+                return False
+        if tid in self.done and not refresh:
+            return False
+        task = {'id': tid, 'source': source, 'keep': keep, 'coll': None, 'n': 0, 'i': 0, 'objects': {}, 'retries': 0}
+        if front:
+            self.tasks.insert(0, task)
+        else:
+            self.tasks.append(task)
+        return True
+
+    def busy(self):
+        return bool(self.tasks)
+
+    def loaded(self, kind, key):
+        return (kind, key) in self.done
+
+    def get(self, kind, key, name):
+        objs = self.done.get((kind, key))
+        if objs is None:
+            for t in self.tasks:
+                if t['id'] == (kind, key):
+                    objs = t['objects']
+        return (objs or {}).get(name)
+
+    def _page(self, t):
+        if t['coll'] is None:
+            t['coll'] = t['source']()
+            t['n'] = t['coll'].count
+        end = min(t['n'], t['i'] + self.page_size)
+        for i in range(t['i'], end):
+            item = t['coll'].item(i)
+            try:
+                if t['keep'] is not None and not t['keep'](item):
+                    continue
+                t['objects'].setdefault(item.name, item)
+            except:
+                pass
+        t['i'] = end
+        return end >= t['n']
+
+    def step(self, budget_s=STEP_BUDGET_S):
+        t0 = self.clock()
+        updates = {}
+        while self.tasks:
+            t = self.tasks[0]
+            error = None
+            try:
+                finished = self._page(t)
+            except Exception as ex:
+                finished, error = False, str(ex)
+                if t['retries'] < RETRIES:
+                    t['retries'] += 1
+                    t['coll'] = None        # fetch the collection again, resume at t['i']
+                    error = None
+                else:
+                    self.tasks.pop(0)
+            if finished:
+                self.tasks.pop(0)
+                self.done[t['id']] = t['objects']
+            updates[t['id']] = {'kind': t['id'][0], 'key': t['id'][1], 'names': list(t['objects']),
+                                'done': finished, 'error': error}
+            if self.clock() - t0 >= budget_s:
+                break
+        return list(updates.values())
+
+
+# Benchmark: fake data backend with slow collections
+
+class _SlowCollection:
+    """Fusion-like collection: count is one round trip, every item() a little more."""
+    def __init__(self, items, latency):
+        self._items = items
+        self._latency = latency
+
+    @property
+    def count(self):
+        time.sleep(self._latency)
+        return len(self._items)
+
+    def item(self, i):
+        time.sleep(self._latency / 4)
+        return self._items[i]
+
+
+class _FakeFolder:
+    def __init__(self, name, subs, latency):
+        self.name = name
+        self.dataFolders = _SlowCollection(subs, latency)
+
+
+class _FakeProject:
+    def __init__(self, name, latency):
+        self.name = name
+        self.isArchived = False
+        self.rootFolder = _FakeFolder('root', [_FakeFolder(f"folder{i}", [], latency) for i in range(12)], latency)
+
+
+class _FakeHub:
+    def __init__(self, name, n_projects, latency):
+        self.name = name
+        self.dataProjects = _SlowCollection([_FakeProject(f"{name}-project{i:04d}", latency) for i in range(n_projects)], latency)
+
+
+class FakeData:
+    def __init__(self, hubs=3, projects=500, latency=0.004):
+        self.dataHubs = _SlowCollection([_FakeHub(f"hub{h}", projects, latency) for h in range(hubs)], latency)
+        self.activeHub = self.dataHubs._items[0]
+
+    @property
+    def dataProjects(self):
+        return self.activeHub.dataProjects
+
+
+def _bench_sync(data):
+    """What the dialog used to do before showing: every hub, then every project."""
+    t0 = time.perf_counter()
+    hubs = [data.dataHubs.item(i) for i in range(data.dataHubs.count)]
+    projs = data.dataProjects
+    projects = [p for p in (projs.item(i) for i in range(projs.count)) if not getattr(p, 'isArchived', False)]
+    t = time.perf_counter() - t0
+    return {'dialog': t, 'first': t, 'all': t, 'block': t, 'hubs': len(hubs), 'projects': len(projects)}
+
+
+def _bench_paged(data, cache):
+    t0 = time.perf_counter()
+    hub = cache.selection.get('hub') or data.activeHub.name
+    on_screen = cache.get('projects', hub)
+    t_dialog = time.perf_counter() - t0
+    loader = PagedLoader()
+    loader.request('projects', hub, lambda: data.activeHub.dataProjects, keep=lambda p: not getattr(p, 'isArchived', False))
+    loader.request('hubs', '', lambda: data.dataHubs)
+    first = t_dialog if on_screen else None
+    block = 0.0
+    t_all = None
+    while loader.busy():
+        s = time.perf_counter()
+        for u in loader.step():
+            if u['done']:
+                cache.set(u['kind'], u['key'], u['names'])
+            if u['kind'] == 'projects':
+                add, remove = merge_names(on_screen, u['names'], u['done'])
+                gone = set(remove)
+                on_screen = [n for n in on_screen if n not in gone] + add
+                if first is None and on_screen:
+                    first = time.perf_counter() - t0
+                if u['done']:
+                    t_all = time.perf_counter() - t0
+        block = max(block, time.perf_counter() - s)
+    cache.select(hub=hub)
+    return {'dialog': t_dialog, 'first': first, 'all': t_all, 'block': block, 'projects': len(on_screen)}
+
+
+class _FlakyCollection:
+    """Collection whose item(fail_at) raises the first `failures` times it is read."""
+    def __init__(self, items, fail_at, failures):
+        self._items = items
+        self.fail_at = fail_at
+        self.failures = failures
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def item(self, i):
+        if i == self.fail_at and self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError(f"item {i}: connection lost")
+        return self._items[i]
+
+
+def check():
+    """A listing that fails part way is retried, and when it keeps failing it is not
+    reported as complete: no entries are dropped and it can be requested again."""
+    items = [_FakeFolder(f"folder{i:02d}", [], 0.0) for i in range(60)]
+
+    def run(coll):
+        loader = PagedLoader(clock=lambda: 0.0)
+        assert loader.request('folders', 'k', lambda: coll)
+        last = None
+        while loader.busy():
+            for u in loader.step(budget_s=1.0):
+                last = u
+        return loader, last
+
+    loader, u = run(_FlakyCollection(items, 30, 1))
+    assert u['done'] and not u['error'] and len(u['names']) == 60, u
+    assert loader.loaded('folders', 'k')
+
+    coll = _FlakyCollection(items, 30, 2)
+    loader, u = run(coll)
+    assert not u['done'] and u['error'] and len(u['names']) == 30, u
+    assert not loader.loaded('folders', 'k')
+    shown = [it.name for it in items]               # cached list on screen
+    add, remove = merge_names(shown, u['names'], u['done'])
+    assert add == [] and remove == [], (add, remove)
+    assert loader.request('folders', 'k', lambda: coll), 'failed listing must be re-requestable'
+    while loader.busy():
+        for u in loader.step(budget_s=1.0):
+            pass
+    assert u['done'] and len(u['names']) == 60 and loader.loaded('folders', 'k'), u
+    print('OK: retried listing completes; failed listing keeps cached entries and can be requested again')
+    return True
+
+
+def bench(projects=500, hubs=3, latency=0.004):
+    import tempfile
+    data = FakeData(hubs, projects, latency)
+    path = os.path.join(tempfile.mkdtemp(prefix='dialogdata_'), CACHE_NAME)
+    print(f"fake backend: {hubs} hubs x {projects} projects, {latency * 1000:.1f} ms per count, {latency * 250:.1f} ms per item")
+    rows = [('synchronous (old)', _bench_sync(data))]
+    cache = DialogCache(path)
+    rows.append(('paged, empty cache', _bench_paged(data, cache)))
+    cache.save()
+    rows.append(('paged, warm cache', _bench_paged(data, DialogCache(path))))
+    print(f"{'':20} {'to dialog':>10} {'1st project':>12} {'all projects':>13} {'longest UI block':>17}")
+    for name, r in rows:
+        print(f"{name:20} {r['dialog']:9.3f}s {r['first']:11.3f}s {r['all']:12.3f}s {r['block']:16.3f}s")
+    os.remove(path)
+    return rows
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Dialog data loader tools')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('bench', help='time-to-dialog and time-to-first-project against a fake backend')
+    b.add_argument('--projects', type=int, default=500)
+    b.add_argument('--hubs', type=int, default=3)
+    b.add_argument('--latency-ms', type=float, default=4.0)
+    sub.add_parser('check', help='listing that fails part way: retry, no completion, no dropped entries')
+    args = ap.parse_args()
+    if args.cmd == 'check':
+        check()
+    else:
+        bench(args.projects, args.hubs, args.latency_ms / 1000.0)
+    sys.exit(0)
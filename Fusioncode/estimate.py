@@ -0,0 +1,158 @@
+# ==== Filament and print-time estimator ====
+# Rough slicer-free numbers straight from the exported meshes, for budgeting:
+#   volume      signed tetrahedron sum
+#   shell       side walls (perimeters) + top/bottom solid layers, from face areas
+#               split by slope: a face adds area*sqrt(1-nz^2) of outline per unit
+#               height and area*|nz| of flat surface
+#   infill      the rest of the volume at the infill ratio
+#   time        extrusion path lengths over per-feature speeds plus a per-layer cost
+# Meshes are used as exported (Z up); nothing is sliced, so expect +-15% against a
+# real slicer.
+#
+#   python estimate.py D:/FusionBackup --material PETG --infill 15 --walls 3
+#
+# Writes filament_estimate.json next to the export manifest. Needs numpy.
+
+import os, sys, json, time, argparse
+
+import numpy as np
+
+import meshfiles
+
+ESTIMATE_NAME = 'filament_estimate.json'
+
+DENSITY = {'PLA': 1.24, 'PETG': 1.27, 'ABS': 1.04, 'ASA': 1.07, 'TPU': 1.21, 'NYLON': 1.14}  # g/cm3
+
+PROFILE = {
+    'material': 'PLA',
+    'layer_height': 0.2,      # mm
+    'line_width': 0.45,       # mm
+    'walls': 2,
+    'top_layers': 4,
+    'bottom_layers': 4,
+    'infill': 0.2,            # 0..1
+    'filament_diameter': 1.75,
+    'perimeter_speed': 40.0,  # mm/s
+    'solid_speed': 50.0,
+    'infill_speed': 80.0,
+    'layer_seconds': 1.0,     # layer change, retracts, ...
+    'travel_factor': 1.15,    # travel moves on top of extrusion time
+}
+
+
+def mesh_metrics(vertices, faces):
+    """Geometry the estimate needs, all in mm units."""
+    v = np.asarray(vertices, np.float64)
+    f = np.asarray(faces, np.int64)
+    if not len(f):
+        return {'volume': 0.0, 'area': 0.0, 'outline': 0.0, 'up': 0.0, 'down': 0.0, 'height': 0.0}
+    t = v[f]
+    cr = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+    dbl = np.linalg.norm(cr, axis=1)
+    area = 0.5 * dbl
+    nz = np.divide(cr[:, 2], dbl, out=np.zeros(len(f)), where=dbl > 0)
+    vol = np.einsum('ij,ij->i', t[:, 0], np.cross(t[:, 1], t[:, 2])).sum() / 6.0
+    return {
+        'volume': abs(float(vol)),
+        'area': float(area.sum()),
+        'outline': float((area * np.sqrt(np.maximum(0.0, 1 - nz * nz))).sum()),  # integral of outline length over z
+        'up': float((area * np.maximum(nz, 0)).sum()),
+        'down': float((area * np.maximum(-nz, 0)).sum()),
+        'height': float(v[:, 2].max() - v[:, 2].min()),
+    }
+
+
+def estimate(m, profile=None):
+    """Mass, filament length and print time for one part's metrics."""
+    p = dict(PROFILE, **(profile or {}))
+    h, w = p['layer_height'], p['line_width']
+    walls_vol = m['outline'] * p['walls'] * w
+    solid_vol = (m['up'] * p['top_layers'] + m['down'] * p['bottom_layers']) * h
+    shell = min(m['volume'], walls_vol + solid_vol)
+    # Split the clamped shell back over walls/solid for the time estimate
+    k = shell / (walls_vol + solid_vol) if walls_vol + solid_vol > 0 else 0.0
+    infill = (m['volume'] - shell) * p['infill']
+    used = shell + infill                                  # mm3 of plastic
+    r = p['filament_diameter'] / 2
+    bead = w * h
+    seconds = ((walls_vol * k / bead) / p['perimeter_speed']
+               + (solid_vol * k / bead) / p['solid_speed']
+               + (infill / bead) / p['infill_speed']) * p['travel_factor']
+    layers = int(np.ceil(m['height'] / h)) if m['height'] > 0 else 0
+    seconds += layers * p['layer_seconds']
+    return {
+        'volumeCm3': m['volume'] / 1000.0,
+        'areaCm2': m['area'] / 100.0,
+        'shellCm3': shell / 1000.0,
+        'infillCm3': infill / 1000.0,
+        'grams': used / 1000.0 * DENSITY.get(str(p['material']).upper(), DENSITY['PLA']),
+        'meters': used / (np.pi * r * r) / 1000.0,
+        'layers': layers,
+        'perimeterM': m['outline'] / h * p['walls'] / 1000.0,
+        'seconds': float(seconds),
+    }
+
+
+def estimate_file(path, profile=None):
+    m = meshfiles.read_mesh(path)
+    return estimate(mesh_metrics(m.vertices, m.faces), profile)
+
+
+def estimate_tree(root, profile=None, prefer='stl'):
+    """Estimate every design under root (one mesh per design; binary STL reads fastest)."""
+    t0 = time.perf_counter()
+    parts = []
+    for p in meshfiles.find_meshes(root, prefer, recursive=True):
+        e = estimate_file(p, profile)
+        e['path'] = os.path.relpath(p, root).replace('\\', '/')
+        parts.append(e)
+    total = {k: sum(e[k] for e in parts) for k in ('grams', 'meters', 'seconds', 'volumeCm3')}
+    return {
+        'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'profile': dict(PROFILE, **(profile or {})),
+        'total': total,
+        'parts': parts,
+        'elapsed': time.perf_counter() - t0,
+    }
+
+
+def write_estimate(root, data):
+    path = os.path.join(root, ESTIMATE_NAME)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+def _hms(s):
+    s = int(round(s))
+    return f"{s // 3600}h{s % 3600 // 60:02d}m"
+
+
+def format_report(data):
+    lines = [f"{'part':40} {'cm3':>7} {'g':>7} {'m':>7} {'layers':>6} {'time':>7}"]
+    for e in data['parts']:
+        lines.append(f"{e['path'][-40:]:40} {e['volumeCm3']:7.1f} {e['grams']:7.1f} {e['meters']:7.2f} {e['layers']:6} {_hms(e['seconds']):>7}")
+    t, p = data['total'], data['profile']
+    lines.append(f"total: {t['grams']:.0f} g {p['material']} ({t['meters']:.1f} m), {_hms(t['seconds'])} printing; "
+                 f"{len(data['parts'])} parts estimated in {data['elapsed'] * 1000:.0f} ms")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Estimate filament use and print time of an export tree')
+    ap.add_argument('root')
+    ap.add_argument('--material', default=PROFILE['material'], type=str.upper, choices=sorted(DENSITY))
+    ap.add_argument('--infill', type=float, default=PROFILE['infill'] * 100, help='percent')
+    ap.add_argument('--walls', type=int, default=PROFILE['walls'])
+    ap.add_argument('--layer-height', type=float, default=PROFILE['layer_height'])
+    ap.add_argument('--prefer', choices=('stl', '3mf'), default='stl')
+    ap.add_argument('--no-write', action='store_true', help=f"don't write {ESTIMATE_NAME}")
+    args = ap.parse_args()
+    data = estimate_tree(args.root, {'material': args.material, 'infill': args.infill / 100.0,
+                                     'walls': args.walls, 'layer_height': args.layer_height}, args.prefer)
+    print(format_report(data))
+    if not args.no_write:
+        print(write_estimate(args.root, data))
+    sys.exit(0)
@@ -0,0 +1,374 @@
+# ==== Export planning (dry-run + ETA) ====
+# Pure-Python helpers used by FolderToGit.py. Nothing in here imports adsk, so the
+# planner can be exercised offline against any object that looks like a Fusion
+# DataFolder (dataFiles, dataFolders.count/item, name, fileExtension, id, versionNumber).
+#
+# 1) enumerate_folder() lists a folder tree from metadata only (no document is opened)
+# 2) TimingHistory keeps per-design timings from previous runs on the local disk
+# 3) CostModel turns history + file size into a per-design estimate
+# 4) build_plan()/format_plan() produce the dry-run summary
+# 5) ProgressTracker drives the remaining-time estimate during a real run
+
+import os, json, time
+
+DESIGN_EXTS = ('f3d', 'f3z')
+
+# Fallback costs used until the local history has samples for a format.
+# Seconds are per design; bytes are per MB of source design (or per design when size is unknown).
+DEFAULT_OPEN_SECONDS = 6.0
+DEFAULT_FORMAT_SECONDS = {'3mf': 3.0, 'stl': 2.0, 'obj': 2.5, 'dxf': 1.5}
+DEFAULT_FORMAT_BYTES = {'3mf': 150000, 'stl': 400000, 'obj': 700000, 'dxf': 40000}
+DEFAULT_OTHER_SECONDS = 1.0
+
+
+def _state_dir():
+    """Directory for local state shared across runs (timing history etc.)."""
+    base = os.environ.get('FOLDER3DEXPORT_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.folder3dexport')
+    return base
+
+
+def default_history_path():
+    return os.path.join(_state_dir(), 'timings.json')
+
+
+def datafile_size(df):
+    """Best-effort size in bytes of a DataFile from metadata only; 0 when unknown.
+    Not every Fusion build exposes a size, so a few attribute names are tried.
+    """
+    for attr in ('size', 'fileSize', 'dataSize'):
+        try:
+            v = getattr(df, attr, None)
+            if v:
+                return int(v)
+        except:
+            pass
+    return 0
+
+
+def datafile_key(df):
+    """Stable key for a DataFile: its id when available, otherwise its name."""
+    try:
+        k = getattr(df, 'id', None)
+        if k:
+            return str(k)
+    except:
+        pass
+    return str(getattr(df, 'name', ''))
+
+
+def datafile_version(df):
+    try:
+        return int(getattr(df, 'versionNumber', 0) or 0)
+    except:
+        return 0
+
+
+def iter_items(coll):
+    """Iterate a Fusion collection (count/item) or a plain Python iterable."""
+    if coll is None:
+        return
+    if hasattr(coll, 'count') and hasattr(coll, 'item') and not isinstance(coll, (list, tuple)):
+        for i in range(coll.count):
+            yield coll.item(i)
+    else:
+        for it in coll:
+            yield it
+
+
+def enumerate_folder(folder, rel_path='', file_filter=None):
+    """Walk a data folder tree and return a list of plan entries (dicts) in the same
+    order traverse_and_export visits them: files of a folder first, then subfolders.
+    Only metadata is read.
+    """
+    entries = []
+    for df in iter_items(folder.dataFiles):
+        try:
+            if file_filter is not None and not file_filter(rel_path, df):
+                continue
+            name = df.name
+            ext = (df.fileExtension or '').lower()
+            entries.append({
+                'key': datafile_key(df),
+                'name': name,
+                'rel': rel_path,
+                'ext': ext,
+                'kind': 'design' if ext in DESIGN_EXTS else 'other',
+                'version': datafile_version(df),
+                'size': datafile_size(df),
+            })
+        except:
+            pass
+    for sub in iter_items(folder.dataFolders):
+        sub_rel = os.path.join(rel_path, sub.name) if rel_path else sub.name
+        entries.extend(enumerate_folder(sub, sub_rel, file_filter))
+    return entries
+
+
+class TimingHistory:
+    """Per-design timings of previous runs, stored as JSON.
+    Layout:
+      files:  {key: {version, size, open, formats: {fmt: {seconds, bytes}}}}
+      totals: {fmt|'open'|'other': {n, seconds, bytes, inBytes}}
+    save() re-reads the file and applies only this session's records, so several
+    Fusion sessions (sharded jobs) can share one history.
+    """
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        self.files = {}
+        self.totals = {}
+        self.dirty = False
+        self._new_files = {}
+        self._new_totals = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            self.files = raw.get('files', {}) or {}
+            self.totals = raw.get('totals', {}) or {}
+        except:
+            self.files = {}
+            self.totals = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            d = os.path.dirname(self.path)
+            if d and not os.path.exists(d):
+                os.makedirs(d, exist_ok=True)
+            self.load()
+            self.files.update(self._new_files)
+            for bucket, delta in self._new_totals.items():
+                t = self.totals.setdefault(bucket, {'n': 0, 'seconds': 0.0, 'bytes': 0, 'inBytes': 0})
+                for k, v in delta.items():
+                    t[k] = t.get(k, 0) + v
+            self._new_files = {}
+            self._new_totals = {}
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.files, 'totals': self.totals}, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except:
+            pass
+
+    def _add_total(self, bucket, seconds, out_bytes=0, in_bytes=0):
+        for totals in (self.totals, self._new_totals):
+            t = totals.setdefault(bucket, {'n': 0, 'seconds': 0.0, 'bytes': 0, 'inBytes': 0})
+            t['n'] += 1
+            t['seconds'] += float(seconds)
+            t['bytes'] += int(out_bytes)
+            t['inBytes'] += int(in_bytes)
+
+    def record(self, key, version, size, open_seconds, formats):
+        """Record a finished design. formats: {fmt: (seconds, out_bytes)}."""
+        rec = {'version': version, 'size': size, 'open': round(float(open_seconds), 3), 'formats': {}}
+        self._add_total('open', open_seconds, 0, size)
+        for fmt, (secs, nbytes) in formats.items():
+            rec['formats'][fmt] = {'seconds': round(float(secs), 3), 'bytes': int(nbytes)}
+            self._add_total(fmt, secs, nbytes, size)
+        self.files[key] = rec
+        self._new_files[key] = rec
+        self.dirty = True
+
+    def record_other(self, seconds):
+        self._add_total('other', seconds)
+        self.dirty = True
+
+
+class CostModel:
+    """Estimate seconds and output bytes for a plan entry.
+    Exact history for the same design is preferred; otherwise averages over all
+    recorded designs are scaled by file size (when the size is known).
+    """
+    def __init__(self, history=None):
+        self.history = history
+
+    def _avg(self, bucket):
+        t = (self.history.totals.get(bucket) if self.history else None) or {}
+        n = t.get('n', 0)
+        if not n:
+            return None
+        return {
+            'seconds': t['seconds'] / n,
+            'bytes': t['bytes'] / n,
+            'inBytes': t.get('inBytes', 0) / n,
+        }
+
+    def _scale(self, avg, size):
+        # Linear in size around the average design; clamp so one odd size can't dominate
+        if not size or not avg or not avg.get('inBytes'):
+            return 1.0
+        return max(0.25, min(8.0, size / avg['inBytes']))
+
+    def estimate(self, entry, fmts):
+        """Return (seconds, {fmt: bytes}) for one plan entry."""
+        if entry['kind'] != 'design':
+            avg = self._avg('other')
+            return (avg['seconds'] if avg else DEFAULT_OTHER_SECONDS), {}
+        rec = self.history.files.get(entry['key']) if self.history else None
+        size = entry.get('size') or (rec.get('size', 0) if rec else 0)
+        secs = 0.0
+        out = {}
+        # Open cost
+        if rec:
+            secs += rec.get('open', DEFAULT_OPEN_SECONDS)
+        else:
+            avg = self._avg('open')
+            secs += (avg['seconds'] * self._scale(avg, size)) if avg else DEFAULT_OPEN_SECONDS
+        for fmt in fmts:
+            frec = rec.get('formats', {}).get(fmt) if rec else None
+            if frec:
+                secs += frec['seconds']
+                out[fmt] = frec['bytes']
+                continue
+            avg = self._avg(fmt)
+            if avg:
+                k = self._scale(avg, size)
+                secs += avg['seconds'] * k
+                out[fmt] = int(avg['bytes'] * k)
+            else:
+                k = (size / 1e6) if size else 1.0
+                secs += DEFAULT_FORMAT_SECONDS.get(fmt, 2.0)
+                out[fmt] = int(DEFAULT_FORMAT_BYTES.get(fmt, 100000) * max(k, 0.25))
+        return secs, out
+
+
+def _other_allowed(entry, other_exts):
+    if not other_exts:
+        return True
+    allowed = {e.lower().lstrip('.').strip() for e in other_exts if str(e).strip()}
+    base_ext = (os.path.splitext(entry['name'])[1][1:] or '').lower()
+    return base_ext in allowed or entry['ext'].lstrip('.') in allowed
+
+
+def build_plan(folder, fmts, model=None, include_other=False, other_exts=None, file_filter=None, entries=None):
+    """Enumerate folder (unless entries are given) and estimate the run.
+    Returns a dict: entries (each with 'seconds'/'bytes'), eta, counts, bytes per format.
+    """
+    model = model or CostModel(None)
+    fmts = [f for f in fmts if f]
+    if entries is None:
+        entries = enumerate_folder(folder, '', file_filter)
+    planned = []
+    counts = {f: 0 for f in fmts}
+    counts['designs'] = 0
+    counts['other'] = 0
+    counts['skipped'] = 0
+    out_bytes = {f: 0 for f in fmts}
+    eta = 0.0
+    known = 0
+    for e in entries:
+        if e['kind'] == 'design':
+            counts['designs'] += 1
+            # dxf only produces output for sheet-metal designs, still count the attempt
+            for f in fmts:
+                counts[f] += 1
+        elif include_other and _other_allowed(e, other_exts):
+            counts['other'] += 1
+        else:
+            counts['skipped'] += 1
+            continue
+        secs, nbytes = model.estimate(e, fmts)
+        if model.history and e['key'] in model.history.files:
+            known += 1
+        for f, b in nbytes.items():
+            out_bytes[f] += b
+        eta += secs
+        planned.append(dict(e, seconds=secs, bytes=sum(nbytes.values())))
+    return {
+        'entries': planned,
+        'eta': eta,
+        'counts': counts,
+        'bytes': out_bytes,
+        'known': known,
+        'formats': fmts,
+    }
+
+
+def format_eta(seconds):
+    seconds = int(round(max(0.0, seconds)))
+    if seconds < 60:
+        return f"{seconds}s"
+    m, s = divmod(seconds, 60)
+    if m < 60:
+        return f"{m}m {s:02d}s"
+    h, m = divmod(m, 60)
+    return f"{h}h {m:02d}m"
+
+
+def format_bytes(n):
+    n = float(n)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def format_plan(plan):
+    c = plan['counts']
+    lines = [
+        'Dry run (no documents opened).',
+        f"Designs: {c['designs']} | Other files: {c['other']} | Skipped: {c['skipped']}",
+    ]
+    for f in plan['formats']:
+        lines.append(f"{f.upper()}: {c.get(f, 0)} files, ~{format_bytes(plan['bytes'].get(f, 0))}")
+    total = sum(plan['bytes'].values())
+    lines.append(f"Expected output size: ~{format_bytes(total)}")
+    lines.append(f"Estimated time: ~{format_eta(plan['eta'])}")
+    n = c['designs'] + c['other']
+    if n:
+        lines.append(f"Based on history for {plan['known']} of {n} files.")
+    return '\n'.join(lines)
+
+
+class ProgressTracker:
+    """Remaining-time estimate for a running export.
+    The remaining planned cost is rescaled by how the finished items compare to
+    their estimates, so a slow machine or a slow hub corrects the ETA as it goes.
+    """
+    def __init__(self, plan, clock=time.time):
+        self.clock = clock
+        self.total = len(plan['entries'])
+        self._est = {}
+        for e in plan['entries']:
+            self._est[(e['rel'], e['name'])] = e['seconds']
+        self.remaining_est = sum(self._est.values())
+        self.done_est = 0.0
+        self.done_actual = 0.0
+        self.done = 0
+        self.cancelled = False
+        self.current = None
+        self._t0 = None
+
+    def begin(self, rel, name):
+        self.current = name
+        self._t0 = self.clock()
+
+    def finish(self, rel, name):
+        actual = (self.clock() - self._t0) if self._t0 is not None else 0.0
+        est = self._est.pop((rel, name), None)
+        if est is not None:
+            # Files the plan skipped (filtered extensions etc.) don't count towards progress
+            self.remaining_est -= est
+            self.done_est += est
+            self.done_actual += actual
+            self.done += 1
+        self._t0 = None
+        return actual
+
+    # Seconds of planned work the correction needs before it trusts observed timings
+    PRIOR_SECONDS = 30.0
+
+    def remaining_seconds(self):
+        k = self.PRIOR_SECONDS
+        ratio = (self.done_actual + k) / (self.done_est + k)
+        return max(0.0, self.remaining_est * ratio)
+
+    def message(self):
+        cur = f"\n{self.current}" if self.current else ''
+        return f"{self.done} of {self.total} files, ~{format_eta(self.remaining_seconds())} remaining{cur}"
@@ -0,0 +1,222 @@
+# ==== Batch job files (many hub/project/folder targets in one session) ====
+# Pure-Python loader used by FolderToGit.py. A job is JSON or TOML:
+#
+#   output = "D:/FusionBackup"            # base output folder
+#   [defaults]                            # any option below, applied to every target
+#   formats = ["3mf", "stl"]
+#   [[targets]]
+#   hub = "My Hub"                        # optional, defaults to the active hub
+#   project = "Display-Project"
+#   folder = "Generation2"                # '' or '(Project root)' for the root
+#   output = "gen2"                       # optional, relative to the base output
+#   formats = ["3mf"]                     # optional per-target override
+#   files = ["Sub/part", "top"]           # optional: only these files (folder path/name)
+#
+# Targets are grouped by hub so the runner switches data.activeHub once per hub.
+# Shard jobs written by shards.py also carry  shard = {plan = "...", index = 1}.
+
+import os, json
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+FORMATS = ('3mf', 'stl', 'obj', 'dxf')
+
+OPTION_DEFAULTS = {
+    'formats': ['3mf'],
+    'overwrite': True,
+    'include_other': False,
+    'other_exts': ['f2d', 'dxf', 'dwg', 'pdf', 'svg', 'png', 'jpg'],
+    'export_drawing_dxf': True,
+    'hidden_open': True,
+    'component_cache': False,
+    'timeouts': {},            # per-stage seconds, e.g. {open = 120, export = 600} (see quarantine.py)
+    'quarantine': 'skip',      # quarantined files: 'skip', 'last' or 'retry'
+}
+
+RESULT_NAME = 'job_result.json'
+LOG_NAME = 'log.txt'
+
+
+class JobError(ValueError):
+    """Raised for job files that can't be read or are missing required fields."""
+
+
+def _read(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        if tomllib is None:
+            raise JobError('TOML job files need Python 3.11+; use JSON instead')
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _norm_formats(v):
+    if isinstance(v, str):
+        v = [s for s in v.replace(';', ',').split(',')]
+    fmts = []
+    for f in v or []:
+        f = str(f).lower().strip().lstrip('.')
+        if not f:
+            continue
+        if f not in FORMATS:
+            raise JobError(f"Unknown export format '{f}' (expected one of {', '.join(FORMATS)})")
+        if f not in fmts:
+            fmts.append(f)
+    return fmts
+
+
+def rel_key(rel_path, name):
+    """'Sub/Folder/name' for a file in a target folder ('' rel_path = the folder itself)."""
+    rel = str(rel_path or '').replace('\\', '/').strip('/')
+    return f"{rel}/{name}" if rel else str(name)
+
+
+def _norm_files(v, i):
+    if v is None:
+        return None
+    if isinstance(v, str) or not isinstance(v, (list, tuple)):
+        raise JobError(f"Target {i + 1}: 'files' must be a list of paths")
+    return [rel_key('', str(f).strip()) for f in v if str(f).strip()]
+
+
+def normalize_job(raw, base_dir=''):
+    """Validate a parsed job and return {'output', 'targets': [...]} with every
+    option filled in on each target. base_dir resolves a relative base output
+    (and a shard job's plan path)."""
+    if not isinstance(raw, dict):
+        raise JobError('Job file must contain an object/table at the top level')
+    output = str(raw.get('output') or '').strip()
+    if not output:
+        raise JobError("Job file needs an 'output' folder")
+    if base_dir and not os.path.isabs(output):
+        output = os.path.normpath(os.path.join(base_dir, output))
+    defaults = dict(OPTION_DEFAULTS)
+    for k, v in (raw.get('defaults') or {}).items():
+        if k not in OPTION_DEFAULTS:
+            raise JobError(f"Unknown option in defaults: '{k}'")
+        defaults[k] = v
+    targets = []
+    for i, t in enumerate(raw.get('targets') or []):
+        if not isinstance(t, dict) or not str(t.get('project') or '').strip():
+            raise JobError(f"Target {i + 1} needs a 'project'")
+        tgt = dict(defaults)
+        for k, v in t.items():
+            if k in ('hub', 'project', 'folder', 'output', 'name', 'files'):
+                continue
+            if k not in OPTION_DEFAULTS:
+                raise JobError(f"Target {i + 1}: unknown option '{k}'")
+            tgt[k] = v
+        folder = str(t.get('folder') or '').strip().strip('/')
+        if folder == '(Project root)':
+            folder = ''
+        sub_out = str(t.get('output') or '').strip()
+        tgt.update({
+            'index': i,
+            'hub': str(t.get('hub') or '').strip(),
+            'project': str(t['project']).strip(),
+            'folder': folder,
+            'output': sub_out if os.path.isabs(sub_out) else os.path.normpath(os.path.join(output, sub_out)) if sub_out else output,
+            'formats': _norm_formats(tgt['formats']),
+            'files': _norm_files(t.get('files'), i),
+        })
+        if isinstance(tgt['other_exts'], str):
+            tgt['other_exts'] = [s.strip() for s in tgt['other_exts'].split(',') if s.strip()]
+        tgt['name'] = str(t.get('name') or '/'.join(p for p in (tgt['hub'], tgt['project'], folder) if p))
+        if not tgt['formats']:
+            raise JobError(f"Target {i + 1} has no export formats")
+        if tgt['quarantine'] not in ('skip', 'last', 'retry'):
+            raise JobError(f"Target {i + 1}: quarantine must be 'skip', 'last' or 'retry'")
+        targets.append(tgt)
+    if not targets:
+        raise JobError('Job file has no targets')
+    job = {'output': output, 'targets': targets}
+    shard = raw.get('shard')
+    if shard:
+        if not isinstance(shard, dict) or not shard.get('plan'):
+            raise JobError("'shard' needs a 'plan' path")
+        plan = str(shard['plan'])
+        if base_dir and not os.path.isabs(plan):
+            plan = os.path.normpath(os.path.join(base_dir, plan))
+        job['shard'] = {'plan': plan, 'index': int(shard.get('index') or 0)}
+    return job
+
+
+def load_job(path):
+    try:
+        raw = _read(path)
+    except JobError:
+        raise
+    except Exception as ex:
+        raise JobError(f"Could not read job file '{path}': {ex}")
+    return normalize_job(raw, os.path.dirname(os.path.abspath(path)))
+
+
+def group_by_hub(targets):
+    """[(hub, [targets])] in order of first appearance; '' (active hub) goes first
+    so a job that doesn't name hubs never switches at all."""
+    groups = {}
+    for t in targets:
+        groups.setdefault(t['hub'], []).append(t)
+    order = sorted(groups, key=lambda h: (h != '', min(t['index'] for t in groups[h])))
+    return [(h, groups[h]) for h in order]
+
+
+def file_filter_for(target):
+    """traverse_and_export/build_plan file filter for a target's 'files' list, or None."""
+    if target.get('files') is None:
+        return None
+    wanted = set(target['files'])
+    return lambda rel_path, df: rel_key(rel_path, df.name) in wanted
+
+
+def format_report(results):
+    lines = []
+    for r in results:
+        st = r.get('stats') or {}
+        if r.get('error'):
+            lines.append(f"{r['name']}: FAILED - {r['error']}")
+            continue
+        lines.append(
+            f"{r['name']}: {st.get('designs', 0)} designs | 3MF {st.get('3mf', 0)} | STL {st.get('stl', 0)} | "
+            f"OBJ {st.get('obj', 0)} | other {st.get('other', 0)} | errors {st.get('errors', 0)} | {r.get('seconds', 0):.0f}s"
+        )
+    return '\n'.join(lines)
+
+
+def write_export_log(out_dir, manifest, stats):
+    """Write log.txt listing files that weren't downloaded. Returns its path or None."""
+    try:
+        if manifest is not None and len(manifest) > 0:
+            manifest_path = os.path.join(out_dir, LOG_NAME)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                f.write('# Export log\n')
+                f.write('# DXF export for Drawings: {}\n'.format('unsupported' if stats.get('pdfFail',0)>0 else 'attempted'))
+                f.write('# The following files are present in Fusion but were not downloaded automatically:\n')
+                for rel in manifest:
+                    f.write(rel + '\n')
+            return manifest_path
+    except:
+        pass
+    return None
+
+
+def write_result(path, job, results, hub_switches, extra=None):
+    data = {
+        'output': job['output'],
+        'hubSwitches': hub_switches,
+        'targets': [
+            {k: r.get(k) for k in ('index', 'name', 'output', 'stats', 'errors', 'manifest', 'post', 'seconds', 'error')}
+            for r in results
+        ],
+    }
+    if extra:
+        data.update(extra)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
@@ -0,0 +1,319 @@
+# ==== Level-of-detail pyramid ====
+# Coarse copies of exported meshes for viewers/catalogs (the full-resolution file
+# stays LOD 0). Simplification is quadric error metric edge collapse (Garland &
+# Heckbert): per-vertex quadrics and the initial edge costs are computed for all
+# vertices/edges at once in numpy, then a heap collapses the cheapest edge,
+# refusing collapses that would flip a face or make the surface non-manifold, and
+# re-costing only the edges around the merged vertex. One pass produces all levels.
+#
+#   python lod.py build D:/FusionBackup          (incremental, keeps lod_index.json per folder)
+#   post-processing step 'lod'                   (same index, one file at a time during export)
+#   python lod.py bench ../Generation2 --top 3   (timing on the largest parts)
+#
+# Levels are written next to the source as <name>.lod1.<ext>, <name>.lod2.<ext>, ...
+# Needs numpy.
+
+import os, sys, json, time, heapq, argparse, threading
+
+import numpy as np
+
+import meshfiles
+import meshrepair
+from postprocess import sha256_file
+
+LEVELS = (0.25, 0.05)
+INDEX_NAME = 'lod_index.json'
+BOUNDARY_WEIGHT = 1000.0  # keeps open borders in place
+MIN_FACES = 12
+
+_index_lock = threading.Lock()    # post-processing threads share the folder indexes
+
+
+def _face_planes(v, f):
+    t = v[f]
+    cr = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+    ln = np.linalg.norm(cr, axis=1)
+    n = cr / np.maximum(ln, 1e-12)[:, None]
+    return n, -np.einsum('ij,ij->i', n, t[:, 0]), 0.5 * ln
+
+
+def vertex_quadrics(v, f):
+    """Area-weighted sum of face plane quadrics per vertex, plus boundary constraint planes."""
+    n, d, area = _face_planes(v, f)
+    p = np.column_stack((n, d))
+    k = p[:, :, None] * p[:, None, :] * area[:, None, None]
+    q = np.zeros((len(v), 4, 4))
+    for c in range(3):
+        np.add.at(q, f[:, c], k)
+    # Boundary edges: a plane through the edge, perpendicular to its face
+    a, b = f.reshape(-1), f[:, [1, 2, 0]].reshape(-1)
+    owner = np.repeat(np.arange(len(f)), 3)
+    m = len(v) + 1
+    boundary = ~np.isin(a * m + b, b * m + a)
+    if boundary.any():
+        a, b, owner = a[boundary], b[boundary], owner[boundary]
+        e = v[b] - v[a]
+        pn = np.cross(e, n[owner])
+        pn /= np.maximum(np.linalg.norm(pn, axis=1), 1e-12)[:, None]
+        pp = np.column_stack((pn, -np.einsum('ij,ij->i', pn, v[a])))
+        kb = pp[:, :, None] * pp[:, None, :] * (BOUNDARY_WEIGHT * np.einsum('ij,ij->i', e, e))[:, None, None]
+        np.add.at(q, a, kb)
+        np.add.at(q, b, kb)
+    return q
+
+
+def edge_costs(q, v, i, j):
+    """Collapse cost and target position for edges (i, j), batched."""
+    qe = q[i] + q[j]
+    a, b = qe[:, :3, :3], qe[:, :3, 3]
+    pos = (v[i] + v[j]) * 0.5
+    ok = np.abs(np.linalg.det(a)) > 1e-10
+    if ok.any():
+        x = np.linalg.solve(a[ok], -b[ok][:, :, None])[:, :, 0]
+        # Reject optimal points far off the edge (near-singular systems)
+        span = np.linalg.norm(v[i][ok] - v[j][ok], axis=1)
+        near = np.linalg.norm(x - pos[ok], axis=1) <= span
+        sel = np.flatnonzero(ok)[near]
+        pos[sel] = x[near]
+
+    def cost(x):
+        return np.einsum('ni,nij,nj->n', x, a, x) + 2 * np.einsum('ni,ni->n', b, x) + qe[:, 3, 3]
+
+    best, bc = pos, cost(pos)
+    for cand in (v[i], v[j]):
+        c = cost(cand)
+        better = c < bc
+        best = np.where(better[:, None], cand, best)
+        bc = np.where(better, c, bc)
+    return np.maximum(bc, 0.0), best
+
+
+def simplify(vertices, faces, ratios=LEVELS):
+    """Collapse edges until each ratio of the input face count is reached.
+    Returns [(vertices, faces)] per ratio, in the order given (largest first)."""
+    v, f, _ = meshrepair.weld(np.asarray(vertices, np.float64), np.asarray(faces, np.int64), 1e-6)
+    f = f[(f[:, 0] != f[:, 1]) & (f[:, 1] != f[:, 2]) & (f[:, 0] != f[:, 2])].copy()
+    v = v.copy()
+    q = vertex_quadrics(v, f)
+    nv = len(v)
+    vf = [set() for _ in range(nv)]
+    for fi, (x, y, z) in enumerate(f.tolist()):
+        vf[x].add(fi); vf[y].add(fi); vf[z].add(fi)
+    alive = np.ones(len(f), bool)
+    n_alive = len(f)
+    stamp = np.zeros(nv, np.int64)
+    dead = np.zeros(nv, bool)
+
+    e = np.sort(np.concatenate((f[:, [0, 1]], f[:, [1, 2]], f[:, [2, 0]])), axis=1)
+    e = np.unique(e, axis=0)
+    # Entries carry their target position; stamps tell stale entries apart
+    c, pos = edge_costs(q, v, e[:, 0], e[:, 1])
+    heap = [(cv, a, b, 0, 0, x) for cv, a, b, x in zip(c.tolist(), e[:, 0].tolist(), e[:, 1].tolist(), pos.tolist())]
+    heapq.heapify(heap)
+
+    targets = sorted(((max(MIN_FACES, int(len(f) * r)), k) for k, r in enumerate(ratios)), reverse=True)
+    out = [None] * len(ratios)
+
+    def snapshot():
+        ff = f[alive]
+        used, inv = np.unique(ff, return_inverse=True)
+        return v[used].copy(), inv.reshape(-1, 3)
+
+    ti = 0
+    while ti < len(targets) and n_alive <= targets[ti][0]:
+        out[targets[ti][1]] = snapshot()
+        ti += 1
+    while heap and ti < len(targets):
+        _c, i, j, si, sj, x = heapq.heappop(heap)
+        if dead[i] or dead[j] or stamp[i] != si or stamp[j] != sj:
+            continue
+        shared = vf[i] & vf[j]
+        if not shared:
+            continue
+        # Link condition: the only common neighbours are the ones of the shared faces
+        ni = {x for fi in vf[i] for x in f[fi]} - {i}
+        nj = {x for fi in vf[j] for x in f[fi]} - {j}
+        if len(ni & nj) != len(shared):
+            continue
+        # No flipped or collapsed faces among the ones that survive
+        keep = np.array(sorted((vf[i] | vf[j]) - shared))
+        if len(keep):
+            t = v[f[keep]]
+            old = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+            t2 = t.copy()
+            moved = (f[keep] == i) | (f[keep] == j)
+            t2[moved] = x
+            new = np.cross(t2[:, 1] - t2[:, 0], t2[:, 2] - t2[:, 0])
+            dot = np.einsum('ij,ij->i', old, new)
+            if (dot <= 0.2 * np.linalg.norm(old, axis=1) * np.linalg.norm(new, axis=1)).any():
+                continue
+        v[i] = x
+        q[i] += q[j]
+        for fi in shared:
+            alive[fi] = False
+            for w in f[fi]:
+                vf[w].discard(fi)
+        n_alive -= len(shared)
+        for fi in vf[j]:
+            row = f[fi]
+            row[row == j] = i
+            vf[i].add(fi)
+        vf[j] = set()
+        dead[j] = True
+        stamp[i] += 1
+        nbrs = np.array(sorted({x for fi in vf[i] for x in f[fi]} - {i}))
+        if len(nbrs):
+            ii = np.full(len(nbrs), i)
+            cs, ps = edge_costs(q, v, ii, nbrs)
+            si = int(stamp[i])
+            for cv, k, p in zip(cs.tolist(), nbrs.tolist(), ps.tolist()):
+                heapq.heappush(heap, (cv, i, k, si, int(stamp[k]), p))
+        while ti < len(targets) and n_alive <= targets[ti][0]:
+            out[targets[ti][1]] = snapshot()
+            ti += 1
+    # Couldn't get lower (everything left is blocked): the coarsest result reached
+    for k in range(len(out)):
+        if out[k] is None:
+            out[k] = snapshot()
+    return out
+
+
+def lod_path(path, level):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.lod{level}{ext}"
+
+
+def _write(path, v, f, name):
+    if path.lower().endswith('.3mf'):
+        meshfiles.write_3mf(path, [(name, v, f)])
+    elif path.lower().endswith('.obj'):
+        meshfiles.write_obj(path, v, f, name)
+    else:
+        meshfiles.write_stl(path, v, f)
+
+
+def build_lods(path, ratios=LEVELS):
+    """Write the LOD files of one mesh; returns the index entry."""
+    m = meshfiles.read_mesh(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    t0 = time.perf_counter()
+    levels = simplify(m.vertices, m.faces, ratios)
+    secs = time.perf_counter() - t0
+    entry = {'levels': [{'ratio': 1.0, 'faces': int(len(m.faces)), 'file': os.path.basename(path)}], 'seconds': round(secs, 3)}
+    for k, (r, (v, f)) in enumerate(zip(ratios, levels)):
+        out = lod_path(path, k + 1)
+        _write(out, v, f, name)
+        entry['levels'].append({'ratio': r, 'faces': int(len(f)), 'file': os.path.basename(out)})
+    return entry
+
+
+def _load_index(folder):
+    try:
+        with open(os.path.join(folder, INDEX_NAME), 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except Exception:
+        return {}
+
+
+def _save_index(folder, index):
+    path = os.path.join(folder, INDEX_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(index, fh, indent=1)
+    os.replace(tmp, path)
+
+
+def _current(entry, folder, digest, ratios):
+    """True when an index entry already has the LODs of this content."""
+    return bool(entry and entry.get('sha256') == digest and entry.get('ratios') == ratios
+                and all(os.path.exists(os.path.join(folder, l['file'])) for l in entry['levels']))
+
+
+def update_file(path, ratios=LEVELS, digest=None):
+    """update_tree() for a single mesh, as the 'lod' post-processing step runs it.
+    Returns the new index entry, or None when the LODs were already current. The
+    index is re-read and written under a lock so workers finishing files in the
+    same folder keep each other's entries."""
+    folder, fn = os.path.split(os.path.abspath(path))
+    ratios = [float(r) for r in ratios]
+    digest = digest or sha256_file(path)
+    with _index_lock:
+        old = _load_index(folder).get(fn)
+    if _current(old, folder, digest, ratios):
+        return None
+    entry = build_lods(path, ratios)
+    entry.update({'sha256': digest, 'ratios': ratios})
+    with _index_lock:
+        index = _load_index(folder)
+        index[fn] = entry
+        _save_index(folder, index)
+    return entry
+
+
+def update_tree(root, ratios=LEVELS, exts=('stl', '3mf')):
+    """Build LODs for every mesh under root whose content changed since the last
+    run (sha256 of the source in each folder's lod_index.json)."""
+    stats = {'built': 0, 'unchanged': 0, 'seconds': 0.0}
+    t0 = time.perf_counter()
+    ratios = [float(r) for r in ratios]
+    for dirpath, _dirs, files in os.walk(root):
+        meshes = [fn for fn in sorted(files)
+                  if fn.lower().rsplit('.', 1)[-1] in exts and not meshfiles.is_lod_file(fn)]
+        if not meshes:
+            continue
+        index = _load_index(dirpath)
+        changed = False
+        for fn in meshes:
+            p = os.path.join(dirpath, fn)
+            digest = sha256_file(p)
+            if _current(index.get(fn), dirpath, digest, ratios):
+                stats['unchanged'] += 1
+                continue
+            entry = build_lods(p, ratios)
+            entry.update({'sha256': digest, 'ratios': ratios})
+            index[fn] = entry
+            stats['built'] += 1
+            changed = True
+        if changed:
+            _save_index(dirpath, index)
+    stats['seconds'] = time.perf_counter() - t0
+    return stats
+
+
+def _volume(v, f):
+    t = v[f]
+    return np.einsum('ij,ij->i', t[:, 0], np.cross(t[:, 1], t[:, 2])).sum() / 6.0
+
+
+def bench(folder, top=3, ratios=LEVELS):
+    paths = meshfiles.find_meshes(folder, 'stl', recursive=True)
+    sized = sorted(((len(meshfiles.read_mesh(p).faces), p) for p in paths), reverse=True)[:top]
+    for n, p in sized:
+        m = meshfiles.read_mesh(p)
+        t0 = time.perf_counter()
+        levels = simplify(m.vertices, m.faces, ratios)
+        secs = time.perf_counter() - t0
+        vol0 = abs(_volume(m.vertices, m.faces))
+        parts = []
+        for r, (v, f) in zip(ratios, levels):
+            dv = 100.0 * (abs(_volume(v, f)) - vol0) / max(vol0, 1e-12)
+            parts.append(f"{r:.0%}: {len(f)} faces (volume {dv:+.2f}%)")
+        print(f"{os.path.basename(p)}: {n} faces, {secs:.2f}s ({(n - len(levels[-1][1])) / 2 / max(secs, 1e-9):.0f} collapses/s)  " + '  '.join(parts))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Level-of-detail pyramids for exported meshes')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='write LODs for new or changed meshes under a folder')
+    b.add_argument('root')
+    b.add_argument('--levels', default=','.join(str(r) for r in LEVELS), help='face ratios, e.g. 0.25,0.05')
+    bb = sub.add_parser('bench', help='time simplification on the largest meshes of a folder')
+    bb.add_argument('folder')
+    bb.add_argument('--top', type=int, default=3)
+    args = ap.parse_args()
+    if args.cmd == 'build':
+        st = update_tree(args.root, [float(x) for x in args.levels.split(',') if x.strip()])
+        print(f"{st['built']} meshes simplified, {st['unchanged']} unchanged, {st['seconds']:.2f}s")
+    else:
+        bench(args.folder, args.top)
+    sys.exit(0)
@@ -0,0 +1,539 @@
+# ==== Mesh file helpers ====
+# Writers for the formats the exporter produces (STL, OBJ, 3MF) are dependency-free and
+# used by FolderToGit.py when meshes are assembled locally (component cache). Readers
+# need numpy and are used by the offline tools in this folder; they all return an
+# IndexedMesh. Meshes are indexed: a flat or (N,3) vertex list in millimetres plus a
+# flat or (M,3) list of triangle vertex indices.
+#
+#   python meshfiles.py bench ../Generation1 ../Generation2
+
+import os, re, sys, time, struct, zipfile
+from array import array
+import xml.etree.ElementTree as ET
+
+try:
+    import numpy as np
+except ImportError:  # Fusion's bundled Python; only the writers are used there
+    np = None
+
+_3MF_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+    '</Types>'
+)
+_3MF_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+    'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+    '</Relationships>'
+)
+_3MF_NS = 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02'
+
+
+def _flat(seq):
+    """Flatten a flat list, a list of triples or a numpy array into a Python list."""
+    if hasattr(seq, 'ravel'):
+        return seq.ravel().tolist()
+    seq = list(seq)
+    if seq and isinstance(seq[0], (list, tuple)):
+        return [c for row in seq for c in row]
+    return seq
+
+
+def _ensure_parent(path):
+    d = os.path.dirname(path)
+    if d and not os.path.exists(d):
+        os.makedirs(d, exist_ok=True)
+
+
+def transform_points(coords, matrix):
+    """Apply a row-major 4x4 matrix (16 floats, Fusion Matrix3D.asArray()) to flat xyz coords."""
+    m = list(matrix)
+    a, b, c, tx = m[0], m[1], m[2], m[3]
+    d, e, f, ty = m[4], m[5], m[6], m[7]
+    g, h, i, tz = m[8], m[9], m[10], m[11]
+    out = [0.0] * len(coords)
+    for k in range(0, len(coords), 3):
+        x, y, z = coords[k], coords[k + 1], coords[k + 2]
+        out[k] = a * x + b * y + c * z + tx
+        out[k + 1] = d * x + e * y + f * z + ty
+        out[k + 2] = g * x + h * y + i * z + tz
+    return out
+
+
+def merge_meshes(parts):
+    """Concatenate (coords, indices) pairs into one indexed mesh."""
+    coords, indices = [], []
+    for pc, pi in parts:
+        base = len(coords) // 3
+        coords.extend(pc)
+        indices.extend([base + j for j in pi])
+    return coords, indices
+
+
+def write_stl(path, vertices, triangles, header=b'Fusion folder export'):
+    """Write a binary STL. Facet normals are computed from the winding."""
+    v = _flat(vertices)
+    t = _flat(triangles)
+    n = len(t) // 3
+    _ensure_parent(path)
+    rec = struct.Struct('<12fH')
+    with open(path, 'wb') as f:
+        f.write(header[:80].ljust(80, b'\0'))
+        f.write(struct.pack('<I', n))
+        buf = bytearray()
+        for k in range(0, n * 3, 3):
+            i0, i1, i2 = t[k] * 3, t[k + 1] * 3, t[k + 2] * 3
+            x0, y0, z0 = v[i0], v[i0 + 1], v[i0 + 2]
+            x1, y1, z1 = v[i1], v[i1 + 1], v[i1 + 2]
+            x2, y2, z2 = v[i2], v[i2 + 1], v[i2 + 2]
+            ux, uy, uz = x1 - x0, y1 - y0, z1 - z0
+            wx, wy, wz = x2 - x0, y2 - y0, z2 - z0
+            nx, ny, nz = uy * wz - uz * wy, uz * wx - ux * wz, ux * wy - uy * wx
+            ln = (nx * nx + ny * ny + nz * nz) ** 0.5 or 1.0
+            buf += rec.pack(nx / ln, ny / ln, nz / ln, x0, y0, z0, x1, y1, z1, x2, y2, z2, 0)
+            if len(buf) > (1 << 20):
+                f.write(buf)
+                buf = bytearray()
+        f.write(buf)
+
+
+def write_obj(path, vertices, triangles, name=None):
+    """Write a Wavefront OBJ with a single group. Coordinates are written as given,
+    in mm for every caller here; Fusion's own OBJ export is in cm (see read_obj), so
+    the add-in leaves OBJ to Fusion rather than mixing both in one backup."""
+    v = _flat(vertices)
+    t = _flat(triangles)
+    _ensure_parent(path)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        if name:
+            f.write(f"g {name}\n")
+        f.write(''.join('v %.6g %.6g %.6g\n' % (v[k], v[k + 1], v[k + 2]) for k in range(0, len(v), 3)))
+        f.write(''.join('f %d %d %d\n' % (t[k] + 1, t[k + 1] + 1, t[k + 2] + 1) for k in range(0, len(t), 3)))
+
+
+def _3mf_object_xml(obj_id, name, vertices, triangles):
+    v = _flat(vertices)
+    t = _flat(triangles)
+    parts = [f'<object id="{obj_id}" type="model" name="{_xml_attr(name)}"><mesh><vertices>']
+    parts.append(''.join('<vertex x="%.6g" y="%.6g" z="%.6g"/>' % (v[k], v[k + 1], v[k + 2]) for k in range(0, len(v), 3)))
+    parts.append('</vertices><triangles>')
+    parts.append(''.join('<triangle v1="%d" v2="%d" v3="%d"/>' % (t[k], t[k + 1], t[k + 2]) for k in range(0, len(t), 3)))
+    parts.append('</triangles></mesh></object>')
+    return ''.join(parts)
+
+
+def _xml_attr(s):
+    return str(s or '').replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def write_3mf(path, objects, compresslevel=6, items=None):
+    """Write a 3MF package.
+    objects: list of (name, vertices, triangles); object ids are 1..n.
+    items: optional list of (object_id, transform) build items, transform being the
+    12-value 3MF affine string or None; defaults to one untransformed item per object.
+    """
+    _ensure_parent(path)
+    res = [_3mf_object_xml(i + 1, name, v, t) for i, (name, v, t) in enumerate(objects)]
+    if items is None:
+        items = [(i + 1, None) for i in range(len(objects))]
+    build = ''.join(
+        f'<item objectid="{oid}"' + (f' transform="{tr}"' if tr else '') + '/>'
+        for oid, tr in items
+    )
+    model = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<model unit="millimeter" xml:lang="en-US" xmlns="{_3MF_NS}">'
+        f'<resources>{"".join(res)}</resources><build>{build}</build></model>'
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as z:
+        z.writestr('[Content_Types].xml', _3MF_CONTENT_TYPES)
+        z.writestr('_rels/.rels', _3MF_RELS)
+        z.writestr('3D/3dmodel.model', model)
+
+
+# Readers (numpy)
+
+class IndexedMesh:
+    """Shared representation returned by every reader.
+    vertices: (N,3) float64, faces: (M,3) int64.
+    groups: names of OBJ groups / 3MF objects / STL solids; face_group: (M,) index into groups.
+    materials / face_material: OBJ usemtl names per face (-1 when none); empty for other formats.
+    """
+    def __init__(self, vertices, faces, groups=None, face_group=None, materials=None, face_material=None):
+        self.vertices = vertices
+        self.faces = faces
+        self.groups = list(groups or [''])
+        self.face_group = face_group if face_group is not None else np.zeros(len(faces), np.int32)
+        self.materials = list(materials or [])
+        self.face_material = face_material if face_material is not None else np.full(len(faces), -1, np.int32)
+
+    @property
+    def triangles(self):
+        """(M,3,3) triangle corner coordinates."""
+        return self.vertices[self.faces]
+
+    def group_mesh(self, gi):
+        """Sub-mesh of one group, with only the vertices it uses."""
+        f = self.faces[self.face_group == gi]
+        used, inv = np.unique(f, return_inverse=True)
+        return IndexedMesh(self.vertices[used], inv.reshape(-1, 3).astype(np.int64), [self.groups[gi]])
+
+    def __repr__(self):
+        return f"IndexedMesh({len(self.vertices)} vertices, {len(self.faces)} faces, {len(self.groups)} groups)"
+
+
+def _need_numpy():
+    if np is None:
+        raise ImportError('Reading meshes needs numpy (pip install numpy)')
+
+
+def read_mesh(path):
+    """Read STL, OBJ or 3MF by extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.stl':
+        return read_stl(path)
+    if ext == '.obj':
+        return read_obj(path)
+    if ext == '.3mf':
+        return read_3mf(path)
+    raise ValueError(f"Unsupported mesh format: {path}")
+
+
+_LOD_RE = re.compile(r'\.lod\d+\.[^.]+$', re.IGNORECASE)
+
+
+def is_lod_file(name):
+    """<name>.lod1.stl and friends are coarse copies written by lod.py, not designs."""
+    return bool(_LOD_RE.search(name))
+
+
+def find_meshes(folder, prefer='3mf', recursive=False, exts=('3mf', 'stl')):
+    """Mesh files of a folder, one per design (file stem); when a design was exported
+    in several formats the preferred one wins. LOD copies are skipped."""
+    found = {}
+    walk = os.walk(folder) if recursive else [(folder, None, os.listdir(folder))]
+    for dirpath, _dirs, files in walk:
+        for fn in files:
+            stem, ext = os.path.splitext(fn)
+            ext = ext.lower().lstrip('.')
+            if ext not in exts or is_lod_file(fn):
+                continue
+            key = os.path.join(os.path.relpath(dirpath, folder), stem)
+            if key not in found or ext == prefer:
+                found[key] = os.path.join(dirpath, fn)
+    return [found[k] for k in sorted(found)]
+
+
+def _weld_exact(tri_corners):
+    """(M,3,3) corners -> (vertices, faces) by merging bit-identical coordinates."""
+    flat = np.ascontiguousarray(tri_corners.reshape(-1, 3))
+    verts, inv = np.unique(flat, axis=0, return_inverse=True)
+    return verts.astype(np.float64), inv.reshape(-1, 3).astype(np.int64)
+
+
+_STL_DTYPE = None
+
+
+def read_stl(path):
+    """Binary STL via one frombuffer call; ASCII STL via a regex over the whole file."""
+    _need_numpy()
+    global _STL_DTYPE
+    with open(path, 'rb') as f:
+        data = f.read()
+    n = int.from_bytes(data[80:84], 'little') if len(data) >= 84 else -1
+    if n >= 0 and len(data) == 84 + 50 * n:
+        if _STL_DTYPE is None:
+            _STL_DTYPE = np.dtype([('n', '<f4', 3), ('v', '<f4', (3, 3)), ('attr', '<u2')])
+        rec = np.frombuffer(data, _STL_DTYPE, count=n, offset=84)
+        verts, faces = _weld_exact(rec['v'])
+        return IndexedMesh(verts, faces, [os.path.splitext(os.path.basename(path))[0]])
+    nums = re.findall(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)', data)
+    if not nums:
+        raise ValueError(f"Not a valid STL: {path}")
+    corners = np.array(nums, dtype='S32').astype(np.float64).reshape(-1, 3, 3)
+    verts, faces = _weld_exact(corners)
+    return IndexedMesh(verts, faces, [os.path.splitext(os.path.basename(path))[0]])
+
+
+def _line_table(buf):
+    """Start offset of every line, its first two bytes and the line index of every byte."""
+    nl = buf == 10
+    starts = np.concatenate(([0], np.flatnonzero(nl) + 1))
+    starts = starts[starts < len(buf)]
+    padded = np.concatenate((buf, np.zeros(2, np.uint8)))
+    line_of_byte = np.concatenate(([0], np.cumsum(nl[:-1]))) if len(buf) else np.zeros(0, np.int64)
+    return starts, padded[starts], padded[starts + 1], line_of_byte
+
+
+def _select_lines(buf, line_of_byte, mask):
+    """Concatenated bytes (newlines included) of the lines selected by mask."""
+    return buf[mask[line_of_byte]] if len(buf) else buf
+
+
+def read_obj(path, scale=None):
+    """Parse an OBJ in bulk. Lines are classified with numpy on the raw bytes, the
+    vertex and face lines are cut out with one boolean mask each and converted by a
+    single C-level parse. Polygons are fan triangulated; negative (relative) indices
+    are resolved; texture/normal indices are dropped. 'g'/'o' statements become
+    groups and 'usemtl' becomes materials.
+    scale: multiplier for coordinates. OBJ carries no unit and Fusion (Autodesk ATF)
+    writes centimetres while its STL/3MF are millimetres, so by default ATF files are
+    scaled by 10 and anything else is left as is.
+    """
+    _need_numpy()
+    with open(path, 'rb') as f:
+        data = f.read()
+    if scale is None:
+        scale = 10.0 if b'Autodesk ATF' in data[:256] else 1.0
+    buf = np.frombuffer(data, np.uint8)
+    starts, c0, c1, line_of_byte = _line_table(buf)
+    ws2 = (c1 == 32) | (c1 == 9)
+    is_v = (c0 == ord('v')) & ws2
+    is_f = (c0 == ord('f')) & ws2
+    is_g = ((c0 == ord('g')) | (c0 == ord('o'))) & (ws2 | (c1 == 10) | (c1 == 13))
+    is_u = (c0 == ord('u')) & (c1 == ord('s'))
+
+    # Vertices: blank the 'v' keyword and parse every number at once
+    vb = _select_lines(buf, line_of_byte, is_v).copy()
+    vb[vb == ord('v')] = 32
+    vals = np.fromstring(vb.tobytes(), dtype=np.float64, sep=' ')
+    n_v = int(is_v.sum())
+    if len(vals) == 3 * n_v:
+        verts = vals.reshape(-1, 3)
+    else:
+        # Rows with extra columns (w, vertex colours): keep x y z per row
+        rows = re.findall(rb'^v[ \t]+([^\r\n]*)', data, re.M)
+        verts = np.array([r.split()[:3] for r in rows], dtype='S32').astype(np.float64).reshape(-1, 3)
+    if scale != 1.0:
+        verts = verts * scale
+
+    # Faces: drop everything from the first '/' of each token (vt/vn), then parse
+    fb = _select_lines(buf, line_of_byte, is_f)
+    ws = (fb == 32) | (fb == 9) | (fb == 10) | (fb == 13)
+    tok_start = ~ws & np.concatenate(([True], ws[:-1]))
+    slash = fb == ord('/')
+    cs = np.cumsum(slash)
+    at_start = np.maximum.accumulate(np.where(tok_start, cs - slash, 0)) if len(fb) else cs
+    keep = ws | (cs - at_start == 0)
+    fk = fb[keep].copy()
+    fk[fk == ord('f')] = 32
+    idx = np.fromstring(fk.tobytes(), dtype=np.int64, sep=' ')
+    tok_line = line_of_byte[is_f[line_of_byte]][tok_start] if len(fb) else np.zeros(0, np.int64)
+    f_lines = np.flatnonzero(is_f)
+    counts = np.bincount(np.searchsorted(f_lines, tok_line), minlength=len(f_lines)) - 1
+    counts = np.maximum(counts, 0)
+
+    # Negative indices are relative to the vertices defined so far
+    v_starts = starts[is_v]
+    f_starts = starts[is_f]
+    if (idx < 0).any():
+        seen = np.searchsorted(v_starts, f_starts)  # vertices before each face line
+        per_idx = np.repeat(seen, counts)
+        idx = np.where(idx < 0, per_idx + idx, idx - 1)
+    else:
+        idx = idx - 1
+
+    # Fan triangulation: (v0, vi, vi+1) for every polygon
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ntri = np.maximum(counts - 2, 0)
+    poly = np.repeat(np.arange(len(counts)), ntri)
+    k = np.arange(ntri.sum()) - np.repeat(np.cumsum(ntri) - ntri, ntri)
+    base = first[poly]
+    faces = np.stack((idx[base], idx[base + k + 1], idx[base + k + 2]), axis=1) if len(poly) else np.zeros((0, 3), np.int64)
+
+    # Groups and materials: the last statement before each face line applies to it
+    def labels(mask, prefix_len):
+        pos = starts[mask]
+        names = []
+        for p in pos:
+            end = data.find(b'\n', p)
+            names.append(data[p + prefix_len:end if end >= 0 else len(data)].strip().decode('utf-8', 'replace'))
+        which = np.searchsorted(pos, f_starts) - 1
+        return names, which
+    g_names, g_which = labels(is_g, 1)
+    u_names, u_which = labels(is_u, 6)
+    if g_names and len(g_which) and g_which.min() >= 0:
+        groups = g_names
+        face_group = np.repeat(g_which, ntri).astype(np.int32)
+    elif g_names:
+        # Faces before the first 'g' go to a default group
+        groups = ['(default)'] + g_names
+        face_group = np.repeat(g_which + 1, ntri).astype(np.int32)
+    else:
+        groups = [os.path.splitext(os.path.basename(path))[0]]
+        face_group = np.zeros(len(faces), np.int32)
+    face_material = np.repeat(u_which, ntri).astype(np.int32) if u_names else None
+    return IndexedMesh(verts, faces, groups, face_group, u_names, face_material)
+
+
+def _3mf_model_name(z):
+    for n in z.namelist():
+        if n.lower() == '3d/3dmodel.model':
+            return n
+    for n in z.namelist():
+        if n.lower().endswith('.model'):
+            return n
+    raise ValueError('3MF package has no model part')
+
+
+def _parse_3mf_transform(s):
+    """3MF 'm00 m01 m02 m10 ... m32' (row vectors) -> 4x3 matrix, or None."""
+    if not s:
+        return None
+    return np.array([float(x) for x in s.split()], np.float64).reshape(4, 3)
+
+
+_NS_CORE = '{%s}' % _3MF_NS
+_T_VERTEX = _NS_CORE + 'vertex'
+_T_TRIANGLE = _NS_CORE + 'triangle'
+_T_OBJECT = _NS_CORE + 'object'
+_T_COMPONENT = _NS_CORE + 'component'
+_T_ITEM = _NS_CORE + 'item'
+_T_CONTAINERS = {_NS_CORE + t for t in ('vertices', 'triangles', 'mesh', 'components', 'resources')}
+
+
+def iter_3mf_objects(path, build=None):
+    """Stream mesh objects of a 3MF without inflating the model XML in memory.
+    Yields dicts: id, name, vertices (N,3), faces (M,3), components [(objectid, transform)].
+    The model part is read straight from the zip stream with iterparse ('end' events
+    only) and every element is cleared as soon as it has been consumed.
+    build: optional list that receives the build items [(objectid, transform)].
+    """
+    _need_numpy()
+    with zipfile.ZipFile(path) as z:
+        with z.open(_3mf_model_name(z)) as stream:
+            coords, ids, comps = array('d'), array('q'), []
+            for _event, el in ET.iterparse(stream, events=('end',)):
+                tag = el.tag
+                if tag == _T_VERTEX:
+                    a = el.attrib
+                    coords.extend((float(a['x']), float(a['y']), float(a['z'])))
+                elif tag == _T_TRIANGLE:
+                    a = el.attrib
+                    ids.extend((int(a['v1']), int(a['v2']), int(a['v3'])))
+                elif tag == _T_COMPONENT:
+                    comps.append((el.get('objectid'), _parse_3mf_transform(el.get('transform'))))
+                elif tag == _T_OBJECT:
+                    yield {
+                        'id': el.get('id'),
+                        'name': el.get('name') or '',
+                        'vertices': np.frombuffer(coords, np.float64).reshape(-1, 3).copy(),
+                        'faces': np.frombuffer(ids, np.int64).reshape(-1, 3).copy(),
+                        'components': comps,
+                    }
+                    coords, ids, comps = array('d'), array('q'), []
+                elif tag == _T_ITEM:
+                    if build is not None:
+                        build.append((el.get('objectid'), _parse_3mf_transform(el.get('transform'))))
+                elif tag not in _T_CONTAINERS:
+                    continue
+                el.clear()
+
+
+def _apply_3mf_transform(v, m):
+    return v if m is None else v @ m[:3] + m[3]
+
+
+def read_3mf(path):
+    """Read the build of a 3MF into one IndexedMesh (one group per placed object)."""
+    _need_numpy()
+    build = []
+    objs = {o['id']: o for o in iter_3mf_objects(path, build)}
+    items = build or [(oid, None) for oid in objs]
+    verts, faces, groups, fgroup = [], [], [], []
+    nv = 0
+
+    def emit(oid, m, depth=0):
+        nonlocal nv
+        o = objs.get(oid)
+        if o is None or depth > 16:
+            return
+        if len(o['faces']):
+            verts.append(_apply_3mf_transform(o['vertices'], m))
+            faces.append(o['faces'] + nv)
+            fgroup.append(np.full(len(o['faces']), len(groups), np.int32))
+            groups.append(o['name'] or f"object {oid}")
+            nv += len(o['vertices'])
+        for cid, cm in o['components']:
+            # Component transform first, then the parent's
+            if cm is None:
+                full = m
+            elif m is None:
+                full = cm
+            else:
+                full = np.vstack((cm[:3] @ m[:3], cm[3] @ m[:3] + m[3]))
+            emit(cid, full, depth + 1)
+
+    for oid, m in items:
+        emit(oid, m)
+    if not faces:
+        return IndexedMesh(np.zeros((0, 3)), np.zeros((0, 3), np.int64), [os.path.basename(path)])
+    return IndexedMesh(np.concatenate(verts), np.concatenate(faces), groups, np.concatenate(fgroup))
+
+
+# Benchmark
+
+def _naive_obj(path):
+    """Line-by-line reference parser, only used to compare against in the benchmark."""
+    vs, fs = [], []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('v '):
+                vs.append([float(x) for x in line.split()[1:4]])
+            elif line.startswith('f '):
+                ids = [int(t.split('/')[0]) - 1 for t in line.split()[1:]]
+                for i in range(1, len(ids) - 1):
+                    fs.append([ids[0], ids[i], ids[i + 1]])
+    return len(vs), len(fs)
+
+
+def bench(folders, repeat=3):
+    """Parse every STL/OBJ/3MF under folders; print per-file and per-format throughput."""
+    _need_numpy()
+    paths = []
+    for d in folders:
+        for dirpath, _dirs, files in os.walk(d):
+            for fn in sorted(files):
+                if fn.lower().endswith(('.stl', '.obj', '.3mf')):
+                    paths.append(os.path.join(dirpath, fn))
+    totals = {}
+    print(f"{'file':48s} {'tris':>7s} {'ms':>8s} {'MB/s':>7s}")
+    for p in paths:
+        size = os.path.getsize(p)
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            m = read_mesh(p)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        ext = os.path.splitext(p)[1].lower()
+        t = totals.setdefault(ext, [0, 0.0, 0])
+        t[0] += size
+        t[1] += best
+        t[2] += len(m.faces)
+        print(f"{os.path.relpath(p)[-48:]:48s} {len(m.faces):7d} {best * 1000:8.1f} {size / 1e6 / best:7.1f}")
+    print()
+    for ext, (size, secs, tris) in sorted(totals.items()):
+        print(f"{ext:5s} {size / 1e6:7.2f} MB  {secs:6.3f}s  {size / 1e6 / secs:7.1f} MB/s  {tris / secs / 1e6:6.2f} Mtri/s")
+    objs = [p for p in paths if p.lower().endswith('.obj')]
+    if objs:
+        t0 = time.perf_counter()
+        for p in objs:
+            _naive_obj(p)
+        naive = time.perf_counter() - t0
+        print(f"\nOBJ line-by-line reference: {naive:.3f}s vs bulk {totals['.obj'][1]:.3f}s")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'bench':
+        here = os.path.dirname(os.path.abspath(__file__))
+        dirs = sys.argv[2:] or [os.path.join(here, '..', 'Generation1'), os.path.join(here, '..', 'Generation2')]
+        bench(dirs)
+    elif len(sys.argv) == 2:
+        print(read_mesh(sys.argv[1]))
+    else:
+        print('usage: python meshfiles.py bench [folders...] | python meshfiles.py <mesh file>')
@@ -0,0 +1,325 @@
+# ==== Mesh repair ====
+# Cleans exported meshes before they reach the slicer. Every step works on whole
+# arrays (numpy) or on the face adjacency graph and returns what it changed:
+#   weld        merge vertices closer than a tolerance
+#   degenerate  drop faces with repeated vertices or ~zero area
+#   duplicates  drop faces repeating another face with the same winding
+#   winding     make neighbouring faces agree (BFS over the face adjacency graph)
+#   normals     flip closed shells with negative signed volume so normals point outwards
+#   holes       close boundary loops up to a maximum number of edges
+#
+#   python meshrepair.py part.stl -o part_fixed.stl
+#   python meshrepair.py ../Generation2 --report repair.json   (report only)
+#   python meshrepair.py --selfcheck
+
+import os, json, argparse
+from collections import deque
+
+import numpy as np
+
+import meshfiles
+
+
+def weld(v, f, tol=1e-5):
+    """Merge vertices that fall in the same tol-sized grid cell."""
+    if not len(v):
+        return v, f, {'merged': 0}
+    q = np.round(v / tol).astype(np.int64)
+    _u, first, inv = np.unique(q, axis=0, return_index=True, return_inverse=True)
+    inv = inv.reshape(-1)
+    nv = v[first]
+    return nv, inv[f], {'merged': int(len(v) - len(nv))}
+
+
+def remove_degenerate(v, f, eps=1e-12):
+    """Drop faces with a repeated vertex index or an area below eps (mm^2)."""
+    rep = (f[:, 0] == f[:, 1]) | (f[:, 1] == f[:, 2]) | (f[:, 0] == f[:, 2])
+    t = v[f]
+    area = 0.5 * np.linalg.norm(np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0]), axis=1)
+    bad = rep | (area < eps)
+    return v, f[~bad], {'removed': int(bad.sum()), 'repeatedIndex': int(rep.sum())}
+
+
+def remove_duplicates(v, f):
+    """Drop faces repeating an earlier face with the same winding. The key is the
+    face rotated to start at its smallest vertex id, so the cyclic order is kept: a
+    coincident face with the opposite winding is where two closed bodies touch and
+    both stay."""
+    if not len(f):
+        return v, f, {'removed': 0}
+    rot = np.argmin(f, axis=1)
+    idx = (rot[:, None] + np.arange(3)) % 3
+    key = np.take_along_axis(f, idx, axis=1)
+    _u, first = np.unique(key, axis=0, return_index=True)
+    return v, f[np.sort(first)], {'removed': int(len(f) - len(first))}
+
+
+def _half_edges(f):
+    """Directed edges (a, b) of every face plus the owning face index."""
+    a = f.reshape(-1)
+    b = f[:, [1, 2, 0]].reshape(-1)
+    owner = np.repeat(np.arange(len(f)), 3)
+    return a, b, owner
+
+
+def face_adjacency(f):
+    """Pairs of faces sharing a manifold edge (exactly two faces).
+    Returns (f1, f2, same) where same is True when both faces traverse the shared
+    edge in the same direction, i.e. their windings disagree.
+    """
+    a, b, owner = _half_edges(f)
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    forward = a < b
+    order = np.lexsort((hi, lo))
+    lo_s, hi_s = lo[order], hi[order]
+    new = np.concatenate(([True], (lo_s[1:] != lo_s[:-1]) | (hi_s[1:] != hi_s[:-1])))
+    gid = np.cumsum(new) - 1
+    counts = np.bincount(gid)
+    starts = np.flatnonzero(new)
+    two = counts == 2
+    i1 = order[starts[two]]
+    i2 = order[starts[two] + 1]
+    return owner[i1], owner[i2], forward[i1] == forward[i2]
+
+
+def _components(nf, f1, f2):
+    """Connected components of the face graph (label per face) via BFS."""
+    adj = [[] for _ in range(nf)]
+    for x, y in zip(f1.tolist(), f2.tolist()):
+        adj[x].append(y)
+        adj[y].append(x)
+    label = np.full(nf, -1, np.int64)
+    n = 0
+    for s in range(nf):
+        if label[s] >= 0:
+            continue
+        label[s] = n
+        dq = deque([s])
+        while dq:
+            x = dq.popleft()
+            for y in adj[x]:
+                if label[y] < 0:
+                    label[y] = n
+                    dq.append(y)
+        n += 1
+    return label, n
+
+
+def fix_winding(v, f):
+    """Make face winding consistent within each connected shell.
+    BFS from a seed face per component; a neighbour sharing an edge in the same
+    direction must have the opposite flip state. Non-orientable conflicts (Moebius
+    like shells) are counted, not resolved.
+    """
+    f1, f2, same = face_adjacency(f)
+    nf = len(f)
+    adj = [[] for _ in range(nf)]
+    for x, y, s in zip(f1.tolist(), f2.tolist(), same.tolist()):
+        adj[x].append((y, s))
+        adj[y].append((x, s))
+    flip = np.zeros(nf, bool)
+    seen = np.zeros(nf, bool)
+    conflicts = 0
+    for s0 in range(nf):
+        if seen[s0]:
+            continue
+        seen[s0] = True
+        dq = deque([s0])
+        while dq:
+            x = dq.popleft()
+            fx = flip[x]
+            for y, s in adj[x]:
+                want = fx ^ s
+                if not seen[y]:
+                    seen[y] = True
+                    flip[y] = want
+                    dq.append(y)
+                elif flip[y] != want:
+                    conflicts += 1
+    out = f.copy()
+    out[flip] = out[flip][:, ::-1]
+    return v, out, {'flipped': int(flip.sum()), 'conflicts': conflicts // 2}
+
+
+def fix_normals(v, f):
+    """Flip every closed shell whose signed volume is negative (normals pointing
+    inwards). A shell counts as closed when each of its faces shares all three edges
+    with a neighbour; the signed volume of an open piece says nothing about its
+    orientation, so those are left alone."""
+    f1, f2, _same = face_adjacency(f)
+    label, n = _components(len(f), f1, f2)
+    degree = np.bincount(np.concatenate((f1, f2)), minlength=len(f))
+    closed = np.bincount(label, weights=(degree != 3), minlength=n) == 0
+    t = v[f]
+    vol6 = np.einsum('ij,ij->i', t[:, 0], np.cross(t[:, 1], t[:, 2]))
+    shell_vol = np.bincount(label, weights=vol6, minlength=n)
+    inverted = closed & (shell_vol < 0)
+    flip = inverted[label]
+    out = f.copy()
+    out[flip] = out[flip][:, ::-1]
+    return v, out, {'shells': int(n), 'invertedShells': int(inverted.sum()), 'flippedFaces': int(flip.sum())}
+
+
+def boundary_loops(f):
+    """Ordered vertex loops along boundary half-edges (edges without an opposite).
+    Loops through vertices with several outgoing boundary edges are skipped as ambiguous.
+    """
+    a, b, _owner = _half_edges(f)
+    key = a.astype(np.int64) * (int(f.max()) + 1 if len(f) else 1) + b
+    rkey = b.astype(np.int64) * (int(f.max()) + 1 if len(f) else 1) + a
+    boundary = ~np.isin(key, rkey)
+    ba, bb = a[boundary], b[boundary]
+    nxt = {}
+    ambiguous = set()
+    for x, y in zip(ba.tolist(), bb.tolist()):
+        if x in nxt:
+            ambiguous.add(x)
+        nxt[x] = y
+    loops, used = [], set()
+    for s in list(nxt):
+        if s in used:
+            continue
+        loop, x, ok = [], s, True
+        while x not in used:
+            if x in ambiguous or x not in nxt:
+                ok = False
+                break
+            used.add(x)
+            loop.append(x)
+            x = nxt[x]
+        if ok and x == s and len(loop) >= 3:
+            loops.append(loop)
+    return loops, int(boundary.sum())
+
+
+def fill_holes(v, f, max_edges=16):
+    """Close boundary loops of up to max_edges edges with a triangle fan.
+    The new faces run against the boundary half-edges, so they match the winding
+    of the surrounding faces."""
+    loops, nb = boundary_loops(f)
+    new = []
+    filled = 0
+    for loop in loops:
+        if len(loop) > max_edges:
+            continue
+        v0 = loop[0]
+        for i in range(1, len(loop) - 1):
+            new.append((v0, loop[i + 1], loop[i]))
+        filled += 1
+    if new:
+        f = np.vstack((f, np.array(new, dtype=f.dtype)))
+    return v, f, {'boundaryEdges': nb, 'loops': len(loops), 'filled': filled,
+                  'skippedLarge': sum(1 for l in loops if len(l) > max_edges), 'facesAdded': len(new)}
+
+
+def repair(v, f, tol=1e-5, max_hole_edges=16):
+    """Run all steps in order. Returns (vertices, faces, report list)."""
+    v = np.asarray(v, np.float64)
+    f = np.asarray(f, np.int64)
+    report = []
+    steps = (
+        ('weld', lambda v, f: weld(v, f, tol)),
+        ('degenerate', remove_degenerate),
+        ('duplicates', remove_duplicates),
+        ('winding', fix_winding),
+        ('normals', fix_normals),
+        ('holes', lambda v, f: fill_holes(v, f, max_hole_edges)),
+    )
+    for name, fn in steps:
+        v, f, info = fn(v, f)
+        info['step'] = name
+        report.append(info)
+    # Drop vertices no face uses any more
+    used, inv = np.unique(f, return_inverse=True)
+    unused = len(v) - len(used)
+    v, f = v[used], inv.reshape(-1, 3)
+    report.append({'step': 'compact', 'removedVertices': int(unused)})
+    return v, f, report
+
+
+def changed(report):
+    """True when any step modified the mesh."""
+    keys = ('merged', 'removed', 'flipped', 'flippedFaces', 'facesAdded', 'removedVertices')
+    return any(r.get(k) for r in report for k in keys)
+
+
+def repair_file(path, out_path=None, **kw):
+    """Repair one mesh file; writes out_path (any of stl/obj/3mf) when given."""
+    m = meshfiles.read_mesh(path)
+    v, f, report = repair(m.vertices, m.faces, **kw)
+    if out_path:
+        ext = os.path.splitext(out_path)[1].lower()
+        name = os.path.splitext(os.path.basename(path))[0]
+        if ext == '.stl':
+            meshfiles.write_stl(out_path, v, f)
+        elif ext == '.obj':
+            meshfiles.write_obj(out_path, v, f, name)
+        else:
+            meshfiles.write_3mf(out_path, [(name, v, f)])
+    return {'path': path, 'faces': [int(len(m.faces)), int(len(f))], 'steps': report}
+
+
+def _cube(x0=0.0, size=1.0):
+    """Closed, outward-wound cube (8 vertices, 12 faces) starting at x = x0."""
+    v = np.array([[x0 + x, y, z] for x in (0, size) for y in (0, size) for z in (0, size)], np.float64)
+    f = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                  [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]], np.int64)
+    return v, f
+
+
+def selfcheck():
+    """Repair must leave clean meshes alone and only reorient closed shells."""
+    # Two closed cubes touching at x = 1: the contact is a pair of opposite faces
+    (va, fa), (vb, fb) = _cube(0.0), _cube(1.0)
+    v, f = np.vstack((va, vb)), np.vstack((fa, fb + len(va)))
+    v, f, _r = weld(v, f)
+    _v, f2, report = repair(v, f)
+    assert not changed(report), report
+    assert len(f2) == 24
+    # An inverted closed cube is flipped; an inverted open box is not
+    v, f = _cube()
+    _v, _f, report = repair(v, f[:, ::-1])
+    assert report[4]['invertedShells'] == 1 and report[4]['flippedFaces'] == 12, report
+    _v, _f, report = repair(v, f[2:][:, ::-1], max_hole_edges=0)
+    assert report[4]['invertedShells'] == 0 and report[4]['flippedFaces'] == 0, report
+    print('meshrepair selfcheck OK')
+    return True
+
+
+def _summary_line(res):
+    parts = []
+    for r in res['steps']:
+        vals = ', '.join(f"{k}={v}" for k, v in r.items() if k != 'step' and v)
+        if vals:
+            parts.append(f"{r['step']}({vals})")
+    return f"{os.path.relpath(res['path'])}: {res['faces'][0]} -> {res['faces'][1]} faces  " + ('  '.join(parts) or 'clean')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Repair exported meshes')
+    ap.add_argument('path', nargs='?', help='mesh file or folder')
+    ap.add_argument('-o', '--output', help='output file (single input only)')
+    ap.add_argument('--tol', type=float, default=1e-5, help='weld tolerance in mm')
+    ap.add_argument('--max-hole-edges', type=int, default=16)
+    ap.add_argument('--report', help='write a JSON report')
+    ap.add_argument('--selfcheck', action='store_true', help='check that clean multi-body meshes come out unchanged')
+    args = ap.parse_args()
+    if args.selfcheck:
+        selfcheck()
+        raise SystemExit(0)
+    if not args.path:
+        ap.error('path is required')
+    if os.path.isdir(args.path):
+        paths = []
+        for dirpath, _dirs, files in os.walk(args.path):
+            paths += [os.path.join(dirpath, fn) for fn in sorted(files) if fn.lower().endswith(('.stl', '.3mf'))]
+    else:
+        paths = [args.path]
+    results = []
+    for p in paths:
+        res = repair_file(p, args.output if len(paths) == 1 else None, tol=args.tol, max_hole_edges=args.max_hole_edges)
+        results.append(res)
+        print(_summary_line(res))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=1)
@@ -0,0 +1,192 @@
+# ==== Print orientation optimizer ====
+# Scores candidate "down" directions for every mesh of a folder and picks the one
+# needing the least support. Candidates are evenly spread directions (Fibonacci
+# sphere) plus the normals of the largest flat areas (lay that face on the bed);
+# the orientation as exported is always included as a baseline.
+# All candidates of a mesh are scored at once with (faces x candidates) arrays:
+#   overhang  area of faces pointing down steeper than the overhang angle
+#   support   overhang area projected onto the bed times its height (rough volume)
+#   contact   area of faces lying flat on the bed
+#   height    build height
+# Orientations with almost no flat bed contact are penalized as unstable.
+#
+#   python orient.py ../Generation2 -o Generation2_oriented.3mf
+#   python orient.py ../Generation2 --stl-dir oriented/
+#
+# Needs numpy.
+
+import os, sys, time, argparse
+
+import numpy as np
+
+import meshfiles
+import repack3mf
+
+OVERHANG_DEG = 45.0
+CONTACT_TOL_MM = 0.05
+MIN_CONTACT_MM2 = 25.0  # less flat area on the bed than this counts as unstable
+# Lower score wins; metrics are normalized by part size (see score_candidates)
+WEIGHTS = {'support': 1.0, 'overhang': 0.25, 'contact': 0.5, 'height': 0.1}
+
+
+def fibonacci_directions(n):
+    """n roughly evenly spaced unit vectors on the sphere."""
+    i = np.arange(n) + 0.5
+    phi = np.arccos(1 - 2 * i / n)
+    theta = np.pi * (1 + 5 ** 0.5) * i
+    return np.column_stack((np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), np.cos(phi)))
+
+
+def face_directions(normals, areas, n):
+    """Normals of the n largest flat regions (faces with near-equal normals summed)."""
+    if not len(normals):
+        return np.zeros((0, 3))
+    q = np.round(normals, 2)
+    u, inv = np.unique(q, axis=0, return_inverse=True)
+    tot = np.bincount(inv.reshape(-1), weights=areas, minlength=len(u))
+    top = np.argsort(tot)[::-1][:n]
+    d = u[top]
+    return d / np.maximum(np.linalg.norm(d, axis=1, keepdims=True), 1e-12)
+
+
+def candidates(normals, areas, n_sample=96, n_face=24):
+    d = np.vstack(([[0.0, 0.0, -1.0]], fibonacci_directions(n_sample), face_directions(normals, areas, n_face)))
+    # Drop near-duplicates, keeping the first (so the baseline stays at index 0)
+    _u, first = np.unique(np.round(d, 3), axis=0, return_index=True)
+    return d[np.sort(first)]
+
+
+def rotation_to_down(d):
+    """3x3 rotation taking unit vector d to (0, 0, -1)."""
+    t = np.array([0.0, 0.0, -1.0])
+    c = float(np.dot(d, t))
+    if c > 1 - 1e-12:
+        return np.eye(3)
+    if c < -1 + 1e-12:
+        return np.diag([1.0, -1.0, -1.0])
+    ax = np.cross(d, t)
+    s = np.linalg.norm(ax)
+    k = ax / s
+    kx = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+    return np.eye(3) + s * kx + (1 - c) * (kx @ kx)
+
+
+def score_candidates(v, f, dirs, overhang_deg=OVERHANG_DEG, weights=None, max_cells=8_000_000):
+    """Metrics and score for every candidate down direction.
+    Returns a dict of arrays, one value per candidate."""
+    w = dict(WEIGHTS, **(weights or {}))
+    t = v[f]
+    cr = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+    dbl = np.linalg.norm(cr, axis=1)
+    ok = dbl > 0
+    t, cr, dbl = t[ok], cr[ok], dbl[ok]
+    areas = 0.5 * dbl
+    normals = cr / dbl[:, None]
+    cent = t.mean(axis=1)
+    cos_oh = np.cos(np.radians(90.0 - overhang_deg))
+    total_area = max(areas.sum(), 1e-12)
+    diag = max(np.linalg.norm(v.max(0) - v.min(0)), 1e-12)
+
+    k = len(dirs)
+    out = {m: np.empty(k) for m in ('overhang', 'support', 'contact', 'height')}
+    # Chunk candidates so (faces x candidates) stays bounded on big meshes
+    step = max(1, int(max_cells // max(len(areas), len(v), 1)))
+    for s in range(0, k, step):
+        d = dirs[s:s + step]
+        # z after rotating d onto -Z is the negated projection onto d
+        vz = -(v @ d.T)
+        zmin = vz.min(axis=0)
+        nz = -(normals @ d.T)
+        cz = -(cent @ d.T) - zmin
+        fz = (-(t.reshape(-1, 3) @ d.T)).reshape(len(t), 3, -1).max(axis=1) - zmin
+        on_bed = fz < CONTACT_TOL_MM
+        down = nz < -cos_oh
+        oh = down & ~on_bed
+        out['overhang'][s:s + step] = areas @ oh
+        out['support'][s:s + step] = (areas[:, None] * -nz * cz * oh).sum(axis=0)
+        out['contact'][s:s + step] = areas @ (on_bed & (nz < -0.99))
+        out['height'][s:s + step] = vz.max(axis=0) - zmin
+    out['score'] = (w['support'] * out['support'] / (total_area * diag)
+                    + w['overhang'] * out['overhang'] / total_area
+                    - w['contact'] * out['contact'] / total_area
+                    + w['height'] * out['height'] / diag
+                    + (out['contact'] < min(MIN_CONTACT_MM2, 0.02 * total_area)))
+    return out
+
+
+def best_orientation(v, f, n_sample=96, n_face=24, weights=None):
+    """Pick the best candidate. Returns (rotation 3x3, info dict with chosen and baseline metrics)."""
+    t = v[f]
+    cr = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+    dbl = np.linalg.norm(cr, axis=1)
+    ok = dbl > 0
+    dirs = candidates(cr[ok] / dbl[ok, None], 0.5 * dbl[ok], n_sample, n_face)
+    sc = score_candidates(v, f, dirs, weights=weights)
+    i = int(np.argmin(sc['score']))
+    pick = lambda j: {m: float(sc[m][j]) for m in ('overhang', 'support', 'contact', 'height', 'score')}
+    return rotation_to_down(dirs[i]), {
+        'down': [round(float(x), 4) for x in dirs[i]],
+        'candidates': len(dirs),
+        'best': pick(i),
+        'baseline': pick(0),
+    }
+
+
+def orient_folder(folder, out_3mf=None, stl_dir=None, prefer='3mf', recursive=False, level=9, **kw):
+    """Orient every part of folder; write one 3MF with the rotations as component
+    transforms and/or rotated STLs resting on the bed. Returns (rows, seconds)."""
+    t0 = time.perf_counter()
+    rows, parts, meshes = [], [], {}
+    for p in meshfiles.find_meshes(folder, prefer, recursive):
+        m = meshfiles.read_mesh(p)
+        if not len(m.faces):
+            continue
+        v, f = m.vertices, m.faces
+        r, info = best_orientation(v, f, **kw)
+        name = os.path.splitext(os.path.basename(p))[0]
+        info['name'] = name
+        info['path'] = p
+        rows.append(info)
+        if out_3mf:
+            k = repack3mf._mesh_key(v, f)
+            meshes.setdefault(k, (v, f, name))
+            # 3MF transforms are row-vector 4x3 matrices: v' = v @ M[:3] + M[3]
+            parts.append((name, p, [(k, np.vstack((r.T, np.zeros(3))))]))
+        if stl_dir:
+            rv = v @ r.T
+            rv -= [(rv[:, 0].min() + rv[:, 0].max()) / 2, (rv[:, 1].min() + rv[:, 1].max()) / 2, rv[:, 2].min()]
+            os.makedirs(stl_dir, exist_ok=True)
+            meshfiles.write_stl(os.path.join(stl_dir, name + '.stl'), rv, f)
+    if out_3mf and parts:
+        repack3mf.write_package(out_3mf, parts, meshes, level, arrange=True)
+    return rows, time.perf_counter() - t0
+
+
+def format_report(rows, seconds):
+    lines = [f"{'part':32} {'down':>22} {'support mm3':>14} {'overhang mm2':>14} {'contact mm2':>12} {'height':>8}"]
+    for r in rows:
+        b, o = r['best'], r['baseline']
+        d = '(%.2f,%.2f,%.2f)' % tuple(r['down'])
+        lines.append(f"{r['name'][:32]:32} {d:>22} {b['support']:14.0f} {b['overhang']:14.0f} {b['contact']:12.0f} {b['height']:8.1f}")
+        if b['score'] < o['score']:
+            lines.append(f"{'  as exported':32} {'':>22} {o['support']:14.0f} {o['overhang']:14.0f} {o['contact']:12.0f} {o['height']:8.1f}")
+    sup_b = sum(r['best']['support'] for r in rows)
+    sup_o = sum(r['baseline']['support'] for r in rows)
+    lines.append(f"{len(rows)} parts in {seconds:.2f}s; estimated support {sup_o:.0f} -> {sup_b:.0f} mm3")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Pick print orientations for the meshes of a folder')
+    ap.add_argument('folder')
+    ap.add_argument('-o', '--output', help='write one 3MF with every part rotated and arranged on the plate')
+    ap.add_argument('--stl-dir', help='write rotated STLs resting on the bed into this folder')
+    ap.add_argument('--prefer', choices=('3mf', 'stl'), default='3mf', help='source when both exist for a design')
+    ap.add_argument('--samples', type=int, default=96, help='sampled directions per part')
+    ap.add_argument('--faces', type=int, default=24, help='face-aligned directions per part')
+    ap.add_argument('-r', '--recursive', action='store_true')
+    args = ap.parse_args()
+    rows, secs = orient_folder(args.folder, args.output, args.stl_dir, args.prefer, args.recursive,
+                               n_sample=args.samples, n_face=args.faces)
+    print(format_report(rows, secs))
+    sys.exit(0)
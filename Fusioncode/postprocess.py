@@ -0,0 +1,353 @@
+# ==== Post-processing pipeline (overlaps Fusion export with local work) ====
+# The Fusion-bound exporter only produces files and submit()s them; a bounded pool
+# runs the CPU/disk heavy steps (hashing, validation, compression, ...) meanwhile.
+# submit() blocks once max_pending files are queued, so a slow post stage throttles
+# the exporter instead of piling up work. Wall time then approaches
+# max(export time, post time) instead of their sum; run
+#   python postprocess.py demo
+# to see it with a fake exporter.
+#
+# Inside Fusion use mode='thread' (hashlib/zlib release the GIL and Fusion's embedded
+# interpreter can't spawn worker processes); offline tools may use mode='process'.
+
+import os, sys, json, time, gzip, shutil, hashlib, zipfile, threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+CHUNK = 1 << 20
+MANIFEST_NAME = 'export_manifest.json'
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            b = f.read(CHUNK)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def step_hash(path, res):
+    res['sha256'] = sha256_file(path)
+
+
+def step_validate(path, res):
+    """Cheap structural check of a mesh file; raises on a broken file."""
+    ext = os.path.splitext(path)[1].lower()
+    size = os.path.getsize(path)
+    if size == 0:
+        raise ValueError('empty file')
+    if ext == '.stl':
+        with open(path, 'rb') as f:
+            head = f.read(84)
+        if len(head) == 84:
+            n = int.from_bytes(head[80:84], 'little')
+            if size == 84 + 50 * n:
+                res['triangles'] = n
+                return
+        if head[:5].lower() != b'solid':
+            raise ValueError('not a binary or ASCII STL')
+    elif ext == '.3mf':
+        with zipfile.ZipFile(path) as z:
+            names = z.namelist()
+            if not any(n.lower().endswith('.model') for n in names):
+                raise ValueError('3MF package has no model part')
+            bad = z.testzip()
+            if bad:
+                raise ValueError(f'corrupt zip member {bad}')
+    elif ext == '.obj':
+        seen_v = seen_f = False
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.startswith(b'v '):
+                    seen_v = True
+                elif line.startswith(b'f '):
+                    seen_f = True
+                    break
+        if not (seen_v and seen_f):
+            raise ValueError('OBJ has no vertices/faces')
+
+
+def step_gzip(path, res, level=6):
+    out = path + '.gz'
+    with open(path, 'rb') as src, gzip.open(out, 'wb', compresslevel=level) as dst:
+        shutil.copyfileobj(src, dst, CHUNK)
+    res['gzip'] = os.path.getsize(out)
+
+
+def step_repair(path, res):
+    """Weld/clean/reorient the mesh (meshrepair.py, needs numpy). Binary STL is
+    rewritten in place when something changed; 3MF/OBJ are only reported since a
+    rewrite would drop their names, colours and thumbnails."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ('.stl', '.3mf', '.obj'):
+        return
+    try:
+        import meshrepair
+    except ImportError:
+        raise RuntimeError('mesh repair needs numpy')
+    m = meshrepair.meshfiles.read_mesh(path)
+    v, f, report = meshrepair.repair(m.vertices, m.faces)
+    res['repair'] = {r['step']: {k: x for k, x in r.items() if k != 'step' and x} for r in report}
+    if ext == '.stl' and meshrepair.changed(report):
+        meshrepair.meshfiles.write_stl(path, v, f)
+        res['repaired'] = True
+        res['size'] = os.path.getsize(path)
+
+
+def step_estimate(path, res):
+    """Filament/print-time estimate with the default profile (estimate.py, needs numpy)."""
+    if os.path.splitext(path)[1].lower() not in ('.stl', '.3mf', '.obj'):
+        return
+    try:
+        import estimate
+    except ImportError:
+        raise RuntimeError('estimates need numpy')
+    e = estimate.estimate_file(path)
+    res['estimate'] = {k: round(e[k], 3) for k in ('volumeCm3', 'grams', 'meters', 'seconds')}
+
+
+def step_shape(path, res):
+    """Descriptor for the shape-similarity index (shapeindex.py, needs numpy). The
+    index itself is updated once post-processing finishes (shapeindex.add_results)."""
+    if os.path.splitext(path)[1].lower() not in ('.stl', '.3mf', '.obj'):
+        return
+    import shapeindex
+    if shapeindex.np is None:
+        raise RuntimeError('the shape index needs numpy')
+    if shapeindex.meshfiles.is_lod_file(os.path.basename(path)):
+        return
+    res['shape'] = shapeindex.describe_file(path).tolist()
+    if 'sha256' not in res:
+        res['sha256'] = sha256_file(path)
+
+
+def step_lod(path, res):
+    """Coarse LOD copies next to the file, recorded in the folder's lod_index.json
+    (lod.py, needs numpy). Unchanged content is skipped, as with lod.py build."""
+    if os.path.splitext(path)[1].lower() not in ('.stl', '.3mf'):
+        return
+    try:
+        import lod
+    except ImportError:
+        raise RuntimeError('LODs need numpy')
+    if lod.meshfiles.is_lod_file(os.path.basename(path)):
+        return
+    entry = lod.update_file(path, digest=res.get('sha256'))
+    res['lod'] = [l['faces'] for l in entry['levels'][1:]] if entry else 'unchanged'
+
+
+def estimate_totals(results):
+    """Sum the estimates of a run, counting a design once even if it was exported
+    in several formats."""
+    seen = {}
+    for r in results:
+        if 'estimate' in r:
+            seen.setdefault(os.path.splitext(r['path'])[0], r['estimate'])
+    return {k: sum(e[k] for e in seen.values()) for k in ('grams', 'meters', 'seconds')}, len(seen)
+
+
+STEPS = {
+    'repair': step_repair,
+    'hash': step_hash,
+    'validate': step_validate,
+    'gzip': step_gzip,
+    'estimate': step_estimate,
+    'shape': step_shape,
+    'lod': step_lod,
+}
+
+
+def parse_steps(text):
+    """'hash, validate' -> ['hash', 'validate']; unknown names raise ValueError."""
+    names = [s.strip().lower() for s in (text or '').split(',') if s.strip()]
+    for n in names:
+        if n not in STEPS:
+            raise ValueError(f"Unknown post-processing step '{n}' (available: {', '.join(sorted(STEPS))})")
+    # repair may rewrite the file, so it has to run before anything that reads it
+    if 'repair' in names:
+        names.remove('repair')
+        names.insert(0, 'repair')
+    return names
+
+
+def run_steps(path, rel, steps):
+    """Run named steps on one file. Top-level so process pools can pickle it."""
+    t0 = time.time()
+    res = {'path': rel, 'size': 0, 'errors': []}
+    try:
+        res['size'] = os.path.getsize(path)
+    except OSError as ex:
+        res['errors'].append(str(ex))
+        return res
+    for name in steps:
+        try:
+            (STEPS.get(name) or _DEMO_STEPS[name])(path, res)
+        except Exception as ex:
+            res['errors'].append(f"{name}: {ex}")
+    res['seconds'] = time.time() - t0
+    return res
+
+
+class PostProcessor:
+    """Bounded producer/consumer pool for exported files.
+    root: base output folder; manifest paths are stored relative to it.
+    """
+    def __init__(self, root, steps=('hash', 'validate'), workers=2, max_pending=8, mode='thread'):
+        self.root = root
+        self.steps = list(steps)
+        pool_cls = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+        self.pool = pool_cls(max_workers=max(1, int(workers)))
+        self.slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self.futures = []
+        self.results = []
+        self.stats = {'submitted': 0, 'failed': 0, 'tBlocked': 0.0, 'tWork': 0.0, 'tDrain': 0.0}
+
+    def _done(self, fut):
+        self.slots.release()
+
+    def submit(self, path, rel=None):
+        """Queue a finished output file; blocks while max_pending files are in flight."""
+        if rel is None:
+            rel = os.path.relpath(path, self.root) if self.root else path
+        t0 = time.time()
+        self.slots.acquire()
+        self.stats['tBlocked'] += time.time() - t0
+        fut = self.pool.submit(run_steps, path, rel.replace('\\', '/'), self.steps)
+        fut.add_done_callback(self._done)
+        self.futures.append(fut)
+        self.stats['submitted'] += 1
+
+    def drain(self):
+        """Wait for outstanding work and return the results finished since the last drain."""
+        t0 = time.time()
+        done = []
+        for fut in self.futures:
+            try:
+                res = fut.result()
+            except Exception as ex:
+                res = {'path': '?', 'size': 0, 'errors': [str(ex)]}
+            done.append(res)
+            self.stats['tWork'] += res.get('seconds', 0.0)
+            if res['errors']:
+                self.stats['failed'] += 1
+        self.futures = []
+        self.results.extend(done)
+        self.stats['tDrain'] += time.time() - t0
+        return done
+
+    def close(self):
+        """Drain and shut the pool down; returns all results of this processor."""
+        self.drain()
+        self.pool.shutdown(wait=True)
+        return self.results
+
+
+def write_manifest(root, results, extra=None):
+    """Write export_manifest.json (path, size, sha256, triangles per output) into root.
+    Entries from an existing manifest are kept unless a result replaces them, so
+    partial runs (watch mode, filtered targets) update rather than truncate it."""
+    path = os.path.join(root, MANIFEST_NAME)
+    files = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for e in json.load(f).get('files', []):
+                files[e['path']] = e
+    except Exception:
+        pass
+    for r in results:
+        e = {k: r[k] for k in ('path', 'size', 'sha256', 'triangles', 'repaired', 'estimate') if k in r}
+        if r.get('errors'):
+            e['errors'] = r['errors']
+        files[r['path']] = e
+    data = {'generated': time.strftime('%Y-%m-%dT%H:%M:%S'), 'files': [files[k] for k in sorted(files)]}
+    if extra:
+        data.update(extra)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+# Demo: fake exporter vs. fake CPU-heavy post step
+
+def _demo_work(seconds):
+    # Busy loop in a worker process so the demo exercises real CPU contention
+    end = time.perf_counter() + seconds
+    x = 0
+    while time.perf_counter() < end:
+        x += 1
+    return x
+
+
+def _demo_step(path, res):
+    _demo_work(float(os.environ.get('POSTPROCESS_DEMO_SECONDS', '0.05')))
+    step_hash(path, res)
+
+
+# Kept out of STEPS so the demo step can't be picked for real exports
+_DEMO_STEPS = {'demo': _demo_step}
+
+
+def demo(n_files=24, export_s=0.05, post_s=0.05, workers=2, mode='process'):
+    import tempfile
+    # Read by the worker processes too, so set it before the pool starts
+    os.environ['POSTPROCESS_DEMO_SECONDS'] = str(post_s)
+    tmp = tempfile.mkdtemp(prefix='postprocess-demo-')
+    payload = os.urandom(256 * 1024)
+
+    def fake_export(i):
+        # Stands in for em.execute(): Fusion-bound, blocks the main thread
+        time.sleep(export_s)
+        p = os.path.join(tmp, f'part{i:03d}.stl')
+        with open(p, 'wb') as f:
+            f.write(payload)
+        return p
+
+    t0 = time.time()
+    for i in range(n_files):
+        p = fake_export(i)
+        run_steps(p, os.path.basename(p), ['demo'])
+    serial = time.time() - t0
+
+    t0 = time.time()
+    pp = PostProcessor(tmp, ['demo'], workers=workers, max_pending=workers * 2, mode=mode)
+    for i in range(n_files):
+        pp.submit(fake_export(i))
+    pp.close()
+    piped = time.time() - t0
+    shutil.rmtree(tmp, ignore_errors=True)
+    ideal = n_files * max(export_s, post_s / workers)
+    print(f"{n_files} files, export {export_s*1000:.0f} ms, post {post_s*1000:.0f} ms, {workers} {mode} workers")
+    print(f"serial:    {serial:.2f}s")
+    print(f"pipelined: {piped:.2f}s (ideal ~{ideal:.2f}s, producer blocked {pp.stats['tBlocked']:.2f}s)")
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='Post-processing pipeline tools')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    d = sub.add_parser('demo', help='compare serial vs pipelined with a fake exporter')
+    d.add_argument('--files', type=int, default=24)
+    d.add_argument('--export-ms', type=float, default=50)
+    d.add_argument('--post-ms', type=float, default=50)
+    d.add_argument('--workers', type=int, default=2)
+    d.add_argument('--mode', choices=('thread', 'process'), default='process')
+    r = sub.add_parser('run', help='run steps over existing files and write a manifest')
+    r.add_argument('root')
+    r.add_argument('--steps', default='hash,validate')
+    r.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    args = ap.parse_args()
+    if args.cmd == 'demo':
+        demo(args.files, args.export_ms / 1000.0, args.post_ms / 1000.0, args.workers, args.mode)
+    else:
+        pp = PostProcessor(args.root, parse_steps(args.steps), workers=args.workers, max_pending=args.workers * 4)
+        for dirpath, _dirs, files in os.walk(args.root):
+            for fn in sorted(files):
+                if fn.lower().endswith(('.stl', '.3mf', '.obj')):
+                    pp.submit(os.path.join(dirpath, fn))
+        results = pp.close()
+        print(write_manifest(args.root, results))
+        sys.exit(1 if pp.stats['failed'] else 0)
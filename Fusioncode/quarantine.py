@@ -0,0 +1,375 @@
+# ==== Per-document watchdog and quarantine list ====
+# Pure-Python helpers used by FolderToGit.py. One corrupt or huge design can keep
+# app.documents.open or exportManager.execute busy for many minutes, and the next
+# run would hit the same file again.
+#
+# 1) Watchdog times every Fusion call of a document (open, each export, close)
+#    against a per-stage budget. The call itself can't be interrupted from Python,
+#    so a monitor thread flags the overrun while it happens and records the file in
+#    the quarantine right away; as soon as control comes back the exporter abandons
+#    the document (no further formats) and closes it.
+# 2) While a call runs, an in-flight marker (refreshed by the monitor thread) names
+#    the document. If Fusion has to be killed, the next run finds the stale marker
+#    and quarantines that file too.
+# 3) Quarantine keeps the list on disk with reason, stage and time. Later runs skip
+#    those files, or with policy 'last' try them after the rest of their folder. A
+#    new version of a file gets a fresh chance.
+#
+#   python quarantine.py list
+#   python quarantine.py release "Generation2/Dekselscherm"    # or a key, or --all
+#   python quarantine.py simulate                              # fake stalling documents
+
+import os, sys, json, time, glob, threading, argparse
+
+import exportplan
+
+QUARANTINE_NAME = 'quarantine.json'
+MARKER_GLOB = 'inflight-*.json'
+BUDGETS = {'open': 300.0, 'export': 300.0, 'close': 120.0}   # seconds per stage
+POLICIES = ('skip', 'last', 'retry')
+POLL_S = 1.0
+STALE_S = 60.0      # a marker the monitor thread hasn't touched for this long belongs to a dead session
+
+
+class StageTimeout(RuntimeError):
+    """Raised by Watchdog.check() for a document that overran a stage budget."""
+
+
+def parse_budgets(text):
+    """'open=120, export=600' -> budgets dict (missing stages keep their default)."""
+    budgets = dict(BUDGETS)
+    if isinstance(text, dict):
+        items = text.items()
+    else:
+        items = [p.split('=', 1) for p in str(text or '').replace(';', ',').split(',') if p.strip()]
+    for item in items:
+        if len(item) != 2:
+            raise ValueError(f"Expected stage=seconds, got '{'='.join(item)}'")
+        stage, secs = str(item[0]).strip().lower(), item[1]
+        if stage not in BUDGETS:
+            raise ValueError(f"Unknown stage '{stage}' (expected one of {', '.join(BUDGETS)})")
+        budgets[stage] = float(secs)
+    return budgets
+
+
+def _rel_name(rel, name):
+    return f"{rel}/{name}".replace('\\', '/') if rel else name
+
+
+class Quarantine:
+    """Quarantined files, stored as JSON: {key: {name, path, version, stage, reason,
+    seconds, count, first, last}}. Every change re-reads the file first so several
+    sessions (sharded jobs) can share it."""
+    def __init__(self, state_dir=None):
+        self.dir = state_dir or exportplan._state_dir()
+        self.path = os.path.join(self.dir, QUARANTINE_NAME)
+        self.entries = {}
+        self.load()
+        self.recovered = self._recover()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {}) or {}
+        except:
+            self.entries = {}
+
+    def _save(self):
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            tmp = self.path + f".{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.entries}, f, indent=1)
+            os.replace(tmp, self.path)
+        except:
+            pass
+
+    def add(self, key, name, path, version, stage, reason, seconds=0.0):
+        self.load()
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        e = self.entries.get(key) or {'count': 0, 'first': now}
+        e.update({'name': name, 'path': path, 'version': version, 'stage': stage, 'reason': reason,
+                  'seconds': round(float(seconds), 1), 'count': e['count'] + 1, 'last': now})
+        self.entries[key] = e
+        self._save()
+        return e
+
+    def release(self, key):
+        self.load()
+        if self.entries.pop(key, None) is None:
+            return False
+        self._save()
+        return True
+
+    def find(self, text):
+        """Keys whose key, name or path match text."""
+        return [k for k, e in self.entries.items() if text in (k, e.get('name'), e.get('path'))]
+
+    def blocks(self, key, version):
+        """True when this version of the file is quarantined."""
+        e = self.entries.get(key)
+        return bool(e) and (not e.get('version') or not version or e['version'] == version)
+
+    def _recover(self):
+        """Quarantine the documents that dead sessions were stuck on."""
+        found = []
+        for marker in glob.glob(os.path.join(self.dir, MARKER_GLOB)):
+            try:
+                if time.time() - os.path.getmtime(marker) < STALE_S:
+                    continue   # a live session's monitor keeps touching it
+                with open(marker, 'r', encoding='utf-8') as f:
+                    m = json.load(f)
+                self.add(m['key'], m['name'], m['path'], m.get('version', 0), m['stage'],
+                         f"Fusion stopped during {m['stage']} (session ended or was killed)",
+                         max(0.0, os.path.getmtime(marker) - m.get('started', 0.0)))
+                found.append(m['key'])
+                os.remove(marker)
+            except:
+                pass
+        return found
+
+
+class Watchdog:
+    """Per-stage time budgets for the Fusion calls of each document.
+      with wd.watch(df, rel_path, 'open'): ...     # one Fusion call (or a few)
+      wd.stage(df, rel_path, 'export:stl')          # or: the calls from here on
+      wd.check(df)                                  # raises StageTimeout once overrun
+      wd.finish(df, ok)                             # document done
+    Only one call is in flight at a time (the API is synchronous), which is what the
+    monitor thread watches."""
+    def __init__(self, budgets=None, policy='skip', quarantine=None, poll=POLL_S, clock=time.time):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown quarantine policy '{policy}' (expected one of {', '.join(POLICIES)})")
+        self.budgets = dict(BUDGETS, **(budgets or {}))
+        self.policy = policy
+        self.quarantine = quarantine or Quarantine()
+        self.poll = poll
+        self.clock = clock
+        self.flagged = {}       # key -> reason (this session)
+        self.stats = {'timeouts': 0, 'skipped': 0, 'released': 0}
+        self._skipped = set()
+        self.marker = os.path.join(self.quarantine.dir, f"inflight-{os.getpid()}-{id(self)}.json")
+        self._call = None       # (key, name, path, version, stage, started)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _ident(df, rel_path):
+        return (exportplan.datafile_key(df), df.name, _rel_name(rel_path, df.name), exportplan.datafile_version(df))
+
+    def blocked(self, df):
+        """True when df is quarantined and the policy says to leave it out (no stats;
+        used to keep look-ahead from opening it)."""
+        return self.policy == 'skip' and self.quarantine.blocks(exportplan.datafile_key(df), exportplan.datafile_version(df))
+
+    def skip(self, df):
+        """Like blocked(), counting the file as skipped."""
+        if not self.blocked(df):
+            return False
+        self._skipped.add(exportplan.datafile_key(df))      # watch mode sees the same file every poll
+        self.stats['skipped'] = len(self._skipped)
+        return True
+
+    def order(self, files):
+        """Policy 'last': quarantined files after the others (stable otherwise)."""
+        if self.policy != 'last':
+            return list(files)
+        q = [self.quarantine.blocks(exportplan.datafile_key(df), exportplan.datafile_version(df)) for df in files]
+        return [df for df, b in zip(files, q) if not b] + [df for df, b in zip(files, q) if b]
+
+    def watch(self, df, rel_path, stage):
+        return _Watch(self, self._ident(df, rel_path), stage)
+
+    def stage(self, df, rel_path, stage):
+        """Start timing the next stage of df (ends the previous one)."""
+        self._begin(self._ident(df, rel_path), stage)
+
+    def _begin(self, ident, stage):
+        if self._call is not None:
+            self._end()
+        key, name, path, version = ident
+        started = self.clock()
+        with self._lock:
+            self._call = (key, name, path, version, stage, started)
+        try:
+            os.makedirs(self.quarantine.dir, exist_ok=True)
+            with open(self.marker, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'name': name, 'path': path, 'version': version, 'stage': stage,
+                           'started': started, 'pid': os.getpid()}, f)
+        except:
+            pass
+
+    def _end(self):
+        with self._lock:
+            call, self._call = self._call, None
+        try:
+            os.remove(self.marker)
+        except OSError:
+            pass
+        if call:
+            # Calls that returned late but before the monitor noticed still count
+            self._expire(call, self.clock() - call[5])
+
+    def _budget(self, stage):
+        return self.budgets.get(stage.split(':')[0], BUDGETS.get(stage.split(':')[0], 300.0))
+
+    def _expire(self, call, elapsed):
+        key, name, path, version, stage, _started = call
+        if key in self.flagged or elapsed <= self._budget(stage):
+            return
+        reason = f"{stage} took longer than {self._budget(stage):g} s"
+        self.flagged[key] = reason
+        self.stats['timeouts'] += 1
+        self.quarantine.add(key, name, path, version, stage, reason, elapsed)
+
+    def _monitor(self):
+        while not self._stop.wait(self.poll):
+            with self._lock:
+                call = self._call
+            if call is None:
+                continue
+            try:
+                os.utime(self.marker)   # heartbeat: this session is alive
+            except OSError:
+                pass
+            self._expire(call, self.clock() - call[5])
+
+    def check(self, df):
+        self._end()
+        reason = self.flagged.get(exportplan.datafile_key(df))
+        if reason:
+            raise StageTimeout(f"abandoned and quarantined: {reason}")
+
+    def finish(self, df, ok):
+        """A document is done; a clean pass releases an earlier quarantine entry."""
+        self._end()
+        key = exportplan.datafile_key(df)
+        if ok and key not in self.flagged and key in self.quarantine.entries:
+            if self.quarantine.release(key):
+                self.stats['released'] += 1
+
+    def close(self):
+        self._stop.set()
+        self._end()
+
+
+class _Watch:
+    def __init__(self, wd, ident, stage):
+        self.wd, self.ident, self.stage = wd, ident, stage
+
+    def __enter__(self):
+        self.wd._begin(self.ident, self.stage)
+        return self
+
+    def __exit__(self, *exc):
+        self.wd._end()
+        return False
+
+
+def format_list(q):
+    if not q.entries:
+        return 'Quarantine is empty.'
+    lines = [f"{'file':44} {'stage':10} {'seconds':>8} {'count':>5}  reason"]
+    for k, e in sorted(q.entries.items(), key=lambda kv: kv[1].get('last', '')):
+        lines.append(f"{e.get('path', k)[-44:]:44} {e.get('stage', ''):10} {e.get('seconds', 0):8.0f} {e.get('count', 1):5}  {e.get('reason', '')}")
+    return '\n'.join(lines)
+
+
+# Simulation: fake documents that stall in open or export
+
+class _FakeDoc:
+    def __init__(self, name, open_s=0.01, export_s=0.01, version=1):
+        self.name = name
+        self.id = 'urn:fake:' + name
+        self.versionNumber = version
+        self.open_s = open_s
+        self.export_s = export_s
+
+
+def _fake_folder(wd, docs, fmts=('3mf', 'stl')):
+    """traverse_and_export's document loop in miniature: returns (events, seconds)."""
+    events = []
+    t0 = time.time()
+    for df in wd.order(docs):
+        if wd.skip(df):
+            events.append((df.name, 'skipped'))
+            continue
+        ok = True
+        try:
+            with wd.watch(df, 'sim', 'open'):
+                time.sleep(df.open_s)
+            wd.check(df)
+            for fmt in fmts:
+                with wd.watch(df, 'sim', 'export:' + fmt):
+                    time.sleep(df.export_s)
+                wd.check(df)
+            events.append((df.name, 'exported'))
+        except StageTimeout as ex:
+            ok = False
+            events.append((df.name, str(ex)))
+        finally:
+            with wd.watch(df, 'sim', 'close'):
+                pass
+            wd.finish(df, ok)
+    return events, time.time() - t0
+
+
+def simulate():
+    import tempfile, shutil
+    tmp = tempfile.mkdtemp(prefix='quarantine_')
+    budgets = {'open': 0.3, 'export': 0.3, 'close': 0.3}
+    docs = [_FakeDoc('a'), _FakeDoc('huge', export_s=0.8), _FakeDoc('b'), _FakeDoc('corrupt', open_s=1.0), _FakeDoc('c')]
+    ok = True
+    try:
+        def run(title, policy, ds):
+            wd = Watchdog(budgets, policy, Quarantine(tmp), poll=0.05)
+            events, secs = _fake_folder(wd, ds)
+            wd.close()
+            print(f"{title} ({policy}, {secs:.2f}s): " + ', '.join(f"{n}={e.split(':')[0]}" for n, e in events))
+            return events
+        ev = run('run 1', 'skip', docs)
+        ok &= dict(ev)['huge'].startswith('abandoned') and dict(ev)['corrupt'].startswith('abandoned')
+        ev = run('run 2', 'skip', docs)
+        ok &= dict(ev)['huge'] == 'skipped' and dict(ev)['c'] == 'exported'
+        ev = run('run 3', 'last', docs)
+        ok &= [n for n, _e in ev][-2:] == ['huge', 'corrupt']
+        fixed = [_FakeDoc(d.name, version=2) if d.name == 'huge' else d for d in docs]
+        ev = run('run 4, new version of huge', 'skip', fixed)
+        ok &= dict(ev)['huge'] == 'exported' and dict(ev)['corrupt'] == 'skipped'
+        # A session that dies inside a call leaves its marker behind
+        wd = Watchdog(budgets, 'skip', Quarantine(tmp), poll=3600)
+        wd._begin(Watchdog._ident(_FakeDoc('killer'), 'sim'), 'open')
+        wd._stop.set()
+        os.utime(wd.marker, (time.time() - 2 * STALE_S,) * 2)
+        q = Quarantine(tmp)
+        print(f"after a killed session: recovered {q.recovered}")
+        ok &= q.recovered == ['urn:fake:killer']
+        print(format_list(q))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print('OK' if ok else 'FAILED')
+    return ok
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Quarantine list of documents that stalled an export')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('list', help='show quarantined files')
+    r = sub.add_parser('release', help='give files another chance')
+    r.add_argument('files', nargs='*', help='key, name or folder path/name')
+    r.add_argument('--all', action='store_true')
+    sub.add_parser('simulate', help='fake stalling documents: timeouts, skip, retry last, killed session')
+    args = ap.parse_args()
+    if args.cmd == 'simulate':
+        sys.exit(0 if simulate() else 1)
+    q = Quarantine()
+    if args.cmd == 'list':
+        print(format_list(q))
+    else:
+        keys = list(q.entries) if args.all else [k for f in args.files for k in q.find(f)]
+        for k in keys:
+            q.release(k)
+        print(f"released {len(keys)} file(s)")
+    sys.exit(0)
@@ -0,0 +1,205 @@
+# ==== 3MF repacker ====
+# Combines the per-design 3MF files of a folder into one package:
+# - one object per part (source file), built from components
+# - identical body meshes across parts stored once as shared mesh resources
+# - recompressed at a configurable deflate level; per-file thumbnails/metadata dropped
+#
+#   python repack3mf.py ../Generation2 -o Generation2.3mf --level 9
+#
+# Prints size and write/read time against the per-file originals. Needs numpy.
+
+import os, io, sys, time, hashlib, zipfile, argparse
+
+import numpy as np
+
+import meshfiles
+
+GAP_MM = 10.0  # spacing between parts when arranged on the plate
+
+
+def _mesh_key(v, f):
+    """Content hash of a mesh; coordinates rounded to 1e-6 mm so float noise doesn't split duplicates."""
+    h = hashlib.sha1()
+    h.update(np.round(v, 6).astype('<f8').tobytes())
+    h.update(f.astype('<i8').tobytes())
+    return h.hexdigest()
+
+
+def _fmt_transform(m):
+    """4x3 (row-vector) matrix -> 3MF transform attribute."""
+    return ' '.join('%.6g' % x for x in m.reshape(-1))
+
+
+def _compose(inner, outer):
+    if inner is None:
+        return outer
+    if outer is None:
+        return inner
+    return np.vstack((inner[:3] @ outer[:3], inner[3] @ outer[:3] + outer[3]))
+
+
+def collect_parts(folder, recursive=False):
+    """Read every 3MF in folder. Returns (parts, meshes, stats):
+    parts: [(name, source path, [(mesh key, transform)])]
+    meshes: {mesh key: (vertices, faces, body name)}
+    """
+    paths = []
+    if recursive:
+        for dirpath, _dirs, files in os.walk(folder):
+            paths += [os.path.join(dirpath, f) for f in files if f.lower().endswith('.3mf') and not meshfiles.is_lod_file(f)]
+    else:
+        paths = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith('.3mf') and not meshfiles.is_lod_file(f)]
+    paths.sort()
+    parts, meshes = [], {}
+    bodies = 0
+    for p in paths:
+        build = []
+        objs = {o['id']: o for o in meshfiles.iter_3mf_objects(p, build)}
+        placed = []
+
+        def emit(oid, m, depth=0):
+            o = objs.get(oid)
+            if o is None or depth > 16:
+                return
+            if len(o['faces']):
+                k = _mesh_key(o['vertices'], o['faces'])
+                meshes.setdefault(k, (o['vertices'], o['faces'], o['name']))
+                placed.append((k, m))
+            for cid, cm in o['components']:
+                emit(cid, _compose(cm, m), depth + 1)
+
+        for oid, m in (build or [(oid, None) for oid in objs]):
+            emit(oid, m)
+        bodies += len(placed)
+        if placed:
+            parts.append((os.path.splitext(os.path.basename(p))[0], p, placed))
+    return parts, meshes, {'files': len(paths), 'bodies': bodies, 'uniqueMeshes': len(meshes)}
+
+
+def _arrange(parts, meshes):
+    """Translation per part laying them out left to right in rows on the XY plane."""
+    boxes = []
+    for _name, _src, placed in parts:
+        pts = []
+        for k, m in placed:
+            v = meshes[k][0]
+            pts.append(v if m is None else v @ m[:3] + m[3])
+        allv = np.concatenate(pts)
+        boxes.append((allv.min(0), allv.max(0)))
+    row_w = max(250.0, max((b[1][0] - b[0][0] for b in boxes), default=0))
+    x = y = row_h = 0.0
+    offsets = []
+    for lo, hi in boxes:
+        w, d = hi[0] - lo[0], hi[1] - lo[1]
+        if x > 0 and x + w > row_w:
+            x, y, row_h = 0.0, y + row_h + GAP_MM, 0.0
+        offsets.append(np.array([x - lo[0], y - lo[1], -lo[2]]))
+        x += w + GAP_MM
+        row_h = max(row_h, d)
+    return offsets
+
+
+def _write_mesh_object(out, oid, name, v, f):
+    out.write(f'<object id="{oid}" type="model" name="{meshfiles._xml_attr(name)}"><mesh><vertices>\n'.encode())
+    np.savetxt(out, v, fmt='<vertex x="%.6f" y="%.6f" z="%.6f"/>')
+    out.write(b'</vertices><triangles>\n')
+    np.savetxt(out, f, fmt='<triangle v1="%d" v2="%d" v3="%d"/>')
+    out.write(b'</triangles></mesh></object>\n')
+
+
+def write_package(path, parts, meshes, level=9, arrange=True):
+    """Write the combined package, streaming the model XML into the zip entry."""
+    ids = {}
+    offsets = _arrange(parts, meshes) if arrange else [None] * len(parts)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as z:
+        z.writestr('[Content_Types].xml', meshfiles._3MF_CONTENT_TYPES)
+        z.writestr('_rels/.rels', meshfiles._3MF_RELS)
+        with z.open('3D/3dmodel.model', 'w') as raw:
+            out = io.BufferedWriter(raw, 1 << 20)
+            out.write(('<?xml version="1.0" encoding="UTF-8"?>\n'
+                       f'<model unit="millimeter" xml:lang="en-US" xmlns="{meshfiles._3MF_NS}">\n'
+                       '<resources>\n').encode())
+            for i, (k, (v, f, body)) in enumerate(meshes.items()):
+                ids[k] = i + 1
+                _write_mesh_object(out, i + 1, body, v, f)
+            next_id = len(meshes) + 1
+            items = []
+            for (name, _src, placed), off in zip(parts, offsets):
+                out.write(f'<object id="{next_id}" type="model" name="{meshfiles._xml_attr(name)}"><components>'.encode())
+                for k, m in placed:
+                    tr = f' transform="{_fmt_transform(m)}"' if m is not None else ''
+                    out.write(f'<component objectid="{ids[k]}"{tr}/>'.encode())
+                out.write(b'</components></object>\n')
+                items.append((next_id, off))
+                next_id += 1
+            out.write(b'</resources>\n<build>\n')
+            for oid, off in items:
+                tr = '' if off is None else f' transform="1 0 0 0 1 0 0 0 1 {off[0]:.6f} {off[1]:.6f} {off[2]:.6f}"'
+                out.write(f'<item objectid="{oid}"{tr}/>\n'.encode())
+            out.write(b'</build>\n</model>\n')
+            out.flush()
+            out.detach()
+
+
+def repack(folder, out_path, level=9, arrange=True, recursive=False):
+    t0 = time.perf_counter()
+    parts, meshes, st = collect_parts(folder, recursive)
+    t_collect = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    write_package(out_path, parts, meshes, level, arrange)
+    t_write = time.perf_counter() - t0
+
+    orig = sum(os.path.getsize(p) for _n, p, _pl in parts)
+    # Thumbnails and other non-model parts, to tell apart what dedup/recompression saved
+    meta = 0
+    for _n, p, _pl in parts:
+        with zipfile.ZipFile(p) as z:
+            meta += sum(i.compress_size for i in z.infolist() if not i.filename.lower().endswith('.model'))
+    t0 = time.perf_counter()
+    for _n, p, _pl in parts:
+        meshfiles.read_3mf(p)
+    t_read_orig = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    packed = meshfiles.read_3mf(out_path)
+    t_read_new = time.perf_counter() - t0
+
+    st.update({
+        'parts': len(parts),
+        'originalBytes': orig,
+        'originalMetaBytes': meta,
+        'packedBytes': os.path.getsize(out_path),
+        'tCollect': t_collect,
+        'tWrite': t_write,
+        'tReadOriginals': t_read_orig,
+        'tReadPacked': t_read_new,
+        'packedTriangles': int(len(packed.faces)),
+    })
+    return st
+
+
+def format_report(st):
+    return '\n'.join([
+        f"{st['files']} files, {st['parts']} parts, {st['bodies']} bodies -> {st['uniqueMeshes']} unique meshes",
+        f"size:  originals {st['originalBytes'] / 1024:.0f} KB  ->  packed {st['packedBytes'] / 1024:.0f} KB "
+        f"({100.0 * st['packedBytes'] / max(1, st['originalBytes']):.0f}%)",
+        f"       of the originals, {st['originalMetaBytes'] / 1024:.0f} KB are thumbnails/metadata not carried over; "
+        f"model data {(st['originalBytes'] - st['originalMetaBytes']) / 1024:.0f} KB -> {st['packedBytes'] / 1024:.0f} KB",
+        f"write: {st['tWrite']:.3f}s (after {st['tCollect']:.3f}s reading the originals)",
+        f"read:  originals {st['tReadOriginals']:.3f}s  vs  packed {st['tReadPacked']:.3f}s "
+        f"({st['packedTriangles']} triangles)",
+    ])
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Combine the 3MF files of a folder into one package')
+    ap.add_argument('folder')
+    ap.add_argument('-o', '--output', help='output .3mf (default: <folder name>.3mf next to the folder)')
+    ap.add_argument('--level', type=int, default=9, choices=range(0, 10), help='deflate level 0-9')
+    ap.add_argument('--no-arrange', action='store_true', help='keep original positions instead of laying parts out')
+    ap.add_argument('-r', '--recursive', action='store_true')
+    args = ap.parse_args()
+    out = args.output or os.path.normpath(args.folder.rstrip('/\\')) + '.3mf'
+    st = repack(args.folder, out, args.level, not args.no_arrange, args.recursive)
+    print(out)
+    print(format_report(st))
+    sys.exit(0)
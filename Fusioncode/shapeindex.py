@@ -0,0 +1,403 @@
+# ==== Shape-similarity index ====
+# "Which existing part looks like this one?" for export trees full of near-identical
+# holders, clips and lids. Every design gets a small descriptor:
+#   d2        histogram of distances between random surface point pairs (D2, Osada
+#             et al.), distances divided by their mean so the shape counts, not the size
+#   box       bounding box in the principal axes frame: middle/longest, shortest/longest
+#   moments   spread of the surface along the principal axes: sqrt(l2/l1), sqrt(l3/l1)
+#   size      log10 of the longest principal extent (mm), so a 20 mm and a 200 mm clip differ
+# All of it is rotation invariant and cheap (a few thousand samples per part). The
+# descriptors of a tree live in shape_index.npz (float32 rows, one per design); a query
+# is one vectorized weighted L1 distance over all rows plus argpartition for the top k.
+#
+#   python shapeindex.py build D:/FusionBackup                 # only new/changed meshes are read
+#   python shapeindex.py query D:/FusionBackup some_part.stl -k 10
+#   python shapeindex.py bench --parts 400 --rows 20000        # synthetic families
+#
+# During export the 'shape' post-processing step computes descriptors next to the
+# other steps and the index is updated when post-processing finishes.
+# Needs numpy (the module imports without it so pure-Python callers can use it).
+
+import os, sys, time, argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import meshfiles
+from postprocess import sha256_file
+
+INDEX_NAME = 'shape_index.npz'
+VERSION = 1                 # bump when the descriptor changes; old rows are recomputed
+SEED = 1234                 # fixed sampling, so the same mesh always gets the same descriptor
+N_SAMPLES = 2048            # surface points per part
+N_PAIRS = 8192              # point pairs for the D2 histogram
+D2_BINS = 32
+D2_MAX = 3.0                # histogram range in units of the mean pair distance
+LAYOUT = {'d2': slice(0, D2_BINS), 'box': slice(D2_BINS, D2_BINS + 2),
+          'moments': slice(D2_BINS + 2, D2_BINS + 4), 'size': slice(D2_BINS + 4, D2_BINS + 5)}
+DIM = D2_BINS + 5
+WEIGHTS = {'d2': 1.0, 'box': 0.5, 'moments': 0.5, 'size': 0.3}
+TOP_K = 10
+
+
+def _weights(weights=None):
+    w = dict(WEIGHTS, **(weights or {}))
+    vec = np.zeros(DIM, np.float32)
+    for name, sl in LAYOUT.items():
+        vec[sl] = w[name]
+    return vec
+
+
+def sample_surface(vertices, faces, n=N_SAMPLES, rng=None):
+    """n points spread uniformly over the surface (area-weighted triangles, uniform
+    barycentric coordinates)."""
+    rng = rng if rng is not None else np.random.default_rng(SEED)
+    tri = np.asarray(vertices, np.float64)[np.asarray(faces)]
+    area = 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+    total = area.sum()
+    if not total > 0:
+        raise ValueError('mesh has no surface area')
+    cum = np.cumsum(area) / total
+    pick = np.minimum(np.searchsorted(cum, rng.random(n)), len(tri) - 1)
+    r1 = np.sqrt(rng.random(n))[:, None]
+    r2 = rng.random(n)[:, None]
+    t = tri[pick]
+    return (1 - r1) * t[:, 0] + r1 * (1 - r2) * t[:, 1] + r1 * r2 * t[:, 2]
+
+
+def describe(vertices, faces):
+    """Descriptor of one mesh: float32 vector of length DIM (see LAYOUT)."""
+    meshfiles._need_numpy()
+    rng = np.random.default_rng(SEED)
+    pts = sample_surface(vertices, faces, N_SAMPLES, rng)
+    d = np.zeros(DIM, np.float32)
+
+    i = rng.integers(0, len(pts), N_PAIRS)
+    j = rng.integers(0, len(pts), N_PAIRS)
+    dist = np.linalg.norm(pts[i] - pts[j], axis=1)
+    mean = dist.mean()
+    if mean > 0:
+        hist, _ = np.histogram(dist / mean, D2_BINS, (0.0, D2_MAX))
+        d[LAYOUT['d2']] = hist / max(1, hist.sum())
+
+    centre = pts.mean(axis=0)
+    evals, evecs = np.linalg.eigh(np.cov((pts - centre).T))
+    evals, evecs = np.maximum(evals[::-1], 0.0), evecs[:, ::-1]      # longest axis first
+    proj = (np.asarray(vertices, np.float64) - centre) @ evecs
+    ext = proj.max(axis=0) - proj.min(axis=0)
+    if ext[0] > 0:
+        d[LAYOUT['box']] = ext[1] / ext[0], ext[2] / ext[0]
+        d[LAYOUT['size']] = np.log10(ext[0])
+    if evals[0] > 0:
+        d[LAYOUT['moments']] = np.sqrt(evals[1] / evals[0]), np.sqrt(evals[2] / evals[0])
+    return d
+
+
+def describe_file(path):
+    m = meshfiles.read_mesh(path)
+    return describe(m.vertices, m.faces)
+
+
+def design_key(rel):
+    """Index key of an output file: relative path without extension, so the STL and
+    3MF of one design share a row."""
+    return os.path.splitext(rel.replace('\\', '/'))[0]
+
+
+class ShapeIndex:
+    """Descriptors of one export tree, stored in <root>/shape_index.npz.
+      keys:  design key (relative path without extension)
+      paths: mesh file the descriptor came from (relative to root)
+      sha:   sha256 of that file, so build() only reads changed meshes
+      desc:  (N, DIM) float32
+    """
+    def __init__(self, root):
+        meshfiles._need_numpy()
+        self.root = root
+        self.path = os.path.join(root, INDEX_NAME)
+        self.rows = {}          # key -> (path, sha, desc)
+        self._matrix = None
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                if int(z['version']) == VERSION:
+                    for k, p, s, d in zip(z['keys'], z['paths'], z['sha'], z['desc']):
+                        self.rows[str(k)] = (str(p), str(s), d)
+        except Exception:
+            pass
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set(self, rel, sha, desc):
+        self.rows[design_key(rel)] = (rel.replace('\\', '/'), sha or '', np.asarray(desc, np.float32))
+        self._matrix = None
+
+    def remove(self, key):
+        if self.rows.pop(key, None) is not None:
+            self._matrix = None
+
+    def matrix(self):
+        """(keys, paths, (N, DIM) float32) in key order; cached until the next change."""
+        if self._matrix is None:
+            keys = sorted(self.rows)
+            desc = np.stack([self.rows[k][2] for k in keys]) if keys else np.zeros((0, DIM), np.float32)
+            self._matrix = (keys, [self.rows[k][0] for k in keys], desc)
+        return self._matrix
+
+    def save(self):
+        keys, paths, desc = self.matrix()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, version=np.int32(VERSION), keys=np.array(keys, dtype=str),
+                                paths=np.array(paths, dtype=str),
+                                sha=np.array([self.rows[k][1] for k in keys], dtype=str), desc=desc)
+        os.replace(tmp, self.path)
+        return self.path
+
+    def query(self, desc, k=TOP_K, weights=None, exclude=None):
+        """Top k rows closest to desc: [(distance, key, path)], nearest first."""
+        keys, paths, mat = self.matrix()
+        if not keys:
+            return []
+        dist = np.abs(mat - np.asarray(desc, np.float32)) @ _weights(weights)
+        if exclude is not None and exclude in self.rows:
+            dist[keys.index(exclude)] = np.inf
+        k = min(k, len(keys))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top])]
+        return [(float(dist[i]), keys[i], paths[i]) for i in top if np.isfinite(dist[i])]
+
+
+def build(root, prefer='stl', index=None):
+    """Index every design under root; meshes whose sha256 is unchanged keep their row.
+    Returns (index, stats)."""
+    t0 = time.perf_counter()
+    index = index if index is not None else ShapeIndex(root)
+    stats = {'designs': 0, 'computed': 0, 'reused': 0, 'removed': 0, 'failed': 0, 'errors': []}
+    seen = set()
+    for p in meshfiles.find_meshes(root, prefer, recursive=True):
+        rel = os.path.relpath(p, root).replace('\\', '/')
+        key = design_key(rel)
+        seen.add(key)
+        stats['designs'] += 1
+        try:
+            sha = sha256_file(p)
+            old = index.rows.get(key)
+            if old is not None and old[0] == rel and old[1] == sha:
+                stats['reused'] += 1
+                continue
+            index.set(rel, sha, describe_file(p))
+            stats['computed'] += 1
+        except Exception as ex:
+            stats['failed'] += 1
+            stats['errors'].append(f"{rel}: {ex}")
+    for key in [k for k in index.rows if k not in seen]:
+        index.remove(key)
+        stats['removed'] += 1
+    stats['seconds'] = time.perf_counter() - t0
+    return index, stats
+
+
+def add_results(root, results):
+    """Store the descriptors that the 'shape' post-processing step put into results.
+    Returns the number of designs updated (0 without numpy or descriptors)."""
+    rows = [r for r in results if r.get('shape') and not r.get('errors')]
+    if not rows or np is None:
+        return 0
+    index = ShapeIndex(root)
+    for r in rows:
+        # Same preference as build(): a design's STL row isn't replaced by its 3MF/OBJ
+        old = index.rows.get(design_key(r['path']))
+        if old is not None and old[0].lower().endswith('.stl') and not r['path'].lower().endswith('.stl'):
+            continue
+        index.set(r['path'], r.get('sha256'), r['shape'])
+    index.save()
+    return len({design_key(r['path']) for r in rows})
+
+
+def merge_index(src_root, dst_root):
+    """Fold the index of src_root (e.g. a shard output) into dst_root's index.
+    Returns the number of rows taken over."""
+    if np is None or not os.path.exists(os.path.join(src_root, INDEX_NAME)):
+        return 0
+    src, dst = ShapeIndex(src_root), ShapeIndex(dst_root)
+    for path, sha, desc in src.rows.values():
+        dst.set(path, sha, desc)
+    if src.rows:
+        dst.save()
+    return len(src.rows)
+
+
+def format_results(hits, t_describe=None, t_query=None, n=None):
+    lines = [f"{'#':>3} {'distance':>8}  design"]
+    for i, (dist, key, path) in enumerate(hits, 1):
+        lines.append(f"{i:3} {dist:8.4f}  {path}")
+    if t_query is not None:
+        lines.append(f"searched {n} designs in {t_query * 1000:.2f} ms"
+                     + (f" (descriptor of the query mesh {t_describe * 1000:.0f} ms)" if t_describe is not None else ''))
+    return '\n'.join(lines)
+
+
+def format_build(stats):
+    line = (f"{stats['designs']} designs: {stats['computed']} described, {stats['reused']} unchanged, "
+            f"{stats['removed']} removed, {stats['failed']} failed in {stats['seconds']:.1f}s")
+    if stats['errors']:
+        line += '\n' + '\n'.join(stats['errors'][:8])
+    return line
+
+
+# Benchmark: synthetic part families (random proportions, rotation and size)
+
+def _box(sx, sy, sz, offset=(0.0, 0.0, 0.0)):
+    c = np.array([[x, y, z] for x in (0, sx) for y in (0, sy) for z in (0, sz)], np.float64) + offset
+    f = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                  [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]], np.int64)
+    return c, f
+
+
+def _cylinder(r, h, n=32):
+    a = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    ring = np.stack([r * np.cos(a), r * np.sin(a)], axis=1)
+    v = np.vstack([np.c_[ring, np.zeros(n)], np.c_[ring, np.full(n, h)], [[0, 0, 0], [0, 0, h]]])
+    i = np.arange(n)
+    j = (i + 1) % n
+    f = np.vstack([np.c_[i, j, n + j], np.c_[i, n + j, n + i],
+                   np.c_[np.full(n, 2 * n), j, i], np.c_[np.full(n, 2 * n + 1), n + i, n + j]])
+    return v, f
+
+
+def _join(*parts):
+    vs, fs, off = [], [], 0
+    for v, f in parts:
+        vs.append(v)
+        fs.append(f + off)
+        off += len(v)
+    return np.vstack(vs), np.vstack(fs)
+
+
+def _family_mesh(family, rng):
+    j = lambda x: x * rng.uniform(0.9, 1.1)
+    if family == 'plate':
+        v, f = _box(j(60), j(40), j(3))
+    elif family == 'cube':
+        v, f = _box(j(20), j(20), j(20))
+    elif family == 'bracket':
+        v, f = _join(_box(j(40), j(20), j(4)), _box(j(4), j(20), j(30)))
+    elif family == 'pin':
+        v, f = _cylinder(j(3), j(40))
+    elif family == 'puck':
+        v, f = _cylinder(j(20), j(6))
+    else:   # 'clip': U profile
+        w, t = j(20), j(3)
+        v, f = _join(_box(w, j(10), t), _box(t, j(10), j(15)), _box(t, j(10), j(15), (w - t, 0, 0)))
+    q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    return (v * rng.uniform(0.7, 1.4)) @ q.T, f
+
+
+FAMILIES = ('plate', 'cube', 'bracket', 'pin', 'puck', 'clip')
+
+
+def bench(parts=300, rows=20000, k=5, seed=7):
+    """Describe synthetic parts of a few families, check that nearest neighbours come
+    from the same family and time queries against an index padded to `rows` rows."""
+    import tempfile
+    rng = np.random.default_rng(seed)
+    root = tempfile.mkdtemp(prefix='shapeindex_')
+    index = ShapeIndex(root)
+    fam_of = {}
+    meshes = []
+    t0 = time.perf_counter()
+    for n in range(parts):
+        fam = FAMILIES[n % len(FAMILIES)]
+        v, f = _family_mesh(fam, rng)
+        meshes.append((v, f))
+        key = f"{fam}/{fam}{n:04d}"
+        fam_of[key] = fam
+        index.set(key + '.stl', '', describe(v, f))
+    t_desc = (time.perf_counter() - t0) / parts
+
+    hits = total = 0
+    for key in list(fam_of)[:120]:
+        for _d, other, _p in index.query(index.rows[key][2], k, exclude=key):
+            hits += fam_of[other] == fam_of[key]
+            total += 1
+    precision = hits / max(1, total)
+
+    # Pad with jittered copies to time a large index
+    _keys, _paths, base = index.matrix()
+    for n in range(max(0, rows - parts)):
+        d = base[n % parts] * rng.uniform(0.97, 1.03, DIM).astype(np.float32)
+        index.set(f"pad/{n:06d}.stl", '', d)
+    index.save()
+    size = os.path.getsize(index.path)
+    t0 = time.perf_counter()
+    loaded = ShapeIndex(root)
+    loaded.matrix()
+    t_load = time.perf_counter() - t0
+    times = []
+    for n in range(50):
+        q = base[n % parts]
+        t0 = time.perf_counter()
+        loaded.query(q, k)
+        times.append(time.perf_counter() - t0)
+    v, f = meshes[0]
+    t0 = time.perf_counter()
+    loaded.query(describe(v, f), k)
+    t_full = time.perf_counter() - t0
+    os.remove(index.path)
+    os.rmdir(root)
+    print(f"{parts} synthetic parts in {len(FAMILIES)} families: {t_desc * 1000:.1f} ms per descriptor, "
+          f"top-{k} same-family precision {precision:.1%}")
+    print(f"index of {len(loaded)} rows: {size / 1024:.0f} KiB on disk, loaded in {t_load * 1000:.1f} ms")
+    print(f"query: median {sorted(times)[len(times) // 2] * 1000:.2f} ms, "
+          f"{t_full * 1000:.1f} ms including the query mesh's descriptor")
+    return precision
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Shape-similarity index of an export tree')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help=f"describe new or changed meshes and write {INDEX_NAME}")
+    b.add_argument('root')
+    b.add_argument('--prefer', choices=('stl', '3mf'), default='stl')
+    q = sub.add_parser('query', help='designs most similar to a mesh file')
+    q.add_argument('root')
+    q.add_argument('mesh')
+    q.add_argument('-k', type=int, default=TOP_K)
+    q.add_argument('--weights', default='', help="e.g. 'size=0' to ignore scale")
+    s = sub.add_parser('bench', help='retrieval precision and query time on synthetic parts')
+    s.add_argument('--parts', type=int, default=300)
+    s.add_argument('--rows', type=int, default=20000)
+    args = ap.parse_args()
+    if args.cmd == 'build':
+        index, stats = build(args.root, args.prefer)
+        print(format_build(stats))
+        if stats['computed'] or stats['removed'] or not os.path.exists(index.path):
+            print(index.save())
+        sys.exit(1 if stats['failed'] else 0)
+    elif args.cmd == 'query':
+        index = ShapeIndex(args.root)
+        if not len(index):
+            print(f"No {INDEX_NAME} in {args.root}; run 'python shapeindex.py build {args.root}' first")
+            sys.exit(1)
+        weights = {}
+        for part in filter(None, (p.strip() for p in args.weights.split(','))):
+            name, _, val = part.partition('=')
+            if name not in WEIGHTS:
+                ap.error(f"unknown weight '{name}' (expected one of {', '.join(WEIGHTS)})")
+            weights[name] = float(val)
+        index.matrix()
+        t0 = time.perf_counter()
+        desc = describe_file(args.mesh)
+        t1 = time.perf_counter()
+        mesh = os.path.abspath(args.mesh)
+        root = os.path.abspath(args.root)
+        own = design_key(os.path.relpath(mesh, root)) if mesh.startswith(root + os.sep) else None
+        hits = index.query(desc, args.k, weights, exclude=own)
+        t2 = time.perf_counter()
+        print(format_results(hits, t1 - t0, t2 - t1, len(index)))
+    else:
+        bench(args.parts, args.rows)
+    sys.exit(0)
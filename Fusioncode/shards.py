@@ -0,0 +1,416 @@
+# ==== Sharded export planning (one job over several Fusion sessions) ====
+# A Fusion session opens one document at a time, so a full-hub backup is bounded by
+# one session's throughput. plan_shards() lists every target of a batch job from
+# metadata only, costs each file with the timing history (exportplan.CostModel plus
+# a fixed per-file overhead so file counts count too) and deals the files out to N
+# sessions, most expensive first, always to the least loaded session (LPT).
+# write_shards() then writes one shard job per session; a shard job is the original
+# job restricted to its files ('files' on each target) writing into its own folder,
+# so sessions never touch each other's manifests or logs. merge() moves the exports
+# into the real outputs and rebuilds export_manifest.json, log.txt and
+# job_result.json (and shape_index.npz) as a single session would have written them.
+#
+#   In Fusion: batch job + "Sessions" > 1  ->  <output>/_shards/shards.json, shard_01.json, ...
+#   Run each shard_XX.json as the batch job of its own Fusion session; the session
+#   that finishes last merges, or later:
+#   python shards.py merge D:/FusionBackup/_shards/shards.json
+#   python shards.py simulate --sessions 3      # fake backend, checks merge == single session
+#
+# Pure Python, no adsk imports.
+
+import os, sys, json, time, heapq, shutil, random, hashlib, argparse
+
+import exportplan
+import jobspec
+import postprocess
+import shapeindex
+
+SHARD_DIR = '_shards'
+PLAN_NAME = 'shards.json'
+LOCK_NAME = 'merge.lock'
+FILE_OVERHEAD_S = 0.5      # listing, filtering and bookkeeping per file, exported or not
+
+
+def plan_shards(job, resolve, sessions, history=None):
+    """Split a normalized job over `sessions` sessions.
+    resolve(target) -> (DataFolder, error) as in FolderToGit._JobFolders.
+    Returns the plan dict that write_shards() stores as shards.json."""
+    model = exportplan.CostModel(history)
+    targets = []
+    units = []   # (seconds, target index, position)
+    for _hub, group in jobspec.group_by_hub(job['targets']):
+        for t in group:
+            folder, error = resolve(t)
+            entry = {'index': t['index'], 'name': t['name'], 'output': t['output'],
+                     'shardOutput': f"t{t['index'] + 1:02d}", 'error': error, 'files': []}
+            targets.append(entry)
+            if error:
+                continue
+            entries = exportplan.enumerate_folder(folder, '', jobspec.file_filter_for(t))
+            plan = exportplan.build_plan(folder, t['formats'], model, t['include_other'], t['other_exts'], entries=entries)
+            costs = {(e['rel'], e['name']): e['seconds'] for e in plan['entries']}
+            # Every file goes to some shard, also the ones the run will only count as skipped
+            for e in entries:
+                secs = costs.get((e['rel'], e['name']), 0.0) + FILE_OVERHEAD_S
+                units.append((secs, t['index'], len(entry['files'])))
+                entry['files'].append([jobspec.rel_key(e['rel'], e['name']), 0, round(secs, 2), e['kind'] == 'design'])
+    targets.sort(key=lambda e: e['index'])
+    by_index = {e['index']: e for e in targets}
+    n = max(1, min(int(sessions), len(units)))
+    loads = [(0.0, 0, k) for k in range(n)]   # (seconds, files, shard)
+    shards = [{'index': k + 1, 'seconds': 0.0, 'files': 0, 'designs': 0} for k in range(n)]
+    for secs, ti, pos in sorted(units, key=lambda u: (-u[0], u[1], u[2])):
+        load, count, k = heapq.heappop(loads)
+        f = by_index[ti]['files'][pos]
+        f[1] = k + 1
+        sh = shards[k]
+        sh['seconds'] += secs
+        sh['files'] += 1
+        sh['designs'] += int(f[3])
+        heapq.heappush(loads, (load + secs, count + 1, k))
+    for e in targets:
+        e['files'] = [f[:3] for f in e['files']]
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'output': job['output'],
+        'sessions': n,
+        'shards': shards,
+        'targets': targets,
+        'merged': None,
+    }
+
+
+def _shard_job(job, plan, k):
+    targets = []
+    for t, pt in zip(job['targets'], plan['targets']):
+        files = [f[0] for f in pt['files'] if f[1] == k]
+        if not files:
+            continue
+        tgt = {o: t[o] for o in jobspec.OPTION_DEFAULTS}
+        tgt.update({'hub': t['hub'], 'project': t['project'], 'folder': t['folder'], 'name': t['name'],
+                    'output': pt['shardOutput'], 'files': files})
+        targets.append(tgt)
+    return {'output': f"shard_{k:02d}", 'shard': {'plan': PLAN_NAME, 'index': k}, 'targets': targets}
+
+
+def write_shards(job, plan, plan_dir=None):
+    """Write shards.json and one shard_XX.json job per session. Returns the job paths."""
+    plan_dir = plan_dir or os.path.join(job['output'], SHARD_DIR)
+    os.makedirs(plan_dir, exist_ok=True)
+    paths = []
+    for sh in plan['shards']:
+        path = os.path.join(plan_dir, f"shard_{sh['index']:02d}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(_shard_job(job, plan, sh['index']), f, indent=1)
+        sh['job'] = os.path.basename(path)
+        paths.append(path)
+    _save_plan(os.path.join(plan_dir, PLAN_NAME), plan)
+    return paths
+
+
+def _save_plan(path, plan):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_plan(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _result_path(plan_dir, k):
+    return os.path.join(plan_dir, f"shard_{k:02d}", jobspec.RESULT_NAME)
+
+
+def missing_shards(plan_path):
+    """Shard numbers whose session hasn't written its job_result.json yet."""
+    plan_dir = os.path.dirname(os.path.abspath(plan_path))
+    return [sh['index'] for sh in load_plan(plan_path)['shards'] if not os.path.exists(_result_path(plan_dir, sh['index']))]
+
+
+def _move_tree(src, dst, overwrite):
+    """Move exports from a shard folder into the real output (folders included, so
+    empty Fusion folders still show up). Manifest, log and shape index are merged separately."""
+    for dirpath, _dirs, files in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        out = os.path.join(dst, rel) if rel != '.' else dst
+        os.makedirs(out, exist_ok=True)
+        for fn in files:
+            if rel == '.' and fn in (postprocess.MANIFEST_NAME, jobspec.LOG_NAME, shapeindex.INDEX_NAME):
+                continue
+            target = os.path.join(out, fn)
+            if overwrite or not os.path.exists(target):
+                os.replace(os.path.join(dirpath, fn), target)
+    shutil.rmtree(src, ignore_errors=True)
+
+
+def merge(plan_path, keep_shards=False):
+    """Combine the finished shards into the outputs of the original job.
+    Returns the path of the merged job_result.json."""
+    plan_dir = os.path.dirname(os.path.abspath(plan_path))
+    plan = load_plan(plan_path)
+    shard_results = {}
+    for sh in plan['shards']:
+        with open(_result_path(plan_dir, sh['index']), 'r', encoding='utf-8') as f:
+            shard_results[sh['index']] = json.load(f)
+    jobs = {}
+    for sh in plan['shards']:
+        jobs[sh['index']] = jobspec.load_job(os.path.join(plan_dir, sh['job']))
+    results = []
+    hub_switches = 0
+    for r in shard_results.values():
+        hub_switches += r.get('hubSwitches', 0) or 0
+    for pt in plan['targets']:
+        res = {'index': pt['index'], 'name': pt['name'], 'output': pt['output'], 'stats': None,
+               'errors': [], 'manifest': [], 'post': None, 'seconds': 0.0, 'error': pt['error']}
+        results.append(res)
+        if pt['error']:
+            continue
+        order = {f[0]: i for i, f in enumerate(pt['files'])}
+        stats = {}
+        entries = []
+        posts = []
+        include_other, overwrite, any_manifest = False, True, False
+        for k in sorted({f[1] for f in pt['files']}):
+            sub = os.path.join(plan_dir, f"shard_{k:02d}", pt['shardOutput'])
+            tgt = next((t for t in jobs[k]['targets'] if os.path.normpath(t['output']) == os.path.normpath(sub)), None)
+            r = next((x for x in shard_results[k]['targets'] if x.get('output') and os.path.normpath(x['output']) == os.path.normpath(sub)), None)
+            if tgt is None or r is None:
+                res['error'] = res['error'] or f"Shard {k} has no result for this target"
+                continue
+            include_other, overwrite = tgt['include_other'], tgt['overwrite']
+            if r.get('error'):
+                res['error'] = res['error'] or f"Shard {k}: {r['error']}"
+            for key, v in (r.get('stats') or {}).items():
+                stats[key] = stats.get(key, 0) + v
+            res['errors'].extend(r.get('errors') or [])
+            res['manifest'].extend(r.get('manifest') or [])
+            res['seconds'] += r.get('seconds') or 0.0
+            if r.get('post'):
+                posts.append(f"shard {k}: {r['post']}")
+            try:
+                with open(os.path.join(sub, postprocess.MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                    entries.extend(json.load(f).get('files', []))
+                any_manifest = True
+            except Exception:
+                pass
+            if os.path.isdir(sub):
+                shapeindex.merge_index(sub, pt['output'])
+                _move_tree(sub, pt['output'], overwrite)
+        # Same order as one session would have visited the files
+        res['manifest'].sort(key=lambda rel: order.get(rel.replace('\\', '/'), len(order)))
+        res['stats'] = stats or None
+        res['post'] = '\n'.join(posts) or None
+        os.makedirs(pt['output'], exist_ok=True)
+        if any_manifest:
+            postprocess.write_manifest(pt['output'], entries)
+        jobspec.write_export_log(pt['output'], res['manifest'] if include_other else None, stats)
+    out = os.path.join(plan['output'], jobspec.RESULT_NAME)
+    os.makedirs(plan['output'], exist_ok=True)
+    jobspec.write_result(out, {'output': plan['output']}, results, hub_switches, {'shards': plan['shards']})
+    plan['merged'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    _save_plan(plan_path, plan)
+    if not keep_shards:
+        for sh in plan['shards']:
+            shutil.rmtree(os.path.join(plan_dir, f"shard_{sh['index']:02d}"), ignore_errors=True)
+    return out
+
+
+def merge_if_complete(plan_path):
+    """Merge when every shard has finished and nobody merged yet.
+    Returns (merged job_result path or None, [missing shard numbers])."""
+    missing = missing_shards(plan_path)
+    if missing or load_plan(plan_path).get('merged'):
+        return None, missing
+    lock = os.path.join(os.path.dirname(os.path.abspath(plan_path)), LOCK_NAME)
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None, missing   # another session is merging
+    try:
+        os.close(fd)
+        return merge(plan_path), missing
+    finally:
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
+
+
+def format_plan(plan):
+    lines = [f"{plan['sessions']} shard jobs:"]
+    for sh in plan['shards']:
+        lines.append(f"  shard {sh['index']:2}: {sh['files']:5} files, {sh['designs']:5} designs, "
+                     f"~{exportplan.format_eta(sh['seconds'])}")
+    secs = [sh['seconds'] for sh in plan['shards']]
+    total = sum(secs)
+    if total:
+        lines.append(f"Longest session ~{exportplan.format_eta(max(secs))} instead of ~{exportplan.format_eta(total)} "
+                     f"in one session (imbalance {max(secs) / (total / len(secs)):.2f}x)")
+    for t in plan['targets']:
+        if t['error']:
+            lines.append(f"{t['name']}: {t['error']}")
+    return '\n'.join(lines)
+
+
+# Offline check: fake Fusion folders and a fake exporter that writes what the
+# add-in writes (exports, export_manifest.json, log.txt, job_result.json).
+
+class _FakeFile:
+    def __init__(self, name, ext, size):
+        self.name = name
+        self.fileExtension = ext
+        self.id = hashlib.sha1(f"{name}.{ext}.{size}".encode()).hexdigest()[:12]
+        self.versionNumber = 1
+        self.size = size
+
+
+class _FakeFolder:
+    def __init__(self, name):
+        self.name = name
+        self.dataFiles = []
+        self.dataFolders = []
+
+
+def fake_tree(n_files=120, depth=3, seed=0):
+    rng = random.Random(seed)
+    root = _FakeFolder('root')
+    folders = [(root, 0)]
+    for i in range(n_files):
+        parent, level = rng.choice(folders)
+        if len(folders) < n_files // 6 and rng.random() < 0.3 and level < depth:
+            sub = _FakeFolder(f"d{len(folders)}")
+            parent.dataFolders.append(sub)
+            folders.append((sub, level + 1))
+            parent = sub
+        ext = rng.choice(('f3d', 'f3d', 'f3d', 'f3d', 'f2d', 'pdf', 'png'))
+        parent.dataFiles.append(_FakeFile(f"part{i:03d}", ext, int(rng.lognormvariate(13, 1))))
+    return root
+
+
+def _fake_export(folder, base, fmts, rel_path, file_filter, include_other, stats, manifest, written):
+    out_dir = os.path.join(base, rel_path) if rel_path else base
+    os.makedirs(out_dir, exist_ok=True)
+    for df in folder.dataFiles:
+        if file_filter is not None and not file_filter(rel_path, df):
+            continue
+        if df.fileExtension in exportplan.DESIGN_EXTS:
+            stats['designs'] += 1
+            for fmt in fmts:
+                p = os.path.join(out_dir, f"{df.name}.{fmt}")
+                with open(p, 'wb') as f:
+                    f.write(hashlib.sha256(f"{df.id}{fmt}".encode()).digest() * (1 + df.size % 50))
+                stats[fmt] += 1
+                written.append(p)
+        elif include_other:
+            stats['otherFound'] += 1
+            manifest.append(os.path.join(rel_path, df.name) if rel_path else df.name)
+        else:
+            stats['skipped'] += 1
+    for sub in folder.dataFolders:
+        _fake_export(sub, base, fmts, os.path.join(rel_path, sub.name) if rel_path else sub.name,
+                     file_filter, include_other, stats, manifest, written)
+
+
+def _fake_run_job(job, trees):
+    """What FolderToGit._run_job does, minus Fusion: targets resolve against trees."""
+    results = []
+    for t in job['targets']:
+        res = {'index': t['index'], 'name': t['name'], 'output': t['output'], 'stats': None, 'errors': [],
+               'manifest': [], 'seconds': 0.0, 'error': None}
+        results.append(res)
+        stats = dict.fromkeys(('designs', 'stl', '3mf', 'obj', 'dxf', 'other', 'otherFound', 'skipped', 'errors'), 0)
+        manifest = [] if t['include_other'] else None
+        written = []
+        _fake_export(trees[t['project']], t['output'], t['formats'], '', jobspec.file_filter_for(t),
+                     t['include_other'], stats, manifest if manifest is not None else [], written)
+        postprocess.write_manifest(t['output'], [postprocess.run_steps(p, os.path.relpath(p, t['output']).replace('\\', '/'), ['hash'])
+                                                 for p in written])
+        jobspec.write_export_log(t['output'], manifest, stats)
+        res['stats'] = stats
+        res['manifest'] = manifest or []
+    os.makedirs(job['output'], exist_ok=True)
+    jobspec.write_result(os.path.join(job['output'], jobspec.RESULT_NAME), job, results, 0)
+    return results
+
+
+def _snapshot(root):
+    """Everything a run leaves behind, minus timestamps/timings and the shard folder."""
+    snap = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d != SHARD_DIR]
+        rel = os.path.relpath(dirpath, root)
+        snap[rel + '/'] = None
+        for fn in files:
+            with open(os.path.join(dirpath, fn), 'rb') as f:
+                data = f.read()
+            if fn in (postprocess.MANIFEST_NAME, jobspec.RESULT_NAME):
+                d = json.loads(data)
+                d.pop('generated', None)
+                d.pop('shards', None)
+                d.pop('output', None)
+                for t in d.get('targets', []):
+                    t.pop('seconds', None)
+                    t.pop('post', None)
+                    t['output'] = os.path.relpath(t['output'], root)
+                data = json.dumps(d, sort_keys=True).encode()
+            snap[os.path.join(rel, fn)] = hashlib.sha256(data).hexdigest()
+    return snap
+
+
+def simulate(sessions=3, n_files=120, seed=0):
+    import tempfile
+    tmp = tempfile.mkdtemp(prefix='shards_')
+    try:
+        trees = {'A': fake_tree(n_files, seed=seed), 'B': fake_tree(n_files // 3, seed=seed + 1)}
+        raw = {'defaults': {'formats': ['3mf', 'stl'], 'include_other': True},
+               'targets': [{'project': 'A', 'output': 'a'}, {'project': 'B', 'output': 'b', 'formats': ['stl']}]}
+        single = jobspec.normalize_job(dict(raw, output=os.path.join(tmp, 'single')))
+        _fake_run_job(single, trees)
+
+        job = jobspec.normalize_job(dict(raw, output=os.path.join(tmp, 'sharded')))
+        plan = plan_shards(job, lambda t: (trees.get(t['project']), None), sessions)
+        paths = write_shards(job, plan)
+        print(format_plan(plan))
+        merged = None
+        for p in paths:
+            shard_job = jobspec.load_job(p)
+            _fake_run_job(shard_job, trees)
+            merged, missing = merge_if_complete(shard_job['shard']['plan'])
+            print(f"{os.path.basename(p)} done, waiting for {missing or 'none'}" + (f" -> merged {merged}" if merged else ''))
+        a, b = _snapshot(single['output']), _snapshot(job['output'])
+        diff = sorted(k for k in set(a) | set(b) if a.get(k, '-') != b.get(k, '-'))
+        print(f"single session: {len(a)} entries, sharded + merged: {len(b)} entries, {len(diff)} differ")
+        for k in diff[:10]:
+            print('  ' + k)
+        return not diff
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Sharded batch jobs: merge finished shards, or simulate offline')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    m = sub.add_parser('merge', help='merge finished shards into the job output')
+    m.add_argument('plan', help=f"path of {PLAN_NAME}")
+    m.add_argument('--keep', action='store_true', help='keep the shard folders')
+    m.add_argument('--force', action='store_true', help='merge again even if already merged')
+    s = sub.add_parser('simulate', help='fake backend: sharded + merged run vs a single session')
+    s.add_argument('--sessions', type=int, default=3)
+    s.add_argument('--files', type=int, default=120)
+    s.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    if args.cmd == 'merge':
+        missing = missing_shards(args.plan)
+        if missing:
+            print(f"Shards not finished: {', '.join(map(str, missing))}")
+            sys.exit(1)
+        if load_plan(args.plan).get('merged') and not args.force:
+            print(f"Already merged at {load_plan(args.plan)['merged']}")
+            sys.exit(0)
+        print(merge(args.plan, args.keep))
+    else:
+        sys.exit(0 if simulate(args.sessions, args.files, args.seed) else 1)
+    sys.exit(0)
@@ -0,0 +1,214 @@
+# ==== Wall thickness analysis ====
+# Casts a ray inwards (against the face normal) from points spread over the surface
+# and takes the distance to the first hit as the local wall thickness; hits on a
+# wall that doesn't roughly face the source (grazing a neighbouring wall next to an
+# edge) are dropped instead of being read as a thin spot. Points are
+# every face centre (so each face gets a value for the coloured mesh) plus random
+# area-weighted samples, which alone feed the statistics and thin spots so long
+# sliver faces along sharp edges don't dominate them; all rays of a part go through
+# bvh.intersect_rays in one batch.
+#
+#   python thickness.py ../Generation2 --threshold 0.8 --out thickness/
+#   python thickness.py --selfcheck
+#
+# Writes <part>.thickness.json (stats and thin spots) and <part>.thickness.ply
+# (faces coloured red below the threshold to green at 3x the threshold) per part.
+# Needs numpy.
+
+import os, sys, json, time, argparse
+
+import numpy as np
+
+import meshfiles
+import bvh
+
+THRESHOLD_MM = 0.8   # two perimeters with a 0.4 mm nozzle
+SAMPLES = 4000       # area-weighted samples per part
+OFFSET_MM = 1e-4     # ray start inside the surface so it can't hit its own face
+SPOT_GRID_MM = 2.0   # thin samples closer than this are reported as one spot
+FACING_COS = np.cos(np.radians(60.0))   # hit wall within 60 degrees of facing the source
+
+
+def sample_surface(tris, n, rng):
+    """n area-weighted random points on a triangle soup -> (points, face index)."""
+    cr = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    area = np.linalg.norm(cr, axis=1)
+    if not area.sum():
+        return np.zeros((0, 3)), np.zeros(0, np.int64)
+    fi = rng.choice(len(tris), size=n, p=area / area.sum())
+    r1, r2 = rng.random(n), rng.random(n)
+    flip = r1 + r2 > 1
+    r1[flip], r2[flip] = 1 - r1[flip], 1 - r2[flip]
+    t = tris[fi]
+    return t[:, 0] + (t[:, 1] - t[:, 0]) * r1[:, None] + (t[:, 2] - t[:, 0]) * r2[:, None], fi
+
+
+def analyze(vertices, faces, threshold=THRESHOLD_MM, samples=SAMPLES, seed=0, tree=None):
+    """Thickness per face (min over its rays) and stats over the area samples.
+    Returns (face thickness array, report dict)."""
+    v = np.asarray(vertices, np.float64)
+    f = np.asarray(faces, np.int64)
+    tris = v[f]
+    cr = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    ln = np.linalg.norm(cr, axis=1)
+    normals = cr / np.maximum(ln, 1e-12)[:, None]
+    tree = tree or bvh.BVH(tris)
+    rng = np.random.default_rng(seed)
+    pts, fi = sample_surface(tris, samples, rng)
+    origins = np.concatenate((tris.mean(axis=1), pts))
+    owner = np.concatenate((np.arange(len(f)), fi))
+    dirs = -normals[owner]
+    t, hit = bvh.intersect_rays(tree, origins + dirs * OFFSET_MM, dirs)
+    t = t + OFFSET_MM
+    # The far wall must roughly face the source: a grazing hit on a neighbouring
+    # wall next to an edge measures the edge, not the wall
+    found = hit >= 0
+    facing = np.einsum('ij,ij->i', normals[np.maximum(hit, 0)], normals[owner]) <= -FACING_COS
+    grazing = found & ~facing
+    t[grazing] = np.inf
+
+    face_t = np.full(len(f), np.inf)
+    np.minimum.at(face_t, owner, t)
+    face_t[ln == 0] = np.nan
+
+    st = t[len(f):]
+    ok = np.isfinite(st)
+    rep = {
+        'faces': int(len(f)),
+        'rays': int(len(t)),
+        'noHit': int((~found).sum()),
+        'grazing': int(grazing.sum()),
+        'threshold': threshold,
+        'min': float(st[ok].min()) if ok.any() else None,
+    }
+    if ok.any():
+        p1, p5, p50 = np.percentile(st[ok], [1, 5, 50])
+        rep.update({'p1': float(p1), 'p5': float(p5), 'median': float(p50),
+                    'thinAreaPct': float(100.0 * (st[ok] < threshold).mean())})
+
+    # Thin spots: thin sample points merged per grid cell, thinnest first
+    thin = ok & (st < threshold)
+    spots = []
+    if thin.any():
+        p, tt = pts[thin], st[thin]
+        cell = np.floor(p / SPOT_GRID_MM).astype(np.int64)
+        order = np.argsort(tt)
+        _u, first = np.unique(cell[order], axis=0, return_index=True)
+        for i in order[np.sort(first)][:20]:
+            spots.append({'at': [round(float(x), 2) for x in p[i]], 'thickness': round(float(tt[i]), 3)})
+    rep['thinSpots'] = spots
+    return face_t, rep
+
+
+def _colors(face_t, threshold):
+    """Red (<= threshold) through yellow to green (>= 3x threshold); grey for no hit."""
+    x = np.clip((np.nan_to_num(face_t, nan=np.inf) - threshold) / (2 * threshold), 0.0, 1.0)
+    rgb = np.column_stack((np.where(x < 0.5, 1.0, 2 - 2 * x), np.where(x < 0.5, 2 * x, 1.0), np.zeros_like(x)))
+    rgb[~np.isfinite(face_t)] = 0.6
+    return (rgb * 255).astype(np.uint8)
+
+
+def write_colored_ply(path, vertices, faces, face_t, threshold):
+    """Binary PLY with per-vertex colours; vertices are split per face so every face
+    keeps its own colour."""
+    tris = np.asarray(vertices, np.float64)[np.asarray(faces)]
+    n = len(tris)
+    vx = np.zeros(n * 3, dtype=[('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('r', 'u1'), ('g', 'u1'), ('b', 'u1')])
+    p = tris.reshape(-1, 3)
+    vx['x'], vx['y'], vx['z'] = p[:, 0], p[:, 1], p[:, 2]
+    c = np.repeat(_colors(face_t, threshold), 3, axis=0)
+    vx['r'], vx['g'], vx['b'] = c[:, 0], c[:, 1], c[:, 2]
+    fc = np.zeros(n, dtype=[('n', 'u1'), ('i', '<i4', (3,))])
+    fc['n'] = 3
+    fc['i'] = np.arange(n * 3).reshape(-1, 3)
+    head = ('ply\nformat binary_little_endian 1.0\n'
+            f'element vertex {n * 3}\nproperty float x\nproperty float y\nproperty float z\n'
+            'property uchar red\nproperty uchar green\nproperty uchar blue\n'
+            f'element face {n}\nproperty list uchar int vertex_indices\nend_header\n')
+    with open(path, 'wb') as fh:
+        fh.write(head.encode('ascii'))
+        fh.write(vx.tobytes())
+        fh.write(fc.tobytes())
+
+
+def analyze_folder(folder, out_dir=None, threshold=THRESHOLD_MM, samples=SAMPLES, prefer='3mf', recursive=False):
+    rows = []
+    t0 = time.perf_counter()
+    for p in meshfiles.find_meshes(folder, prefer, recursive):
+        m = meshfiles.read_mesh(p)
+        if not len(m.faces):
+            continue
+        name = os.path.splitext(os.path.basename(p))[0]
+        t1 = time.perf_counter()
+        face_t, rep = analyze(m.vertices, m.faces, threshold, samples)
+        rep.update({'name': name, 'path': p, 'seconds': time.perf_counter() - t1})
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            with open(os.path.join(out_dir, name + '.thickness.json'), 'w', encoding='utf-8') as fh:
+                json.dump(rep, fh, indent=1)
+            write_colored_ply(os.path.join(out_dir, name + '.thickness.ply'), m.vertices, m.faces, face_t, threshold)
+        rows.append(rep)
+    return rows, time.perf_counter() - t0
+
+
+def _profile_prism(profile, width):
+    """Extrude a CCW polygon (star-shaped from its first vertex) along z."""
+    p = np.asarray(profile, np.float64)
+    n = len(p)
+    v = np.vstack((np.c_[p, np.zeros(n)], np.c_[p, np.full(n, width)]))
+    f = []
+    for i in range(1, n - 1):
+        f += [(0, i + 1, i), (n, n + i, n + i + 1)]
+    for i in range(n):
+        j = (i + 1) % n
+        f += [(i, j, n + j), (i, n + j, n + i)]
+    return v, np.array(f, np.int64)
+
+
+def selfcheck(t=2.0, leg=20.0, lean_deg=4.0):
+    """L-bracket with walls t thick and an inner corner; the outer face of the upright
+    leans in a little, so inward rays from the base next to that edge run almost
+    parallel to it. Every reading has to be a real wall (no value well below t)."""
+    s, c = np.tan(np.radians(lean_deg)), np.cos(np.radians(lean_deg))
+    x0 = t / c      # horizontal offset of the upright's inner face for a wall t thick
+    # Starts at the inner corner, from which the whole profile is visible
+    profile = [(x0 + s * t, t), (x0 + s * leg, leg), (s * leg, leg), (0, 0), (leg, 0), (leg, t)]
+    v, f = _profile_prism(profile, 10.0)
+    face_t, rep = analyze(v, f, threshold=0.8 * t, samples=20000)
+    assert rep['min'] is not None and rep['min'] > 0.95 * t, rep
+    assert not rep['thinSpots'], rep['thinSpots']
+    assert abs(rep['median'] - t) < 0.05 * t, rep
+    print(f"thickness selfcheck OK: min {rep['min']:.3f} mm for {t:g} mm walls, {rep['grazing']} grazing hits dropped")
+    return True
+
+
+def format_report(rows, seconds):
+    fmt = lambda x: f"{x:8.2f}" if x is not None else '       -'
+    lines = [f"{'part':32} {'min':>8} {'p1':>8} {'p5':>8} {'median':>8} {'thin %':>7} {'spots':>5}"]
+    for r in rows:
+        flag = '  <-- thin' if r['thinSpots'] else ''
+        lines.append(f"{r['name'][:32]:32} {fmt(r['min'])} {fmt(r.get('p1'))} {fmt(r.get('p5'))} {fmt(r.get('median'))} "
+                     f"{r.get('thinAreaPct', 0):7.1f} {len(r['thinSpots']):5}{flag}")
+    rays = sum(r['rays'] for r in rows)
+    lines.append(f"{len(rows)} parts, {rays} rays in {seconds:.2f}s (threshold {rows[0]['threshold'] if rows else THRESHOLD_MM:g} mm)")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Wall thickness analysis by ray casting')
+    ap.add_argument('folder', nargs='?')
+    ap.add_argument('--threshold', type=float, default=THRESHOLD_MM, help='report walls thinner than this (mm)')
+    ap.add_argument('--samples', type=int, default=SAMPLES, help='area-weighted rays per part (plus one per face)')
+    ap.add_argument('--out', help='folder for the per-part JSON reports and coloured PLY meshes')
+    ap.add_argument('--prefer', choices=('3mf', 'stl'), default='3mf')
+    ap.add_argument('-r', '--recursive', action='store_true')
+    ap.add_argument('--selfcheck', action='store_true', help='check an L-bracket of known wall thickness')
+    args = ap.parse_args()
+    if args.selfcheck:
+        selfcheck()
+        sys.exit(0)
+    if not args.folder:
+        ap.error('folder is required')
+    rows, secs = analyze_folder(args.folder, args.out, args.threshold, args.samples, args.prefer, args.recursive)
+    print(format_report(rows, secs))
+    sys.exit(0)
@@ -0,0 +1,226 @@
+# ==== Thumbnail renderer ====
+# Headless, CPU-only previews of exported meshes: an isometric orthographic view,
+# flat shaded, rasterized with numpy (the exact row spans of all triangles are
+# expanded into pixel candidates in batches; a z-buffer keeps the nearest face per
+# pixel) and written as PNG with zlib. Each folder gets thumbnails/<name>.png plus
+# contact_sheet.png, and thumbnails/thumbs_index.json remembers the sha256 of every
+# source so only new or changed meshes are rendered again.
+#
+#   python thumbnails.py ../Generation1 ../Generation2 --size 256
+#
+# Needs numpy.
+
+import os, sys, json, time, zlib, struct, argparse
+
+import numpy as np
+
+import meshfiles
+from postprocess import sha256_file
+
+THUMB_DIR = 'thumbnails'
+INDEX_NAME = 'thumbs_index.json'
+SHEET_NAME = 'contact_sheet.png'
+SIZE = 256
+SUPERSAMPLE = 2
+MAX_PAIRS = 4_000_000             # pixel candidates per batch
+VIEW = (1.0, -1.3, 0.9)           # camera direction (from the part towards the camera)
+LIGHT = (0.4, -0.5, 0.75)
+COLOR = np.array([70, 120, 190], np.float64)
+BACKGROUND = 248
+
+
+def write_png(path, rgb):
+    """(H, W, 3) uint8 -> PNG (8-bit RGB, no filtering)."""
+    h, w, _ = rgb.shape
+    raw = np.zeros((h, w * 3 + 1), np.uint8)
+    raw[:, 1:] = rgb.reshape(h, -1)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def _view_basis():
+    back = np.array(VIEW, np.float64)
+    back /= np.linalg.norm(back)
+    right = np.cross([0.0, 0.0, 1.0], back)
+    right /= np.linalg.norm(right)
+    up = np.cross(back, right)
+    return right, up, back
+
+
+def render(vertices, faces, size=SIZE, supersample=SUPERSAMPLE):
+    """Render one mesh to an (size, size, 3) uint8 image."""
+    s = size * supersample
+    img = np.full((s * s, 3), BACKGROUND, np.float64)
+    v = np.asarray(vertices, np.float64)
+    f = np.asarray(faces, np.int64)
+    if not len(f):
+        return img.reshape(s, s, 3).astype(np.uint8)[::supersample, ::supersample]
+    right, up, back = _view_basis()
+    x, y, depth = v @ right, v @ up, -(v @ back)        # smaller depth = nearer
+    span = max(x.max() - x.min(), y.max() - y.min(), 1e-9)
+    scale = s * 0.9 / span
+    px = (x - (x.min() + x.max()) / 2) * scale + s / 2
+    py = s / 2 - (y - (y.min() + y.max()) / 2) * scale
+
+    t = v[f]
+    n = np.cross(t[:, 1] - t[:, 0], t[:, 2] - t[:, 0])
+    n /= np.maximum(np.linalg.norm(n, axis=1), 1e-12)[:, None]
+    light = np.array(LIGHT) / np.linalg.norm(LIGHT)
+    shade = 0.25 + 0.75 * np.abs(n @ light)             # two-sided: exports aren't always consistently wound
+
+    X, Y, Z = px[f], py[f], depth[f]
+    area = (X[:, 1] - X[:, 0]) * (Y[:, 2] - Y[:, 0]) - (X[:, 2] - X[:, 0]) * (Y[:, 1] - Y[:, 0])
+    live = np.flatnonzero(np.abs(area) > 1e-12)
+    # One (triangle, pixel row) pair per covered row; rows outside the image are dropped
+    y0 = np.clip(np.ceil(Y[live].min(1) - 0.5), 0, s).astype(np.int64)
+    y1 = np.clip(np.floor(Y[live].max(1) - 0.5), -1, s - 1).astype(np.int64)
+    h = np.maximum(y1 - y0 + 1, 0)
+    tri = np.repeat(live, h)
+    qy = (np.repeat(y0, h) + np.arange(h.sum()) - np.repeat(np.cumsum(h) - h, h)) + 0.5
+    # Span of each row: where the row's centre line crosses the triangle's edges
+    xl = np.full(len(tri), np.inf)
+    xr = np.full(len(tri), -np.inf)
+    for i, j in ((0, 1), (1, 2), (2, 0)):
+        ya, yb, xa, xb = Y[tri, i], Y[tri, j], X[tri, i], X[tri, j]
+        cross = (ya <= qy) != (yb <= qy)
+        xc = xa + (qy - ya) * (xb - xa) / np.where(cross, yb - ya, 1.0)
+        xl = np.where(cross, np.minimum(xl, xc), xl)
+        xr = np.where(cross, np.maximum(xr, xc), xr)
+    cx0 = np.clip(np.ceil(xl - 0.5), 0, s).astype(np.int64)
+    cx1 = np.clip(np.floor(xr - 0.5), -1, s - 1).astype(np.int64)
+    cnt = np.maximum(cx1 - cx0 + 1, 0)
+    keep = cnt > 0
+    tri, qy, cx0, cnt = tri[keep], qy[keep], cx0[keep], cnt[keep]
+
+    zbuf = np.full(s * s, np.inf)
+    fbuf = np.full(s * s, -1, np.int64)
+    ends = np.cumsum(cnt)
+    lo = 0
+    while lo < len(tri):
+        hi = max(lo + 1, int(np.searchsorted(ends, (ends[lo - 1] if lo else 0) + MAX_PAIRS)))
+        c = cnt[lo:hi]
+        t_ = np.repeat(tri[lo:hi], c)
+        qx = np.repeat(cx0[lo:hi], c) + (np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)) + 0.5
+        qyy = np.repeat(qy[lo:hi], c)
+        lo = hi
+        Xt, Yt = X[t_], Y[t_]
+        # Barycentric weights (edge functions over the signed area) for the depth
+        w0 = ((Xt[:, 2] - Xt[:, 1]) * (qyy - Yt[:, 1]) - (Yt[:, 2] - Yt[:, 1]) * (qx - Xt[:, 1])) / area[t_]
+        w1 = ((Xt[:, 0] - Xt[:, 2]) * (qyy - Yt[:, 2]) - (Yt[:, 0] - Yt[:, 2]) * (qx - Xt[:, 2])) / area[t_]
+        z = w0 * Z[t_, 0] + w1 * Z[t_, 1] + (1.0 - w0 - w1) * Z[t_, 2]
+        pix = (qyy - 0.5).astype(np.int64) * s + (qx - 0.5).astype(np.int64)
+        # Nearest candidate per pixel: sort by (pixel, depth), keep the first of each pixel
+        order = np.lexsort((z, pix))
+        pix, z, t_ = pix[order], z[order], t_[order]
+        first = np.concatenate(([True], pix[1:] != pix[:-1]))
+        pix, z, t_ = pix[first], z[first], t_[first]
+        better = z < zbuf[pix]
+        zbuf[pix[better]] = z[better]
+        fbuf[pix[better]] = t_[better]
+    hit = fbuf >= 0
+    img[hit] = COLOR * shade[fbuf[hit], None] + (255 - COLOR) * 0.15 * shade[fbuf[hit], None]
+    img = img.reshape(s, s, 3)
+    if supersample > 1:
+        img = img.reshape(size, supersample, size, supersample, 3).mean(axis=(1, 3))
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def contact_sheet(images, cols=None, pad=4):
+    """Grid of equally sized thumbnails."""
+    if not images:
+        return np.full((1, 1, 3), BACKGROUND, np.uint8)
+    h, w, _ = images[0].shape
+    cols = cols or int(np.ceil(np.sqrt(len(images))))
+    rows = int(np.ceil(len(images) / cols))
+    sheet = np.full((rows * (h + pad) + pad, cols * (w + pad) + pad, 3), 220, np.uint8)
+    for i, im in enumerate(images):
+        r, c = divmod(i, cols)
+        sheet[pad + r * (h + pad):pad + r * (h + pad) + h, pad + c * (w + pad):pad + c * (w + pad) + w] = im
+    return sheet
+
+
+def _read_png(path):
+    """Decode the PNGs this module writes (8-bit RGB, filter 0) for the contact sheet."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos, idat, w, h = 8, b'', 0, 0
+    while pos < len(data):
+        n, tag = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + n]
+        if tag == b'IHDR':
+            w, h = struct.unpack('>II', body[:8])
+        elif tag == b'IDAT':
+            idat += body
+        pos += 12 + n
+    raw = np.frombuffer(zlib.decompress(idat), np.uint8).reshape(h, w * 3 + 1)
+    return raw[:, 1:].reshape(h, w, 3)
+
+
+def update_folder(folder, size=SIZE, prefer='stl'):
+    """Render new/changed meshes of one folder and rebuild its contact sheet if needed.
+    Returns {'rendered', 'cached', 'seconds'}."""
+    t0 = time.perf_counter()
+    out_dir = os.path.join(folder, THUMB_DIR)
+    idx_path = os.path.join(out_dir, INDEX_NAME)
+    try:
+        with open(idx_path, 'r', encoding='utf-8') as fh:
+            index = json.load(fh)
+    except Exception:
+        index = {}
+    if index.get('size') != size:
+        index = {'size': size, 'files': {}}
+    files = index['files']
+    paths = meshfiles.find_meshes(folder, prefer)
+    st = {'rendered': 0, 'cached': 0}
+    names = []
+    for p in paths:
+        name = os.path.splitext(os.path.basename(p))[0]
+        names.append(name)
+        png = os.path.join(out_dir, name + '.png')
+        digest = sha256_file(p)
+        if files.get(name, {}).get('sha256') == digest and os.path.exists(png):
+            st['cached'] += 1
+            continue
+        m = meshfiles.read_mesh(p)
+        os.makedirs(out_dir, exist_ok=True)
+        write_png(png, render(m.vertices, m.faces, size))
+        files[name] = {'sha256': digest, 'source': os.path.basename(p)}
+        st['rendered'] += 1
+    for gone in set(files) - set(names):
+        del files[gone]
+    sheet = os.path.join(folder, THUMB_DIR, SHEET_NAME)
+    if names and (st['rendered'] or index.get('sheet') != names or not os.path.exists(sheet)):
+        write_png(sheet, contact_sheet([_read_png(os.path.join(out_dir, n + '.png')) for n in names]))
+        index['sheet'] = names   # row-major order of the cells
+    if names:
+        with open(idx_path, 'w', encoding='utf-8') as fh:
+            json.dump(index, fh, indent=1)
+    st['seconds'] = time.perf_counter() - t0
+    return st
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Render thumbnails and contact sheets for export folders')
+    ap.add_argument('folders', nargs='+')
+    ap.add_argument('--size', type=int, default=SIZE)
+    ap.add_argument('-r', '--recursive', action='store_true', help='also every subfolder')
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    total = {'rendered': 0, 'cached': 0}
+    for top in args.folders:
+        dirs = [d for d, _s, _f in os.walk(top) if THUMB_DIR not in d.split(os.sep)] if args.recursive else [top]
+        for d in dirs:
+            st = update_folder(d, args.size)
+            if st['rendered'] or st['cached']:
+                print(f"{d}: {st['rendered']} rendered, {st['cached']} cached ({st['seconds']:.2f}s)")
+            total['rendered'] += st['rendered']
+            total['cached'] += st['cached']
+    print(f"{total['rendered']} rendered, {total['cached']} cached in {time.perf_counter() - t0:.2f}s")
+    sys.exit(0)
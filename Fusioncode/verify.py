@@ -0,0 +1,313 @@
+# ==== Backup integrity verification ====
+# Re-reads an export tree and compares it with the export_manifest.json files the
+# 'hash' post-processing step wrote (every manifest covers the folder it sits in):
+#   missing     listed in the manifest, not on disk
+#   extra       on disk below a manifest, not listed in it
+#   truncated   smaller than the manifest says (or empty)
+#   corrupt     sha256 or triangle count differs, the mesh doesn't parse or has no
+#               triangles, a DXF has no EOF marker, or the file can't be read
+# Files are hashed with large chunked reads in a process pool, biggest first so one
+# large file doesn't finish last on its own; meshes are parsed in the same worker
+# right after hashing, while they are still in the page cache. Exits 1 on any
+# discrepancy, so it can run from a scheduled task after each backup.
+#
+#   python verify.py check D:/FusionBackup --workers 8
+#   python verify.py check D:/FusionBackup --quick --json verify_report.json
+#   python verify.py demo                      # damaged fake tree, serial vs parallel
+#
+# Deep mesh checks need numpy (meshfiles readers); without it, or with --quick, only
+# the cheap structural checks of the 'validate' post step run.
+
+import os, sys, json, time, hashlib, argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import meshfiles
+import postprocess
+
+READ_CHUNK = 4 << 20
+MESH_EXTS = ('.stl', '.3mf', '.obj')
+PROBLEMS = ('missing', 'extra', 'truncated', 'corrupt')
+# Written next to the exports by this folder's tools; not backup content
+BOOKKEEPING = {postprocess.MANIFEST_NAME, 'log.txt', 'job_result.json', '.export_index.json', 'shape_index.npz',
+               'lod_index.json', 'filament_estimate.json', 'dialog_cache.json', 'verify_report.json'}
+SKIP_DIRS = {'_shards', 'thumbnails'}
+
+
+def _hash_file(path):
+    """sha256 and size with one reusable buffer; also returns the last bytes read."""
+    h = hashlib.sha256()
+    buf = bytearray(READ_CHUNK)
+    view = memoryview(buf)
+    size = 0
+    tail = b''
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+            size += n
+            tail = bytes(view[max(0, n - 64):n])
+    return h.hexdigest(), size, tail
+
+
+def mesh_triangles(path, deep=True):
+    """Triangle count of a mesh file; raises when it doesn't parse.
+    postprocess.step_validate's structural checks always run (they give the exact
+    count of a binary STL). deep=True also reads the mesh with numpy: the coordinates
+    of a binary STL must be finite, other formats are parsed in full."""
+    res = {}
+    postprocess.step_validate(path, res)
+    np = meshfiles.np
+    if not deep or np is None:
+        return res.get('triangles')
+    n = res.get('triangles')
+    if n is not None:
+        rec = np.fromfile(path, np.dtype([('nv', '<f4', 12), ('attr', '<u2')]), count=n, offset=84)
+        if not np.isfinite(rec['nv']).all():
+            raise ValueError('STL has NaN/infinite coordinates')
+        return n
+    return int(len(meshfiles.read_mesh(path).faces))
+
+
+def check_file(path, rel, expect=None, deep=True):
+    """Verify one file against its manifest entry (None when unlisted).
+    Top-level so process pools can pickle it."""
+    res = {'path': rel, 'problem': None, 'detail': '', 'size': 0}
+    try:
+        sha, size, tail = _hash_file(path)
+    except OSError as ex:
+        res.update(problem='corrupt', detail=f"unreadable: {ex}")
+        return res
+    res['size'], res['sha256'] = size, sha
+    ext = os.path.splitext(path)[1].lower()
+    want_size = (expect or {}).get('size')
+    if size == 0 or (want_size is not None and size < want_size):
+        res.update(problem='truncated', detail=f"{size} of {want_size if want_size is not None else '?'} bytes")
+        return res
+    if expect and expect.get('sha256') and expect['sha256'] != sha:
+        res.update(problem='corrupt', detail='sha256 differs' + (f" (size {size}, expected {want_size})" if size != want_size else ''))
+        return res
+    try:
+        if ext in MESH_EXTS:
+            n = mesh_triangles(path, deep)
+            res['triangles'] = n
+            if n == 0:
+                raise ValueError('mesh has no triangles')
+            if n is not None and expect and expect.get('triangles') not in (None, n):
+                raise ValueError(f"{n} triangles, manifest says {expect['triangles']}")
+        elif ext == '.dxf' and b'EOF' not in tail:
+            raise ValueError('DXF has no EOF marker')
+    except Exception as ex:
+        res.update(problem='corrupt', detail=str(ex) or type(ex).__name__)
+        return res
+    if expect is None:
+        res.update(problem='extra', detail='not in the manifest')
+    return res
+
+
+def _load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {e['path'].replace('\\', '/'): e for e in json.load(f).get('files', [])}
+
+
+def scan(root):
+    """Walk root once. Returns (files, manifests):
+      files:     [(abs path, rel to root, manifest dir or None, rel to that dir, size)]
+      manifests: {manifest dir: {rel path: entry}} (an unreadable manifest maps to None)."""
+    manifests = {}
+    files = []
+    owner_of = {}
+    for dirpath, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        parent = owner_of.get(os.path.dirname(dirpath)) if dirpath != root else None
+        if postprocess.MANIFEST_NAME in names:
+            try:
+                manifests[dirpath] = _load_manifest(os.path.join(dirpath, postprocess.MANIFEST_NAME))
+            except Exception:
+                manifests[dirpath] = None
+            parent = dirpath
+        owner_of[dirpath] = parent
+        for fn in sorted(names):
+            if fn in BOOKKEEPING or fn.endswith('.tmp') or meshfiles.is_lod_file(fn):
+                continue
+            p = os.path.join(dirpath, fn)
+            if fn.endswith('.gz') and os.path.exists(p[:-3]):
+                continue    # written by the 'gzip' post step next to its source
+            if fn.lower().endswith('.mtl') and os.path.exists(p[:-4] + '.obj'):
+                continue    # material library of an OBJ export; only the OBJ is listed
+            try:
+                size = os.path.getsize(p)
+            except OSError:
+                size = 0
+            rel = os.path.relpath(p, root).replace('\\', '/')
+            mrel = os.path.relpath(p, parent).replace('\\', '/') if parent else None
+            files.append((p, rel, parent, mrel, size))
+    return files, manifests
+
+
+def verify(root, workers=None, deep=True, mode='process'):
+    """Check every file under root. Returns a report dict (see format_report)."""
+    t0 = time.perf_counter()
+    files, manifests = scan(root)
+    results = []
+    seen = {d: set() for d in manifests}
+    jobs = []
+    for p, rel, mdir, mrel, size in files:
+        entries = manifests.get(mdir) if mdir else None
+        expect = entries.get(mrel) if entries else None
+        if entries is not None and mdir:
+            seen[mdir].add(mrel)
+        # No (readable) manifest above this file: only look for damage
+        jobs.append((size, p, rel, expect if entries is not None else {}))
+    for mdir, entries in manifests.items():
+        rel_dir = os.path.relpath(mdir, root).replace('\\', '/')
+        prefix = '' if rel_dir == '.' else rel_dir + '/'
+        if entries is None:
+            results.append({'path': prefix + postprocess.MANIFEST_NAME, 'problem': 'corrupt',
+                            'detail': 'manifest is not valid JSON', 'size': 0})
+            continue
+        for mrel in sorted(set(entries) - seen[mdir]):
+            rel = prefix + mrel
+            results.append({'path': rel, 'problem': 'missing', 'detail': 'listed in the manifest', 'size': 0})
+    jobs.sort(key=lambda j: -j[0])
+    workers = max(1, int(workers or os.cpu_count() or 2))
+    if workers == 1:
+        for _size, p, rel, expect in jobs:
+            results.append(check_file(p, rel, expect, deep))
+    else:
+        pool_cls = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+        with pool_cls(max_workers=workers) as pool:
+            futs = {pool.submit(check_file, p, rel, expect, deep): rel for _size, p, rel, expect in jobs}
+            for fut in as_completed(futs):
+                try:
+                    results.append(fut.result())
+                except Exception as ex:
+                    results.append({'path': futs[fut], 'problem': 'corrupt', 'detail': f"check failed: {ex}", 'size': 0})
+    results.sort(key=lambda r: r['path'])
+    counts = {k: 0 for k in PROBLEMS}
+    for r in results:
+        if r['problem']:
+            counts[r['problem']] += 1
+    seconds = time.perf_counter() - t0
+    nbytes = sum(r['size'] for r in results)
+    return {
+        'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'root': os.path.abspath(root),
+        'files': len(jobs),
+        'bytes': nbytes,
+        'seconds': seconds,
+        'workers': workers,
+        'deep': bool(deep and meshfiles.np is not None),
+        'manifests': len(manifests),
+        'unlisted': sum(1 for j in jobs if j[3] == {}),
+        'counts': counts,
+        'problems': [r for r in results if r['problem']],
+        'ok': not any(counts.values()),
+    }
+
+
+def format_report(rep, limit=20):
+    c = rep['counts']
+    mbps = rep['bytes'] / (1 << 20) / rep['seconds'] if rep['seconds'] > 0 else 0.0
+    lines = [f"{rep['files']} files, {rep['bytes'] / (1 << 20):.1f} MiB in {rep['seconds']:.2f}s "
+             f"({mbps:.0f} MiB/s, {rep['workers']} workers, {'deep' if rep['deep'] else 'quick'} mesh checks), "
+             f"{rep['manifests']} manifests"]
+    if rep['unlisted']:
+        lines.append(f"{rep['unlisted']} files have no readable export_manifest.json above them (only checked for damage; "
+                     f"export with the 'hash' post step to cover them)")
+    for kind in PROBLEMS:
+        rows = [r for r in rep['problems'] if r['problem'] == kind]
+        for r in rows[:limit]:
+            lines.append(f"{kind:10} {r['path']}  {r['detail']}")
+        if len(rows) > limit:
+            lines.append(f"{kind:10} ... {len(rows) - limit} more")
+    ok = 'OK: backup matches its manifests' if rep['manifests'] else 'OK: no damaged files (no manifests to compare with)'
+    lines.append(ok if rep['ok'] else
+                 'FAILED: ' + ', '.join(f"{c[k]} {k}" for k in PROBLEMS if c[k]))
+    return '\n'.join(lines)
+
+
+# Demo: a fake backup with known damage
+
+def _grid_mesh(n):
+    v = [(x, y, (x * y) % 7 * 0.1) for y in range(n + 1) for x in range(n + 1)]
+    t = []
+    for y in range(n):
+        for x in range(n):
+            a = y * (n + 1) + x
+            t += [(a, a + 1, a + n + 2), (a, a + n + 2, a + n + 1)]
+    return v, t
+
+
+def demo(files=48, mb=2.0, workers=None):
+    import shutil, tempfile
+    root = tempfile.mkdtemp(prefix='verify_demo_')
+    n = max(2, int((mb * (1 << 20) / 100) ** 0.5))     # ~50 bytes per STL triangle
+    v, t = _grid_mesh(n)
+    proto = os.path.join(root, 'proto.stl')
+    meshfiles.write_stl(proto, v, t)
+    paths = []
+    for i in range(files):
+        p = os.path.join(root, f"Gen{i % 3 + 1}", f"part{i:03d}.stl")
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        shutil.copyfile(proto, p)
+        paths.append(p)
+    small = _grid_mesh(8)
+    meshfiles.write_3mf(os.path.join(root, 'Gen1', 'lid.3mf'), [('lid', small[0], small[1])])
+    with open(os.path.join(root, 'Gen2', 'plate.dxf'), 'w') as f:
+        f.write('0\nSECTION\n2\nENTITIES\n0\nENDSEC\n0\nEOF\n')
+    os.remove(proto)
+    pp = postprocess.PostProcessor(root, ['hash', 'validate'], workers=4, max_pending=16)
+    for dirpath, _dirs, names in os.walk(root):
+        for fn in names:
+            pp.submit(os.path.join(dirpath, fn))
+    postprocess.write_manifest(root, pp.close())
+
+    # Damage: one of each kind
+    with open(paths[1], 'r+b') as f:
+        f.truncate(os.path.getsize(paths[1]) // 2)
+    with open(paths[2], 'r+b') as f:
+        f.seek(os.path.getsize(paths[2]) // 2)
+        f.write(b'\xff' * 16)
+    os.remove(paths[3])
+    meshfiles.write_stl(os.path.join(root, 'Gen1', 'stray.stl'), small[0], small[1])
+    expected = {'truncated': 1, 'corrupt': 1, 'missing': 1, 'extra': 1}
+
+    serial = verify(root, 1)
+    parallel = verify(root, workers)
+    print(format_report(parallel))
+    print(f"serial {serial['seconds']:.2f}s vs {parallel['workers']} workers {parallel['seconds']:.2f}s "
+          f"({serial['seconds'] / max(parallel['seconds'], 1e-9):.1f}x); "
+          f"files come from the page cache here, so this measures hashing/parsing, not the disk")
+    shutil.rmtree(root, ignore_errors=True)
+    ok = parallel['counts'] == expected and serial['counts'] == expected
+    print('detected every planted problem' if ok else f"expected {expected}")
+    return ok
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Verify an export tree against its manifests')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    c = sub.add_parser('check', help='re-hash and parse every file, compare with export_manifest.json')
+    c.add_argument('root')
+    c.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    c.add_argument('--mode', choices=('thread', 'process'), default='process')
+    c.add_argument('--quick', action='store_true', help="structural mesh checks only (no full parse)")
+    c.add_argument('--json', help='also write the report as JSON to this path')
+    c.add_argument('--limit', type=int, default=20, help='problems listed per kind')
+    d = sub.add_parser('demo', help='plant damage in a fake backup and verify it')
+    d.add_argument('--files', type=int, default=48)
+    d.add_argument('--mb', type=float, default=2.0, help='size of each fake STL')
+    d.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    args = ap.parse_args()
+    if args.cmd == 'demo':
+        sys.exit(0 if demo(args.files, args.mb, args.workers) else 1)
+    if not os.path.isdir(args.root):
+        ap.error(f"not a folder: {args.root}")
+    rep = verify(args.root, args.workers, not args.quick, args.mode)
+    print(format_report(rep, args.limit))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rep, f, indent=1)
+    sys.exit(0 if rep['ok'] else 1)
@@ -0,0 +1,245 @@
+# ==== Watch mode (poll for new versions, export deltas) ====
+# Pure-Python helpers used by FolderToGit.py. A FolderIndex remembers the folder tree
+# and the last exported version of every DataFile; a Watcher polls it on an interval
+# and hands only changed files to an export callback. Works with any object that
+# looks like a Fusion DataFolder, so a fake backend can drive it offline:
+#
+#   python watchmode.py simulate     # fake folders whose versions change between polls
+
+import os, sys, json, time, argparse
+
+from exportplan import datafile_key, datafile_version, iter_items
+
+INDEX_NAME = '.export_index.json'
+
+
+class FolderIndex:
+    """Cached view of a folder tree plus the last exported version per file.
+    Folder objects are kept in memory so a poll only lists dataFiles of known
+    folders; the folder structure itself is re-walked every rescan_every polls.
+    """
+    def __init__(self, root, path=None, rescan_every=10):
+        self.root = root
+        self.path = path
+        self.rescan_every = max(1, int(rescan_every))
+        self.folders = {}    # rel -> folder object (in memory only)
+        self.exported = {}   # key -> {'rel', 'name', 'version'}
+        self.polls = 0
+        self.load()
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.exported = json.load(f).get('files', {}) or {}
+        except:
+            self.exported = {}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.exported}, f, indent=1)
+            os.replace(tmp, self.path)
+        except:
+            pass
+
+    def rescan(self):
+        """Walk the folder tree (metadata only) and cache the folder objects."""
+        folders = {}
+        def walk(folder, rel):
+            folders[rel] = folder
+            for sub in iter_items(folder.dataFolders):
+                walk(sub, os.path.join(rel, sub.name) if rel else sub.name)
+        walk(self.root, '')
+        self.folders = folders
+
+    def changes(self, file_filter=None):
+        """Return [(rel, df)] whose version differs from the last export."""
+        if not self.folders or self.polls % self.rescan_every == 0:
+            self.rescan()
+        self.polls += 1
+        out = []
+        for rel, folder in self.folders.items():
+            try:
+                files = list(iter_items(folder.dataFiles))
+            except:
+                # Folder removed since the last rescan; pick up the new tree next time
+                self.polls = 0
+                continue
+            for df in files:
+                if file_filter is not None and not file_filter(rel, df):
+                    continue
+                rec = self.exported.get(datafile_key(df))
+                if rec is None or rec.get('version') != datafile_version(df):
+                    out.append((rel, df))
+        return out
+
+    def mark(self, rel, df):
+        self.exported[datafile_key(df)] = {'rel': rel, 'name': df.name, 'version': datafile_version(df)}
+
+
+class Watcher:
+    """Poll a FolderIndex and export deltas.
+    export_fn(changes) receives [(rel, df)] and returns the subset that exported
+    successfully. The interval backs off (x backoff, up to max_interval) while
+    nothing changes or a poll fails, and resets after a successful export.
+    clock/sleep are injectable; sleep(seconds) returns False to stop watching.
+    """
+    def __init__(self, index, export_fn, interval=60.0, max_interval=900.0, backoff=2.0,
+                 file_filter=None, clock=time.time, sleep=None):
+        self.index = index
+        self.export_fn = export_fn
+        self.base_interval = float(interval)
+        self.interval = float(interval)
+        self.max_interval = float(max(interval, max_interval))
+        self.backoff = max(1.0, float(backoff))
+        self.file_filter = file_filter
+        self.clock = clock
+        self.sleep = sleep or _default_sleep
+        self.stats = {'polls': 0, 'exported': 0, 'failed': 0, 'pollErrors': 0, 'tPoll': 0.0}
+
+    def _slow_down(self):
+        self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def poll_once(self):
+        """One poll: list, diff, export. Returns the number of files exported."""
+        self.stats['polls'] += 1
+        t0 = self.clock()
+        try:
+            changes = self.index.changes(self.file_filter)
+        except Exception:
+            self.stats['pollErrors'] += 1
+            self._slow_down()
+            return 0
+        finally:
+            self.stats['tPoll'] += self.clock() - t0
+        if not changes:
+            self._slow_down()
+            return 0
+        ok = self.export_fn(changes) or []
+        for rel, df in ok:
+            self.index.mark(rel, df)
+        self.index.save()
+        self.stats['exported'] += len(ok)
+        self.stats['failed'] += len(changes) - len(ok)
+        if ok:
+            self.interval = self.base_interval
+        else:
+            self._slow_down()
+        return len(ok)
+
+    def run(self, max_polls=None):
+        """Poll until sleep() returns False or max_polls is reached."""
+        n = 0
+        while max_polls is None or n < max_polls:
+            self.poll_once()
+            n += 1
+            if max_polls is not None and n >= max_polls:
+                break
+            if self.sleep(self.interval) is False:
+                break
+        return self.stats
+
+
+def _default_sleep(seconds):
+    time.sleep(seconds)
+    return True
+
+
+# Simulation: fake folders that change between polls, fake clock
+
+class _FakeFile:
+    def __init__(self, name, version=1):
+        self.name = name
+        self.id = 'urn:fake:' + name
+        self.versionNumber = version
+        self.fileExtension = 'f3d'
+
+
+class _FakeFolder:
+    def __init__(self, name, files=(), folders=()):
+        self.name = name
+        self.dataFiles = list(files)
+        self.dataFolders = list(folders)
+
+
+def simulate(verbose=True):
+    """Drive FolderIndex/Watcher through a scripted series of edits and check that
+    only changed files are exported, the interval backs off and resets, and new
+    folders show up at the periodic rescan. Raises AssertionError on a mismatch."""
+    import tempfile
+    a, b, c, d = _FakeFile('a'), _FakeFile('b'), _FakeFile('c'), _FakeFile('d')
+    sub = _FakeFolder('sub', [d])
+    root = _FakeFolder('root', [a, b, c], [sub])
+    state_dir = tempfile.mkdtemp(prefix='watchmode_')
+    index_path = os.path.join(state_dir, INDEX_NAME)
+    now = [0.0]
+    exported = []
+    fail = [False]
+
+    def export(changes):
+        names = sorted(df.name for _rel, df in changes)
+        exported.append(names)
+        return [] if fail[0] else changes
+
+    def sleep(seconds):
+        now[0] += seconds
+        return True
+
+    later = _FakeFolder('later', [_FakeFile('e')])
+    # poll number -> (edit made before that poll, files expected to be exported)
+    script = {
+        1: (None, ['a', 'b', 'c', 'd']),                       # first poll exports everything
+        2: (None, []),
+        3: (None, []),
+        4: (lambda: setattr(a, 'versionNumber', 2), ['a']),    # new version of one file
+        5: (lambda: root.dataFiles.append(_FakeFile('f')), ['f']),   # new file, known folder
+        6: (lambda: root.dataFolders.append(later), []),       # new folder: not listed yet
+        7: (None, []),
+        8: (lambda: fail.__setitem__(0, True) or setattr(b, 'versionNumber', 2), ['b']),   # export fails
+        9: (lambda: fail.__setitem__(0, False), ['b']),        # retried next poll
+        10: (None, []),
+        11: (None, ['e']),                                     # every 10th poll rescans the tree
+    }
+    index = FolderIndex(root, index_path, rescan_every=10)
+    w = Watcher(index, export, interval=60, max_interval=900, backoff=2.0, clock=lambda: now[0], sleep=sleep)
+    intervals = []
+    for n in range(1, len(script) + 1):
+        edit, want = script[n]
+        if edit:
+            edit()
+        before = len(exported)
+        w.poll_once()
+        got = exported[-1] if len(exported) > before else []
+        intervals.append(w.interval)
+        if verbose:
+            print(f"poll {n:2}: exported {got or '-'}, next poll in {w.interval:g}s")
+        assert got == want, f"poll {n}: exported {got}, expected {want}"
+    assert intervals[:4] == [60, 120, 240, 60], intervals      # backs off while idle, resets on export
+    assert intervals[7] == intervals[6] * 2, intervals          # a failed export backs off too
+    assert intervals[8] == 60, intervals
+    assert max(intervals) <= 900
+
+    # A restarted session only exports what changed since the saved index
+    index2 = FolderIndex(root, index_path, rescan_every=10)
+    assert index2.changes() == [], 'saved index should make a restart a no-op'
+    c.versionNumber = 3
+    assert [df.name for _rel, df in index2.changes()] == ['c']
+    os.remove(index_path)
+    os.rmdir(state_dir)
+    if verbose:
+        print(f"OK ({w.stats['polls']} polls, {w.stats['exported']} exported, {w.stats['failed']} failed)")
+    return True
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Watch mode tools')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('simulate', help='scripted fake backend: deltas, backoff and rescans')
+    args = ap.parse_args()
+    simulate()
+    sys.exit(0)